@@ -0,0 +1,224 @@
+# Admission Control
+# Pacific Reef Hotel Management System - Token buckets and concurrency limits per route class
+
+import os
+import math
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+from flask import g, jsonify, request
+
+import metrics
+
+# Long-lived or operational endpoints never take a slot
+EXEMPT_PATHS = ('/metrics', '/api/eventos')
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float, max_wait: float) -> float:
+        """
+        Take a token, possibly from the future.
+
+        Returns 0 when a token was available, the seconds to wait before
+        the reserved token is due (<= max_wait), or -seconds until one
+        would be available when even waiting max_wait is not enough
+        (nothing is taken in that case).
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        wait = (1 - self.tokens) / self.rate
+        if wait <= max_wait:
+            self.tokens -= 1
+            return wait
+        return -wait
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class RouteClass:
+    """Limits for one class of routes: concurrent requests plus a token bucket per client."""
+
+    def __init__(self, name: str, concurrency: int, client_rate: float, client_burst: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.in_flight = 0
+
+
+DEFAULT_CLASSES = {
+    'reads': (64, 50.0, 100),
+    'writes': (16, 10.0, 20),
+    'analytics': (4, 2.0, 10),
+}
+
+# Shared buckets for expensive routes, across all clients: (rate per second, burst)
+DEFAULT_ROUTE_LIMITS = {
+    ('POST', '/api/reservas'): (50.0, 100),
+    ('POST', '/api/login'): (20.0, 40),
+    ('POST', '/api/batch'): (10.0, 20),
+    ('POST', '/api/analytics/export'): (0.2, 2),
+}
+
+
+class AdmissionController:
+    """
+    Decides, before a request runs, whether it is admitted, queued briefly or shed.
+
+    A request must get a token from its client's bucket for the route
+    class, a token from the route's shared bucket (if it has one) and a
+    concurrency slot of its class. Token shortfalls up to `max_wait`
+    seconds and busy slots up to `max_wait` are absorbed by sleeping;
+    anything longer is answered 429 with Retry-After, so a flood from one
+    client or on one route cannot starve the SQLite writer or the
+    analytics workers.
+    """
+
+    def __init__(self, classes: Optional[Dict[str, Tuple[int, float, float]]] = None,
+                 route_limits: Optional[Dict[Tuple[str, str], Tuple[float, float]]] = None,
+                 max_wait: float = 0.25, max_clients: int = 10_000,
+                 registry: metrics.MetricsRegistry = metrics.REGISTRY):
+        self.classes = {name: RouteClass(name, *limits) for name, limits in (classes or DEFAULT_CLASSES).items()}
+        self.route_buckets = {key: TokenBucket(*limits) for key, limits in (route_limits or DEFAULT_ROUTE_LIMITS).items()}
+        self.max_wait = max_wait
+        self.max_clients = max_clients
+        self._clients: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.admitted = registry.register(metrics.Counter(
+            'admission_admitted_total', 'Requests admitted by route class', ('class',)))
+        self.queued = registry.register(metrics.Counter(
+            'admission_queued_total', 'Requests delayed before admission', ('class', 'reason')))
+        self.rejected = registry.register(metrics.Counter(
+            'admission_rejected_total', 'Requests answered 429', ('class', 'reason')))
+        registry.register(self)
+
+    @staticmethod
+    def route_class(method: str, path: str) -> str:
+        if path.startswith('/api/analytics'):
+            return 'analytics'
+        return 'reads' if method in ('GET', 'HEAD', 'OPTIONS') else 'writes'
+
+    def _client_bucket(self, client: str, route_class: RouteClass, now: float) -> TokenBucket:
+        key = (client, route_class.name)
+        bucket = self._clients.get(key)
+        if bucket is None:
+            if len(self._clients) >= self.max_clients:
+                # Full buckets carry no state worth keeping
+                self._clients = {k: b for k, b in self._clients.items() if not b.full(now)}
+            bucket = self._clients[key] = TokenBucket(route_class.client_rate, route_class.client_burst)
+        return bucket
+
+    def admit(self, client: str, method: str, path: str, rule: Optional[str]):
+        """Returns (route class, None) when admitted, or (route class, retry_after seconds) when shed."""
+        route_class = self.classes[self.route_class(method, path)]
+        now = time.monotonic()
+        with self._lock:
+            client_bucket = self._client_bucket(client, route_class, now)
+            client_wait = client_bucket.reserve(now, self.max_wait)
+            if client_wait < 0:
+                self.rejected.inc(route_class.name, 'client_rate')
+                return route_class, -client_wait
+            route_bucket = self.route_buckets.get((method, rule))
+            route_wait = route_bucket.reserve(now, self.max_wait) if route_bucket else 0.0
+            if route_wait < 0:
+                client_bucket.refund()
+                self.rejected.inc(route_class.name, 'route_rate')
+                return route_class, -route_wait
+        wait = max(client_wait, route_wait)
+        if wait > 0:
+            self.queued.inc(route_class.name, 'rate')
+            time.sleep(wait)
+
+        if not route_class.slots.acquire(blocking=False):
+            self.queued.inc(route_class.name, 'concurrency')
+            if not route_class.slots.acquire(timeout=self.max_wait):
+                self.rejected.inc(route_class.name, 'concurrency')
+                return route_class, self.max_wait
+        with self._lock:
+            route_class.in_flight += 1
+        self.admitted.inc(route_class.name)
+        return route_class, None
+
+    def release(self, route_class: RouteClass):
+        with self._lock:
+            route_class.in_flight -= 1
+        route_class.slots.release()
+
+    def render(self) -> str:
+        lines = ['# HELP admission_in_flight Requests holding a concurrency slot',
+                 '# TYPE admission_in_flight gauge']
+        for name, route_class in sorted(self.classes.items()):
+            lines.append(f'admission_in_flight{{class="{name}"}} {route_class.in_flight}')
+        lines += ['# HELP admission_concurrency_limit Concurrency slots per route class',
+                  '# TYPE admission_concurrency_limit gauge']
+        for name, route_class in sorted(self.classes.items()):
+            lines.append(f'admission_concurrency_limit{{class="{name}"}} {route_class.concurrency}')
+        return '\n'.join(lines)
+
+
+def _classes_from_env() -> Dict[str, Tuple[int, float, float]]:
+    classes = {}
+    for name, (concurrency, rate, burst) in DEFAULT_CLASSES.items():
+        prefix = f'ADMISSION_{name.upper()}'
+        classes[name] = (
+            int(os.getenv(f'{prefix}_CONCURRENCY', concurrency)),
+            float(os.getenv(f'{prefix}_RATE', rate)),
+            float(os.getenv(f'{prefix}_BURST', burst)),
+        )
+    return classes
+
+
+def init_app(app, controller: Optional[AdmissionController] = None):
+    """
+    Put admission control in front of every route of a Flask app.
+
+    Enabled unless ADMISSION_CONTROL=false. Per-class limits come from
+    ADMISSION_{READS,WRITES,ANALYTICS}_{CONCURRENCY,RATE,BURST} and the
+    queueing budget from ADMISSION_MAX_WAIT (seconds). Clients are told
+    apart by remote address.
+    """
+    if controller is None:
+        if os.getenv('ADMISSION_CONTROL', 'true').lower() != 'true':
+            return None
+        controller = AdmissionController(_classes_from_env(), max_wait=float(os.getenv('ADMISSION_MAX_WAIT', 0.25)))
+
+    @app.before_request
+    def _admit():
+        if request.path in EXEMPT_PATHS:
+            return None
+        rule = request.url_rule.rule if request.url_rule else None
+        route_class, retry_after = controller.admit(request.remote_addr or '-', request.method, request.path, rule)
+        if retry_after is not None:
+            response = jsonify({ 'message': 'Demasiadas solicitudes, intente nuevamente', 'class': route_class.name })
+            response.status_code = 429
+            response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+            return response
+        g._admission_class = route_class
+        return None
+
+    @app.teardown_request
+    def _release(exc=None):
+        route_class = g.pop('_admission_class', None)
+        if route_class is not None:
+            controller.release(route_class)
+
+    return controller
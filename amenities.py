@@ -0,0 +1,66 @@
+# Amenities
+# Pacific Reef Hotel Management System - Normalized amenities and room bitmasks
+
+from typing import Dict, List
+
+MAX_AMENITIES = 63  # bits 0..62 of a signed 64-bit SQLite INTEGER
+
+
+def clean_names(names) -> List[str]:
+    """Strip blanks and duplicates while keeping the original order."""
+    seen = []
+    for name in names or []:
+        name = name.strip() if isinstance(name, str) else ''
+        if name and name not in seen:
+            seen.append(name)
+    return seen
+
+
+def amenity_bits(conn, names: List[str], create: bool = True) -> Dict[str, int]:
+    """
+    Map amenity names to their bit, registering unknown names when create=True.
+
+    Unknown names are skipped (not raised) when create=False, which is what
+    a search wants: an amenity nobody has cannot match any room.
+    """
+    bits = {}
+    for name in clean_names(names):
+        row = conn.execute('SELECT bit FROM amenidades WHERE nombre=?', (name,)).fetchone()
+        if row is None and create:
+            next_bit = conn.execute('SELECT COALESCE(MAX(bit) + 1, 0) FROM amenidades').fetchone()[0]
+            if next_bit >= MAX_AMENITIES:
+                raise ValueError(f'No se pueden registrar más de {MAX_AMENITIES} amenidades')
+            conn.execute('INSERT INTO amenidades (nombre, bit) VALUES (?, ?)', (name, next_bit))
+            row = (next_bit,)
+        if row is not None:
+            bits[name] = row[0]
+    return bits
+
+
+def mask_for(conn, names, create: bool = True) -> int:
+    """Bitmask for a list of amenity names."""
+    mask = 0
+    for bit in amenity_bits(conn, names, create).values():
+        mask |= 1 << bit
+    return mask
+
+
+def link_room(conn, room_id: int, names):
+    """Replace a room's rows in habitacion_amenidades."""
+    conn.execute('DELETE FROM habitacion_amenidades WHERE habitacion_id=?', (room_id,))
+    conn.executemany(
+        'INSERT OR IGNORE INTO habitacion_amenidades (habitacion_id, amenidad_id) SELECT ?, id FROM amenidades WHERE nombre=?',
+        [(room_id, name) for name in clean_names(names)]
+    )
+
+
+def list_amenities(conn) -> List[Dict]:
+    """Every amenity with its bit and how many rooms have it."""
+    rows = conn.execute('''
+        SELECT a.id, a.nombre, a.bit, COUNT(ha.habitacion_id) AS habitaciones
+        FROM amenidades a
+        LEFT JOIN habitacion_amenidades ha ON ha.amenidad_id = a.id
+        GROUP BY a.id
+        ORDER BY a.nombre
+    ''').fetchall()
+    return [{ 'id': r[0], 'name': r[1], 'bit': r[2], 'rooms': r[3] } for r in rows]
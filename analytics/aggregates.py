@@ -0,0 +1,93 @@
+# Mergeable Aggregates
+# Pacific Reef Hotel Management System - Partial aggregates that combine across property shards
+
+import math
+import numpy as np
+from typing import Dict, Iterable, Optional
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch with logarithmic buckets.
+
+    A value x lands in bucket ceil(log_gamma(x)), gamma = (1 + a) / (1 - a),
+    so any quantile is returned within relative error `a`. Merging two
+    sketches just adds bucket counts, which makes chain-wide medians and
+    percentiles exact up to `a` no matter how the data is split across
+    shards, unlike averaging per-shard percentiles.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        """
+        Args:
+            relative_accuracy: Maximum relative error of returned quantiles
+        """
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values: Iterable[float]) -> 'QuantileSketch':
+        """Add non-negative values (amounts, nights); negatives count as zero."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = np.clip(values[~np.isnan(values)], 0.0, None)
+        if values.size == 0:
+            return self
+        positive = values[values > 0]
+        self.zeros += int(values.size - positive.size)
+        if positive.size:
+            keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True)
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                self.buckets[key] = self.buckets.get(key, 0) + count
+        self.count += int(values.size)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Fold `other` into this sketch (both must use the same accuracy)."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate the q-quantile (0 <= q <= 1).
+
+        Returns:
+            The estimate, or None when the sketch is empty
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zeros:
+            return 0.0
+        seen = self.zeros
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint of (gamma^(k-1), gamma^k] in relative terms
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)) -> Dict:
+        """Count, mean and selected quantiles, rounded for JSON responses."""
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 2) if self.count else None,
+            **{f'p{int(q * 100)}': (round(self.quantile(q), 2) if self.count else None) for q in quantiles}
+        }
@@ -6,7 +6,20 @@ from flask_cors import CORS
 from datetime import datetime, timedelta
 import logging
 import os
+import sys
 from hotel_analytics import HotelAnalytics
+from snapshots import SnapshotExporter
+from chain_analytics import ChainAnalytics
+from anomalies import AnomalyDetector, ChangeFeed
+from simulation import OverbookingSimulator
+
+# Shared service modules (metrics, ...) live at the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+import sql_profiler
+import request_profiler
+import admission
+import properties
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,9 +28,79 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend integration
+metrics.init_app(app)
+sql_profiler.init_app(app)
+request_profiler.init_app(app)
+admission.init_app(app)
+
+# One analytics engine (read-only pool) per property shard; see properties.py
+PROPERTIES = properties.load(os.getenv('ANALYTICS_DB_URL') or 'sqlite:///hotel_management.db')
+properties.init_app(app, PROPERTIES)
+
+def archive_path_for(prop):
+    """ANALYTICS_ARCHIVE_DB for the default property; other shards' archives when they exist."""
+    if prop.is_default:
+        return os.getenv('ANALYTICS_ARCHIVE_DB')
+    return prop.archive_db if os.path.exists(prop.archive_db) else None
+
+ENGINES = {
+    prop.code: HotelAnalytics(
+        prop.db_path,
+        pool_size=int(os.getenv('ANALYTICS_POOL_SIZE', 8)),
+        snapshot_dir=prop.scoped_dir(os.getenv('ANALYTICS_SNAPSHOT_DIR')) if os.getenv('ANALYTICS_SNAPSHOT_DIR') else None,
+        connection_factory=metrics.InstrumentedConnection,
+        archive_path=archive_path_for(prop)
+    )
+    for prop in PROPERTIES
+}
+
+def current_engine():
+    """Analytics engine of the property selected by the request (/p/<code> or X-Property)."""
+    return ENGINES[PROPERTIES.current().code]
+
+for code, engine in ENGINES.items():
+    if engine.snapshots:
+        metrics.REGISTRY.register_cache(
+            'analytics_snapshot' if code == PROPERTIES.default.code else f'analytics_snapshot_{code}',
+            lambda engine=engine: (engine.snapshots.cache_hits, engine.snapshots.cache_misses)
+        )
+
+# Monte Carlo workers fork here, before the exporters and anomaly feeds start their threads
+simulator = OverbookingSimulator(
+    workers=int(os.getenv('ANALYTICS_SIM_WORKERS', 0)) or None,
+    batch_size=int(os.getenv('ANALYTICS_SIM_BATCH', 1000))
+).start()
+MAX_SIM_SCENARIOS = int(os.getenv('ANALYTICS_SIM_MAX_SCENARIOS', 50000))
 
-# Initialize analytics engine
-analytics_engine = HotelAnalytics()
+# Optional Arrow snapshot exporters so heavy reports don't scan the live databases
+snapshot_exporters = {}
+if os.getenv('ANALYTICS_SNAPSHOT_DIR'):
+    for prop in PROPERTIES:
+        snapshot_exporters[prop.code] = SnapshotExporter(
+            ENGINES[prop.code].db_connection,
+            prop.scoped_dir(os.getenv('ANALYTICS_SNAPSHOT_DIR')),
+            interval=float(os.getenv('ANALYTICS_SNAPSHOT_INTERVAL', 300))
+        )
+        snapshot_exporters[prop.code].start()
+
+# Cross-property reports fan out to every shard in parallel
+chain_analytics = ChainAnalytics(ENGINES, timeout=float(os.getenv('ANALYTICS_CHAIN_TIMEOUT', 30)))
+
+# Streaming anomaly detection: one detector per property fed from its change log
+anomaly_detectors = {}
+anomaly_feeds = {}
+if float(os.getenv('ANALYTICS_ANOMALY_INTERVAL', 2)) > 0:
+    for code, engine in ENGINES.items():
+        if engine.pool is None:
+            continue
+        anomaly_detectors[code] = AnomalyDetector(
+            bucket_seconds=int(os.getenv('ANALYTICS_ANOMALY_BUCKET', 3600)),
+            threshold=float(os.getenv('ANALYTICS_ANOMALY_THRESHOLD', 3.0))
+        )
+        anomaly_feeds[code] = ChangeFeed(engine.pool, anomaly_detectors[code],
+                                         interval=float(os.getenv('ANALYTICS_ANOMALY_INTERVAL', 2)))
+        if not anomaly_feeds[code].start():
+            del anomaly_detectors[code], anomaly_feeds[code]
 
 # Configuration
 app.config['DEBUG'] = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
@@ -33,6 +116,57 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/api/analytics/history')
+def get_historical_bookings():
+    """
+    Get monthly bookings and revenue including archived reservations.
+    
+    Query Parameters:
+        start_date (str): Start date in YYYY-MM-DD format (optional, defaults to 2 years ago)
+        end_date (str): End date in YYYY-MM-DD format (optional, defaults to today)
+    
+    Returns:
+        JSON response with per-month totals split by hot table / archive
+    """
+    try:
+        end_date = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
+        start_date = request.args.get('start_date',
+                                    (datetime.now() - timedelta(days=730)).strftime('%Y-%m-%d'))
+        
+        datetime.strptime(start_date, '%Y-%m-%d')
+        datetime.strptime(end_date, '%Y-%m-%d')
+        
+        if not current_engine().archive_path:
+            return jsonify({
+                'success': False,
+                'error': 'Archive not configured (set ANALYTICS_ARCHIVE_DB)',
+                'timestamp': datetime.now().isoformat()
+            }), 404
+        
+        data = current_engine().get_historical_bookings(start_date, end_date)
+        
+        return jsonify({
+            'success': True,
+            'data': data,
+            'freshness': {'source': 'live', 'age_seconds': 0},
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid date format. Use YYYY-MM-DD: {str(e)}',
+            'timestamp': datetime.now().isoformat()
+        }), 400
+        
+    except Exception as e:
+        logger.error(f"Error in historical bookings endpoint: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
 @app.route('/api/analytics/occupancy')
 def get_occupancy_analytics():
     """
@@ -56,11 +190,12 @@ def get_occupancy_analytics():
         datetime.strptime(end_date, '%Y-%m-%d')
         
         # Get analytics data
-        data = analytics_engine.get_occupancy_analytics(start_date, end_date)
+        data = current_engine().get_occupancy_analytics(start_date, end_date)
         
         return jsonify({
             'success': True,
             'data': data,
+            'freshness': current_engine().data_freshness(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -102,11 +237,12 @@ def get_revenue_analytics():
         datetime.strptime(end_date, '%Y-%m-%d')
         
         # Get analytics data
-        data = analytics_engine.get_revenue_analytics(start_date, end_date)
+        data = current_engine().get_revenue_analytics(start_date, end_date)
         
         return jsonify({
             'success': True,
             'data': data,
+            'freshness': current_engine().data_freshness(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -135,11 +271,12 @@ def get_customer_analytics():
     """
     try:
         # Get analytics data
-        data = analytics_engine.get_customer_analytics()
+        data = current_engine().get_customer_analytics()
         
         return jsonify({
             'success': True,
             'data': data,
+            'freshness': current_engine().data_freshness(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -161,11 +298,12 @@ def get_room_performance_analytics():
     """
     try:
         # Get analytics data
-        data = analytics_engine.get_room_performance_analytics()
+        data = current_engine().get_room_performance_analytics()
         
         return jsonify({
             'success': True,
             'data': data,
+            'freshness': current_engine().data_freshness(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -187,11 +325,12 @@ def get_predictive_analytics():
     """
     try:
         # Get analytics data
-        data = analytics_engine.generate_predictive_analytics()
+        data = current_engine().generate_predictive_analytics()
         
         return jsonify({
             'success': True,
             'data': data,
+            'freshness': current_engine().data_freshness(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -217,10 +356,10 @@ def get_dashboard_summary():
         start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
         
         # Gather summary data from different analytics
-        occupancy_data = analytics_engine.get_occupancy_analytics(start_date, end_date)
-        revenue_data = analytics_engine.get_revenue_analytics(start_date, end_date)
-        customer_data = analytics_engine.get_customer_analytics()
-        room_data = analytics_engine.get_room_performance_analytics()
+        occupancy_data = current_engine().get_occupancy_analytics(start_date, end_date)
+        revenue_data = current_engine().get_revenue_analytics(start_date, end_date)
+        customer_data = current_engine().get_customer_analytics()
+        room_data = current_engine().get_room_performance_analytics()
         
         # Create dashboard summary
         dashboard_data = {
@@ -245,6 +384,7 @@ def get_dashboard_summary():
         return jsonify({
             'success': True,
             'data': dashboard_data,
+            'freshness': current_engine().data_freshness(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -297,7 +437,7 @@ def export_analytics_report():
         datetime.strptime(end_date, '%Y-%m-%d')
         
         # Export report
-        file_path = analytics_engine.export_analytics_report(report_type, start_date, end_date)
+        file_path = current_engine().export_analytics_report(report_type, start_date, end_date)
         
         if file_path:
             return jsonify({
@@ -307,6 +447,7 @@ def export_analytics_report():
                     'report_type': report_type,
                     'date_range': {'start': start_date, 'end': end_date}
                 },
+                'freshness': current_engine().data_freshness(),
                 'timestamp': datetime.now().isoformat()
             })
         else:
@@ -349,6 +490,256 @@ def internal_error(error):
         'timestamp': datetime.now().isoformat()
     }), 500
 
+def chain_response(data):
+    """Chain reports are partial when a shard failed; say so instead of hiding it."""
+    return jsonify({
+        'success': True,
+        'data': data,
+        'properties': [p.code for p in PROPERTIES],
+        'partial': bool(data['failed']),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/analytics/chain/occupancy')
+def get_chain_occupancy():
+    """
+    Get chain-wide occupancy merged from every property shard.
+    
+    Query Parameters:
+        start_date (str): First night in YYYY-MM-DD format (optional, defaults to 30 days ago)
+        end_date (str): Last night in YYYY-MM-DD format (optional, defaults to today)
+    
+    Returns:
+        JSON response with chain, per-property and per-night occupancy
+    """
+    try:
+        end_date = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
+        start_date = request.args.get('start_date',
+                                    (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
+        
+        if datetime.strptime(start_date, '%Y-%m-%d') > datetime.strptime(end_date, '%Y-%m-%d'):
+            raise ValueError('start_date is after end_date')
+        
+        return chain_response(chain_analytics.occupancy(start_date, end_date))
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid date format. Use YYYY-MM-DD: {str(e)}',
+            'timestamp': datetime.now().isoformat()
+        }), 400
+        
+    except Exception as e:
+        logger.error(f"Error in chain occupancy endpoint: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+@app.route('/api/analytics/chain/revenue')
+def get_chain_revenue():
+    """
+    Get chain-wide revenue, ADR and booking value percentiles.
+    
+    Query Parameters:
+        start_date (str): Start date in YYYY-MM-DD format (optional, defaults to 30 days ago)
+        end_date (str): End date in YYYY-MM-DD format (optional, defaults to today)
+    
+    Returns:
+        JSON response with chain and per-property revenue
+    """
+    try:
+        end_date = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
+        start_date = request.args.get('start_date',
+                                    (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
+        
+        datetime.strptime(start_date, '%Y-%m-%d')
+        datetime.strptime(end_date, '%Y-%m-%d')
+        
+        return chain_response(chain_analytics.revenue(start_date, end_date))
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid date format. Use YYYY-MM-DD: {str(e)}',
+            'timestamp': datetime.now().isoformat()
+        }), 400
+        
+    except Exception as e:
+        logger.error(f"Error in chain revenue endpoint: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+@app.route('/api/analytics/chain/customers')
+def get_chain_customers():
+    """
+    Get the chain customer base, counting guests of several properties once.
+    
+    Returns:
+        JSON response with unique, repeat and multi-property guest counts
+    """
+    try:
+        return chain_response(chain_analytics.customers())
+        
+    except Exception as e:
+        logger.error(f"Error in chain customers endpoint: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+@app.route('/api/analytics/anomalies')
+def get_anomalies():
+    """
+    Get live anomaly alerts (demand surges, cancellation spikes, revenue drops).
+    
+    Query Parameters:
+        since (int): Only alerts with a higher id (optional, for polling)
+        limit (int): Maximum alerts returned (optional, defaults to 100)
+    
+    Returns:
+        JSON response with alerts for the selected property, oldest first
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(max(int(request.args.get('limit', 100)), 1), 500)
+        
+        detector = anomaly_detectors.get(PROPERTIES.current().code)
+        if detector is None:
+            return jsonify({
+                'success': False,
+                'error': 'Anomaly detection not running (ANALYTICS_ANOMALY_INTERVAL or missing change log)',
+                'timestamp': datetime.now().isoformat()
+            }), 404
+        
+        alerts = detector.alerts(since, limit)
+        return jsonify({
+            'success': True,
+            'data': {
+                'alerts': alerts,
+                'last_id': alerts[-1]['id'] if alerts else since
+            },
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid parameter: {str(e)}',
+            'timestamp': datetime.now().isoformat()
+        }), 400
+        
+    except Exception as e:
+        logger.error(f"Error in anomalies endpoint: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+@app.route('/api/analytics/anomalies/baselines')
+def get_anomaly_baselines():
+    """
+    Get the current expected value and spread of every monitored series.
+    
+    Returns:
+        JSON response with per metric and room type baselines and feed status
+    """
+    try:
+        code = PROPERTIES.current().code
+        if code not in anomaly_detectors:
+            return jsonify({
+                'success': False,
+                'error': 'Anomaly detection not running (ANALYTICS_ANOMALY_INTERVAL or missing change log)',
+                'timestamp': datetime.now().isoformat()
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'feed': anomaly_feeds[code].stats(),
+                'series': anomaly_detectors[code].baselines(datetime.now().timestamp())
+            },
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in anomaly baselines endpoint: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+@app.route('/api/analytics/simulation', methods=['POST'])
+def run_simulation():
+    """
+    Run Monte Carlo overbooking / pricing what-if scenarios for the selected property.
+    
+    Request Body (all optional):
+        days (int): Nights simulated from today (default 30, max 365)
+        scenarios (int): Number of scenarios (default 10000)
+        overbooking (int or dict): Rooms sold beyond capacity, overall or per room type
+        price_change (float): Price move for bookings still to come (0.1 = +10%)
+        elasticity (float): Demand elasticity to price (default -1.5)
+        no_show_rate (float): Share of arriving bookings that do not show (default 0.02)
+        walk_cost_factor (float): Cost of a walked guest in nights of ADR (default 1.5)
+        levels (list): Overbooking levels compared for the recommendation
+        seed (int): Seed for reproducible results
+    
+    Returns:
+        JSON response with expected revenue, walk risk and occupancy
+        distributions per room type and night
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        days = int(data.get('days', 30))
+        scenarios = int(data.get('scenarios', 10000))
+        if not 1 <= days <= 365 or not 100 <= scenarios <= MAX_SIM_SCENARIOS:
+            raise ValueError(f'days must be 1-365 and scenarios 100-{MAX_SIM_SCENARIOS}')
+        no_show_rate = float(data.get('no_show_rate', 0.02))
+        if not 0 <= no_show_rate < 1 or float(data.get('price_change', 0.0)) <= -1:
+            raise ValueError('no_show_rate must be in [0, 1) and price_change above -1')
+        
+        result = simulator.run(
+            current_engine(),
+            horizon_days=days,
+            scenarios=scenarios,
+            overbooking=data.get('overbooking', 0),
+            price_change=float(data.get('price_change', 0.0)),
+            elasticity=float(data.get('elasticity', -1.5)),
+            no_show_rate=no_show_rate,
+            walk_cost_factor=float(data.get('walk_cost_factor', 1.5)),
+            levels=data.get('levels', [0, 1, 2, 3, 4, 5]),
+            seed=data.get('seed')
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': result,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid simulation parameters: {str(e)}',
+            'timestamp': datetime.now().isoformat()
+        }), 400
+        
+    except Exception as e:
+        logger.error(f"Error in simulation endpoint: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
 # API Documentation endpoint
 @app.route('/api/docs')
 def api_documentation():
@@ -370,7 +761,18 @@ def api_documentation():
             'GET /api/analytics/rooms': 'Get room performance analytics',
             'GET /api/analytics/predictions': 'Get predictive analytics',
             'GET /api/analytics/dashboard': 'Get dashboard summary',
+            'GET /api/analytics/history': 'Monthly bookings incl. archived reservations (ANALYTICS_ARCHIVE_DB)',
             'POST /api/analytics/export': 'Export analytics report',
+            'GET /api/analytics/chain/occupancy': 'Chain-wide occupancy merged from every property shard',
+            'GET /api/analytics/chain/revenue': 'Chain-wide revenue, ADR and booking value percentiles',
+            'GET /api/analytics/chain/customers': 'Chain customer base (guests of several properties counted once)',
+            'GET /api/analytics/anomalies': 'Live alerts: demand surges, cancellation spikes, revenue drops (?since=<id>)',
+            'GET /api/analytics/anomalies/baselines': 'Seasonal EWMA baselines per metric and room type',
+            'POST /api/analytics/simulation': 'Monte Carlo overbooking and price what-if (revenue, walk risk, occupancy bands)',
+            'X-Property header or /p/<code> prefix': 'Select the property for per-property endpoints (HOTEL_PROPERTIES)',
+            'GET /metrics': 'Prometheus metrics (latency, status codes, SQL timing)',
+            'GET /api/admin/slow-queries': 'Slowest SQL statements with query plans (SQL_PROFILE=true)',
+            '429 responses': 'Admission control (ADMISSION_* env vars); honour the Retry-After header',
             'GET /api/docs': 'API documentation'
         },
         'parameters': {
@@ -0,0 +1,376 @@
+# Streaming Anomaly Detection
+# Pacific Reef Hotel Management System - Booking, cancellation and revenue alerts from the change log
+
+import math
+import time
+import logging
+import threading
+from collections import deque
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ALL_TYPES = '*'
+
+# Reservations that can still be cancelled; the feed only remembers these
+OPEN_STATES = ('pendiente', 'confirmada')
+
+# metric -> (alert kind, direction); 'up' alerts can fire while the bucket is still open
+RULES = {
+    'bookings': ('demand_surge', 'up'),
+    'cancellations': ('cancellation_spike', 'up'),
+    'revenue': ('revenue_drop', 'down'),
+}
+
+
+class SeasonalEwma:
+    """
+    Expected value of one bucketed series: an EWMA level times a
+    per-slot seasonal factor (hour of day for hourly buckets), plus an
+    EWMA of squared residuals for the spread.
+
+    Memory is constant per series: `period` factors and three floats.
+    """
+
+    __slots__ = ('alpha', 'beta', 'level', 'season', 'variance', 'samples')
+
+    def __init__(self, period: int = 24, alpha: float = 0.05, beta: float = 0.1):
+        """
+        Args:
+            period: Number of seasonal slots
+            alpha: Smoothing of the level and of the residual variance
+            beta: Smoothing of the seasonal factors
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.level = 0.0
+        self.season = [1.0] * period
+        self.variance = 0.0
+        self.samples = 0
+
+    def expected(self, slot: int) -> float:
+        return self.level * self.season[slot]
+
+    def spread(self, slot: int) -> float:
+        """Standard deviation, floored by the Poisson spread of the expected count."""
+        return max(math.sqrt(self.variance), math.sqrt(max(self.expected(slot), 0.0)), 1e-9)
+
+    def update(self, slot: int, value: float):
+        """Fold one closed bucket into the baseline."""
+        if self.samples == 0:
+            self.level = value
+        residual = value - self.expected(slot)
+        self.variance = (1 - self.alpha) * self.variance + self.alpha * residual * residual
+        factor = self.season[slot] or 1.0
+        self.level = (1 - self.alpha) * self.level + self.alpha * (value / factor)
+        if self.level > 0:
+            self.season[slot] = (1 - self.beta) * self.season[slot] + self.beta * (value / self.level)
+            # Keep the factors averaging 1 so the level stays in the series' units
+            mean = sum(self.season) / len(self.season)
+            if mean > 0:
+                self.season = [s / mean for s in self.season]
+        self.samples += 1
+
+
+class AnomalyDetector:
+    """
+    Incremental detector over reservation events.
+
+    Events (bookings and cancellations with their room type and amount)
+    are added to the open time bucket of each series: per metric and per
+    room type, plus the all-types series. An upward anomaly (demand surge,
+    cancellation spike) fires as soon as the open bucket alone exceeds
+    expected + threshold * spread for the whole bucket, i.e. seconds after
+    the event that crosses it; a revenue drop can only be judged when the
+    bucket closes. Baselines need `min_samples` closed buckets before
+    they alert.
+    """
+
+    def __init__(self, bucket_seconds: int = 3600, threshold: float = 3.0, min_samples: int = 48,
+                 min_events: int = 3, min_expected_revenue: float = 100.0, max_alerts: int = 500):
+        """
+        Args:
+            bucket_seconds: Bucket width; seasonal slots cover one day of buckets
+            threshold: Alert when the bucket is this many spreads from expected
+            min_samples: Closed buckets a series needs before it can alert
+            min_events: Bookings/cancellations a bucket needs before a surge or spike counts
+            min_expected_revenue: Revenue drops below this expected value are ignored
+            max_alerts: Alerts kept in memory (oldest dropped first)
+        """
+        self.bucket_seconds = bucket_seconds
+        self.period = max(1, 86400 // bucket_seconds)
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.min_events = min_events
+        self.min_expected_revenue = min_expected_revenue
+        self._lock = threading.Lock()
+        self._baselines: Dict[Tuple[str, str], SeasonalEwma] = {}
+        self._open: Dict[Tuple[str, str], float] = {}
+        self._fired = set()
+        self._bucket: Optional[int] = None
+        self._alerts = deque(maxlen=max_alerts)
+        self._next_id = 1
+        self.events = 0
+
+    def _baseline(self, key: Tuple[str, str]) -> SeasonalEwma:
+        if key not in self._baselines:
+            self._baselines[key] = SeasonalEwma(self.period)
+        return self._baselines[key]
+
+    def _alert(self, key: Tuple[str, str], value: float, baseline: SeasonalEwma, slot: int, bucket: int, at: float):
+        metric, room_type = key
+        kind, _ = RULES[metric]
+        expected, spread = baseline.expected(slot), baseline.spread(slot)
+        alert = {
+            'id': self._next_id,
+            'kind': kind,
+            'metric': metric,
+            'room_type': room_type,
+            'value': round(value, 2),
+            'expected': round(expected, 2),
+            'z_score': round((value - expected) / spread, 2),
+            'bucket_start': bucket * self.bucket_seconds,
+            'detected_at': at,
+        }
+        self._next_id += 1
+        self._fired.add(key)
+        self._alerts.append(alert)
+        logger.warning(f"Anomaly: {kind} on {room_type} ({metric}={alert['value']}, expected {alert['expected']})")
+
+    def _close(self, bucket: int, at: float):
+        slot = bucket % self.period
+        keys = set(self._open) | set(self._baselines)
+        for key in keys:
+            value = self._open.get(key, 0.0)
+            baseline = self._baseline(key)
+            _, direction = RULES[key[0]]
+            if (direction == 'down' and key not in self._fired and baseline.samples >= self.min_samples
+                    and baseline.expected(slot) >= self.min_expected_revenue
+                    and value < baseline.expected(slot) - self.threshold * baseline.spread(slot)):
+                self._alert(key, value, baseline, slot, bucket, at)
+            baseline.update(slot, value)
+        self._open.clear()
+        self._fired.clear()
+
+    def advance(self, now: float):
+        """Close every bucket that ended before `now` (empty ones included, up to a week)."""
+        with self._lock:
+            current = int(now // self.bucket_seconds)
+            if self._bucket is None:
+                self._bucket = current
+                return
+            if current - self._bucket > 7 * self.period:
+                # Long outage: skip ahead rather than replay weeks of empty buckets
+                self._close(self._bucket, now)
+                self._bucket = current - 1
+            while self._bucket < current:
+                self._close(self._bucket, now)
+                self._bucket += 1
+
+    def observe(self, metric: str, room_type: str, amount: float, at: float):
+        """Add one event to the open bucket of its series and of the all-types series."""
+        self.advance(at)
+        with self._lock:
+            self.events += 1
+            slot = self._bucket % self.period
+            for key in ((metric, room_type), (metric, ALL_TYPES)):
+                value = self._open.get(key, 0.0) + amount
+                self._open[key] = value
+                baseline = self._baseline(key)
+                if (RULES[metric][1] == 'up' and key not in self._fired and baseline.samples >= self.min_samples
+                        and value >= self.min_events and value > baseline.expected(slot) + self.threshold * baseline.spread(slot)):
+                    self._alert(key, value, baseline, slot, self._bucket, at)
+
+    def booking(self, room_type: str, amount: float, at: float):
+        self.observe('bookings', room_type, 1, at)
+        self.observe('revenue', room_type, amount, at)
+
+    def cancellation(self, room_type: str, amount: float, at: float):
+        self.observe('cancellations', room_type, 1, at)
+        self.observe('revenue', room_type, -amount, at)
+
+    def clear_alerts(self):
+        """Drop every alert kept in memory (ids keep increasing)."""
+        with self._lock:
+            self._alerts.clear()
+
+    def alerts(self, since_id: int = 0, limit: int = 100) -> List[Dict]:
+        """Alerts with id > since_id, newest last."""
+        with self._lock:
+            return [a for a in self._alerts if a['id'] > since_id][-limit:]
+
+    def baselines(self, now: float) -> Dict:
+        """Expected value and spread of every series for the current bucket."""
+        with self._lock:
+            slot = int(now // self.bucket_seconds) % self.period
+            return {
+                f'{metric}:{room_type}': {
+                    'expected': round(b.expected(slot), 2),
+                    'spread': round(b.spread(slot), 2),
+                    'open_bucket': round(self._open.get((metric, room_type), 0.0), 2),
+                    'samples': b.samples,
+                    'ready': b.samples >= self.min_samples,
+                }
+                for (metric, room_type), b in sorted(self._baselines.items())
+            }
+
+
+class ChangeFeed:
+    """
+    Feeds an AnomalyDetector from the booking database's `cambios` log.
+
+    Every `interval` seconds it reads the reservas entries after the last
+    version seen, compares each reservation with its previous state and
+    emits a booking for inserts and a cancellation when a reservation
+    moves to 'anulada'. Deletes are ignored: they come from the archiver
+    and admin clean-ups, not from guests. Only reservations that can still
+    be cancelled (pending or confirmed, not checked out yet) are kept in
+    memory (status, room type, amount, check-out), so the state grows with
+    the forward book rather than the whole history. Reads use the
+    analytics read-only pool.
+    """
+
+    def __init__(self, pool, detector: AnomalyDetector, interval: float = 2.0):
+        self.pool = pool
+        self.detector = detector
+        self.interval = interval
+        self.version: Optional[int] = None
+        self._states: Dict[int, Tuple[str, str, float, str]] = {}
+        self._pruned: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _rows(self, conn, ids) -> Dict[int, Tuple[str, str, float, str]]:
+        rows = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            for res_id, estado, tipo, monto, fecha_fin in conn.execute(f'''
+                SELECT r.id, r.estado, COALESCE(h.tipo, '?'), COALESCE(r.monto_total, 0), COALESCE(r.fecha_fin, '')
+                FROM reservas r LEFT JOIN habitaciones h ON h.id = r.habitacion_id
+                WHERE r.id IN ({','.join('?' for _ in chunk)})
+            ''', chunk):
+                rows[res_id] = (estado, tipo, float(monto), fecha_fin)
+        return rows
+
+    @staticmethod
+    def _cancellable(state, today: str) -> bool:
+        return state is not None and state[0] in OPEN_STATES and state[3] >= today
+
+    def _apply(self, res_id: int, inserted: bool, before, after, at: float, today: str):
+        if inserted and before is None:
+            if after is not None and after[0] != 'anulada':
+                self.detector.booking(after[1], after[2], at)
+        elif before is not None and after is not None and after[0] == 'anulada':
+            self.detector.cancellation(before[1], before[2], at)
+        if self._cancellable(after, today):
+            self._states[res_id] = after
+        else:
+            self._states.pop(res_id, None)
+
+    def _prune(self, today: str):
+        # Once a day, forget stays that have checked out
+        if self._pruned != today:
+            self._states = {res_id: state for res_id, state in self._states.items() if self._cancellable(state, today)}
+            self._pruned = today
+
+    def warm_up(self, days: int = 30) -> int:
+        """
+        Train the baselines on the change log still retained (compaction keeps
+        about 30 days), then remember every current reservation's state.
+
+        Historical statuses are not stored, so each reservation is replayed
+        once from its current row: a booking at its insert time and, if it
+        is cancelled now, a cancellation at its last change. Only the
+        reservations that can still be cancelled are remembered. Returns
+        the events replayed.
+        """
+        today = date.today().isoformat()
+        with self.pool.connection() as conn:
+            self.version = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'cambios'").fetchone()[0]
+            history = conn.execute('''
+                SELECT registro_id, MIN(CASE WHEN operacion = 'insert' THEN strftime('%s', fecha) END),
+                       MAX(strftime('%s', fecha))
+                FROM cambios
+                WHERE tabla = 'reservas' AND fecha >= datetime('now', ?)
+                GROUP BY registro_id
+            ''', (f'-{int(days)} days',)).fetchall()
+            current = self._rows(conn, [res_id for res_id, _, _ in history])
+            tracked = conn.execute(f'''
+                SELECT r.id, r.estado, COALESCE(h.tipo, '?'), COALESCE(r.monto_total, 0), r.fecha_fin
+                FROM reservas r LEFT JOIN habitaciones h ON h.id = r.habitacion_id
+                WHERE r.estado IN ({','.join('?' for _ in OPEN_STATES)}) AND r.fecha_fin >= ?
+            ''', OPEN_STATES + (today,)).fetchall()
+        events = []
+        for res_id, inserted_at, last_at in history:
+            state = current.get(res_id)
+            if state is None or inserted_at is None:
+                continue
+            events.append((float(inserted_at), 'booking', state))
+            if state[0] == 'anulada':
+                events.append((float(last_at), 'cancellation', state))
+        for at, kind, (_, tipo, monto, _) in sorted(events, key=lambda e: e[0]):
+            getattr(self.detector, kind)(tipo, monto, at)
+        self.detector.advance(time.time())
+        # Replayed history must not show up as live alerts
+        self.detector.clear_alerts()
+        self._states = {res_id: (estado, tipo, float(monto), fecha_fin) for res_id, estado, tipo, monto, fecha_fin in tracked}
+        self._pruned = today
+        return len(events)
+
+    def poll(self) -> int:
+        """Process new change log entries; returns the reservations that changed."""
+        now = time.time()
+        today = date.today().isoformat()
+        with self.pool.connection() as conn:
+            if self.version is None:
+                self.version = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'cambios'").fetchone()[0]
+            changes = conn.execute('''
+                SELECT registro_id, MAX(version), MAX(operacion = 'insert') FROM cambios
+                WHERE tabla = 'reservas' AND version > ? GROUP BY registro_id
+            ''', (self.version,)).fetchall()
+            if changes:
+                self.version = max(v for _, v, _ in changes)
+                ids = [res_id for res_id, _, _ in changes]
+                rows = self._rows(conn, ids)
+        self._prune(today)
+        for res_id, _, inserted in changes:
+            self._apply(res_id, bool(inserted), self._states.get(res_id), rows.get(res_id), now, today)
+        self.detector.advance(now)
+        return len(changes)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Anomaly change feed failed: {e}")
+
+    def available(self) -> bool:
+        """The change log exists (the booking API's migrations have run on this database)."""
+        try:
+            with self.pool.connection() as conn:
+                return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cambios'").fetchone() is not None
+        except Exception:
+            return False
+
+    def start(self, warm_up_days: int = 30) -> bool:
+        """Warm up and start polling; False when there is no change log to follow."""
+        if not self.available():
+            logger.warning("Anomaly detection disabled: no change log (cambios) in this database")
+            return False
+        if self._thread is None:
+            try:
+                replayed = self.warm_up(warm_up_days)
+                logger.info(f"Anomaly baselines warmed up with {replayed} historical events")
+            except Exception as e:
+                logger.error(f"Anomaly warm-up failed, starting cold: {e}")
+            self._thread = threading.Thread(target=self._run, name='anomaly-feed', daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict:
+        return {'version': self.version, 'tracked_reservations': len(self._states), 'events': self.detector.events}
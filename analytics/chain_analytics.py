@@ -0,0 +1,178 @@
+# Chain Analytics
+# Pacific Reef Hotel Management System - Cross-property reports over per-property shards
+
+import time
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Tuple
+
+from hotel_analytics import HotelAnalytics
+from aggregates import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+
+class ChainAnalytics:
+    """
+    Chain-wide occupancy, revenue and customer reports.
+
+    Each report asks every property's HotelAnalytics for a partial
+    aggregate (sums, counts, per-day arrays, quantile sketches) in
+    parallel, then merges the partials. Occupancy and revenue ship only
+    aggregates; the customer report ships one small row per guest
+    (email hash -> bookings, spend) so guests can be matched across
+    shards, never the reservations or the addresses themselves. SQLite
+    releases the GIL while it runs a query, so threads are enough to
+    overlap the shard scans. A shard that fails or times out is reported
+    under 'failed' and the chain figures cover the others.
+    """
+
+    def __init__(self, engines: Dict[str, HotelAnalytics], max_workers: int = None, timeout: float = 30.0):
+        """
+        Args:
+            engines: HotelAnalytics per property code
+            max_workers: Fan-out threads (default: one per property)
+            timeout: Seconds to wait for the slowest shard
+        """
+        self.engines = engines
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or max(len(engines), 1),
+                                           thread_name_prefix='chain-analytics')
+
+    def _fan_out(self, partial: Callable[[HotelAnalytics], Dict]) -> Tuple[Dict, Dict, Dict]:
+        """Run `partial` on every shard at once; returns (results, errors, seconds) per property."""
+        started = time.perf_counter()
+        timings = {}
+
+        def timed(code, engine):
+            result = partial(engine)
+            timings[code] = round(time.perf_counter() - started, 4)
+            return result
+
+        futures = {code: self.executor.submit(timed, code, engine) for code, engine in self.engines.items()}
+        wait(futures.values(), timeout=self.timeout)
+        results, errors = {}, {}
+        for code, future in futures.items():
+            if not future.done():
+                future.cancel()
+                errors[code] = f'timed out after {self.timeout}s'
+            elif future.exception() is not None:
+                logger.error(f"Chain analytics failed on property {code}: {future.exception()}")
+                errors[code] = str(future.exception())
+            else:
+                results[code] = future.result()
+        return results, errors, timings
+
+    @staticmethod
+    def _envelope(data: Dict, errors: Dict, timings: Dict) -> Dict:
+        return {**data, 'failed': errors, 'shard_seconds': timings}
+
+    def occupancy(self, start_date: str, end_date: str) -> Dict:
+        """
+        Chain occupancy: room-nights sold over room-nights available, overall and per night.
+
+        Args:
+            start_date: First night in YYYY-MM-DD format
+            end_date: Last night in YYYY-MM-DD format (inclusive)
+
+        Returns:
+            Dictionary with chain and per-property occupancy
+        """
+        partials, errors, timings = self._fan_out(lambda e: e.get_occupancy_partial(start_date, end_date))
+        days = int((np.datetime64(end_date, 'D') - np.datetime64(start_date, 'D')).astype(int)) + 1
+        rooms = sum(p['rooms'] for p in partials.values())
+        sold = sum((p['sold'] for p in partials.values()), np.zeros(days, dtype=np.int64))
+        daily = np.round(sold / rooms * 100, 2) if rooms else np.zeros(days)
+        dates = np.arange(np.datetime64(start_date, 'D'), np.datetime64(start_date, 'D') + days).astype(str)
+
+        def rate(part_sold, part_rooms):
+            return round(float(part_sold) / (part_rooms * days) * 100, 2) if part_rooms and days else 0.0
+
+        return self._envelope({
+            'period': {'start': start_date, 'end': end_date},
+            'chain': {
+                'rooms': rooms,
+                'room_nights_available': rooms * days,
+                'room_nights_sold': int(sold.sum()),
+                'occupancy_rate': rate(sold.sum(), rooms),
+                'peak_occupancy': float(daily.max()) if days else 0.0,
+            },
+            'properties': {code: {'rooms': p['rooms'], 'room_nights_sold': int(p['sold'].sum()),
+                                  'occupancy_rate': rate(p['sold'].sum(), p['rooms'])}
+                           for code, p in partials.items()},
+            'daily_data': [{'date': d, 'rooms_sold': int(s), 'occupancy_rate': float(o)}
+                           for d, s, o in zip(dates, sold, daily)],
+        }, errors, timings)
+
+    def revenue(self, start_date: str, end_date: str) -> Dict:
+        """
+        Chain revenue, ADR and booking value percentiles from merged sketches.
+
+        Args:
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+
+        Returns:
+            Dictionary with chain and per-property revenue metrics
+        """
+        partials, errors, timings = self._fan_out(lambda e: e.get_revenue_partial(start_date, end_date))
+        values = QuantileSketch()
+        for p in partials.values():
+            values.merge(p['booking_values'])
+        revenue = sum(p['revenue'] for p in partials.values())
+        nights = sum(p['room_nights'] for p in partials.values())
+
+        def adr(part_revenue, part_nights):
+            return round(part_revenue / part_nights, 2) if part_nights else None
+
+        return self._envelope({
+            'period': {'start': start_date, 'end': end_date},
+            'chain': {
+                'bookings': sum(p['bookings'] for p in partials.values()),
+                'total_revenue': round(revenue, 2),
+                'room_nights': nights,
+                'average_daily_rate': adr(revenue, nights),
+                'booking_value': values.summary(),
+            },
+            'properties': {code: {'bookings': p['bookings'], 'total_revenue': round(p['revenue'], 2),
+                                  'average_daily_rate': adr(p['revenue'], p['room_nights']),
+                                  'booking_value': p['booking_values'].summary()}
+                           for code, p in partials.items()},
+        }, errors, timings)
+
+    def customers(self) -> Dict:
+        """
+        Chain customer base, counting a guest known to several properties once.
+
+        Returns:
+            Dictionary with unique, active, repeat and multi-property guest counts
+            and the distribution of chain-wide spend per guest; a multi-property
+            guest has bookings at more than one property, not just accounts
+        """
+        partials, errors, timings = self._fan_out(lambda e: e.get_customer_partial())
+        merged: Dict[str, list] = {}
+        for p in partials.values():
+            for key, (bookings, spent) in p['customers'].items():
+                totals = merged.setdefault(key, [0, 0.0, 0])
+                totals[0] += bookings
+                totals[1] += spent
+                totals[2] += 1 if bookings > 0 else 0
+        table = np.array(list(merged.values()), dtype=np.float64).reshape(-1, 3)
+        bookings, spent, properties_booked = table[:, 0], table[:, 1], table[:, 2]
+        active = bookings > 0
+        return self._envelope({
+            'chain': {
+                'unique_customers': int(len(merged)),
+                'active_customers': int(active.sum()),
+                'repeat_customers': int((bookings > 1).sum()),
+                'multi_property_customers': int((properties_booked > 1).sum()),
+                'spend_per_active_customer': QuantileSketch().add(spent[active]).summary(),
+            },
+            'properties': {code: {'customers': len(p['customers']),
+                                  'active_customers': sum(1 for b, _ in p['customers'].values() if b)}
+                           for code, p in partials.items()},
+        }, errors, timings)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
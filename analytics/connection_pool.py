@@ -0,0 +1,151 @@
+# Read-Only Connection Pool
+# Pacific Reef Hotel Management System - Analytics Database Access
+
+import sqlite3
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+from urllib.parse import quote
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_sqlite_uri(db_connection_string: str) -> str:
+    """
+    Translate the configured connection string into a read-only SQLite URI.
+
+    Accepts plain file paths ('hotel_management.db'), SQLAlchemy-style
+    URLs ('sqlite:///hotel_management.db') and SQLite URIs
+    ('file:hotel_management.db?cache=shared').
+
+    Args:
+        db_connection_string: Database location as configured for the engine
+
+    Returns:
+        SQLite 'file:' URI with mode=ro applied
+    """
+    target = db_connection_string
+    if target.startswith('sqlite:///'):
+        target = target[len('sqlite:///'):]
+
+    if target.startswith('file:'):
+        path, _, query = target[len('file:'):].partition('?')
+        params = [p for p in query.split('&') if p and not p.startswith('mode=')]
+    else:
+        path, params = quote(target), []
+
+    params.append('mode=ro')
+    return f"file:{path}?{'&'.join(params)}"
+
+
+class ReadOnlyConnectionPool:
+    """
+    Thread-safe pool of read-only SQLite connections.
+
+    Connections are opened lazily up to max_size, in mode=ro with
+    query_only enabled, so concurrent analytics requests each get their
+    own connection and never take the write lock used by the booking API.
+    """
+
+    def __init__(self, db_connection_string: str, max_size: int = 8, timeout: float = 10.0,
+                 factory: type = sqlite3.Connection, on_connect: Optional[Callable] = None):
+        """
+        Initialize the pool.
+
+        Args:
+            db_connection_string: Path, sqlite:/// URL or file: URI of the database
+            max_size: Maximum number of open connections
+            timeout: Seconds to wait for a free connection before failing
+            factory: sqlite3.Connection subclass used for new connections
+            on_connect: Called with each new connection before query_only is set
+                        (e.g. to ATTACH databases or create TEMP views)
+        """
+        self.uri = resolve_sqlite_uri(db_connection_string)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.factory = factory
+        self.on_connect = on_connect
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        """Open a new read-only connection with query-only pragmas."""
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False, timeout=self.timeout,
+                               factory=self.factory)
+        # temp_store first: changing it later would drop TEMP objects created by on_connect
+        conn.execute('PRAGMA temp_store = MEMORY')
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Take an idle connection, opening a new one if the pool is not full."""
+        if self._closed:
+            raise RuntimeError('Connection pool is closed')
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.max_size
+            if can_open:
+                self._opened += 1
+
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f'No analytics connection available after {self.timeout}s')
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool."""
+        if self._closed:
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager yielding a pooled read-only connection."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close every idle connection and refuse new checkouts."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def stats(self) -> dict:
+        """Return current pool occupancy."""
+        return {
+            'uri': self.uri,
+            'max_size': self.max_size,
+            'open_connections': self._opened,
+            'idle_connections': self._idle.qsize()
+        }
@@ -8,8 +8,18 @@ import seaborn as sns
 from datetime import datetime, timedelta
 import sqlite3
 import json
+import hashlib
 from typing import Dict, List, Optional, Tuple
 import logging
+import os
+import sys
+from connection_pool import ReadOnlyConnectionPool
+from snapshots import SnapshotReader
+from aggregates import QuantileSketch
+
+# Shared modules (archive, ...) live at the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import archive
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,22 +31,289 @@ class HotelAnalytics:
     Provides data analysis, reporting, and business intelligence features.
     """
     
-    def __init__(self, db_connection_string: str = None):
-        """Initialize the analytics engine with database connection."""
+    def __init__(self, db_connection_string: str = None, pool_size: int = 8, snapshot_dir: str = None,
+                 connection_factory: type = sqlite3.Connection, archive_path: str = None):
+        """
+        Initialize the analytics engine with database connection.
+        
+        Args:
+            db_connection_string: Path, sqlite:/// URL or file: URI of the database
+            pool_size: Maximum number of concurrent read-only connections
+            snapshot_dir: Optional Arrow snapshot directory to read from instead of SQLite
+            connection_factory: sqlite3.Connection subclass for pooled connections
+            archive_path: Optional archive database attached to every pooled connection,
+                          exposing the reservas_historicas view (hot + archived rows)
+        """
         self.db_connection = db_connection_string or "sqlite:///hotel_management.db"
+        self.pool_size = pool_size
+        self.connection_factory = connection_factory
+        self.archive_path = archive_path
+        self.snapshots = SnapshotReader(snapshot_dir) if snapshot_dir else None
         self.setup_database_connection()
         
     def setup_database_connection(self):
-        """Setup database connection for analytics."""
+        """Setup read-only connection pool for analytics."""
         try:
-            # For demonstration, using SQLite
-            # In production, this would connect to PostgreSQL/MySQL
-            self.conn = sqlite3.connect('hotel_management.db')
-            logger.info("Database connection established successfully")
+            # Connections are opened lazily, one per concurrent request,
+            # in mode=ro so analytics never competes for the write lock
+            on_connect = None
+            if self.archive_path:
+                on_connect = lambda conn: archive.attach(conn, self.archive_path, read_only=True)
+            self.pool = ReadOnlyConnectionPool(self.db_connection, max_size=self.pool_size,
+                                               factory=self.connection_factory, on_connect=on_connect)
+            logger.info(f"Analytics connection pool configured for {self.pool.uri}")
         except Exception as e:
-            logger.error(f"Failed to connect to database: {e}")
-            self.conn = None
+            logger.error(f"Failed to configure database pool: {e}")
+            self.pool = None
+    
+    def _read_sql(self, query: str, params: Optional[List] = None) -> pd.DataFrame:
+        """Run a read-only query on a pooled connection and return a DataFrame."""
+        if self.pool is None:
+            raise RuntimeError("Analytics database pool is not available")
+        with self.pool.connection() as conn:
+            return pd.read_sql_query(query, conn, params=params)
+    
+    @property
+    def _reservations(self) -> str:
+        """Reservations relation for history queries: hot + archived rows when an archive is attached."""
+        return 'reservas_historicas' if self.archive_path else 'reservas'
+    
+    def _use_snapshots(self) -> bool:
+        """True when analytics should read from the Arrow snapshot."""
+        return self.snapshots is not None and self.snapshots.available()
+    
+    def data_freshness(self) -> Dict:
+        """
+        Describe where analytics data is read from and how current it is.
+        
+        Snapshots only export the hot tables, so reports served from them
+        leave out archived reservations; the chain partials and the
+        simulator read reservas_historicas whenever an archive is configured.
+        
+        Returns:
+            Dictionary with the data source, snapshot age (if any) and
+            whether archived reservations are included
+        """
+        if self._use_snapshots():
+            return {**self.snapshots.freshness(), 'archive_included': False}
+        return {'source': 'live', 'age_seconds': 0, 'archive_included': bool(self.archive_path)}
+    
+    def get_historical_bookings(self, start_date: str, end_date: str) -> Dict:
+        """
+        Monthly bookings and revenue across the hot table and the archive.
+        
+        Args:
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            
+        Returns:
+            Dictionary with per-month totals split by origin ('activa' / 'archivo')
+        """
+        if not self.archive_path:
+            raise RuntimeError("Archive database not configured (ANALYTICS_ARCHIVE_DB)")
+        query = """
+        SELECT 
+            strftime('%Y-%m', fecha_inicio) as month,
+            origen,
+            COUNT(*) as bookings,
+            SUM(CASE WHEN estado != 'anulada' THEN monto_total ELSE 0 END) as revenue,
+            SUM(estado = 'anulada') as cancelled
+        FROM reservas_historicas
+        WHERE fecha_inicio BETWEEN ? AND ?
+        GROUP BY month, origen
+        ORDER BY month, origen
+        """
+        df = self._read_sql(query, [start_date, end_date])
+        return {
+            'period': {'start': start_date, 'end': end_date},
+            'totals': {
+                'bookings': int(df['bookings'].sum()) if not df.empty else 0,
+                'revenue': round(float(df['revenue'].sum()), 2) if not df.empty else 0.0,
+                'archived_bookings': int(df.loc[df['origen'] == 'archivo', 'bookings'].sum()) if not df.empty else 0
+            },
+            'monthly': df.to_dict('records')
+        }
+    
+    def get_occupancy_partial(self, start_date: str, end_date: str) -> Dict:
+        """
+        Room-nights sold per day on this property, as a mergeable partial.
+        
+        Partials from several properties merge by adding 'rooms' and the
+        'sold' arrays element-wise (see ChainAnalytics).
+        
+        Args:
+            start_date: First night in YYYY-MM-DD format
+            end_date: Last night in YYYY-MM-DD format (inclusive)
+            
+        Returns:
+            Dictionary with the room count and a per-night NumPy array of rooms sold
+        """
+        first = np.datetime64(start_date, 'D')
+        days = int((np.datetime64(end_date, 'D') - first).astype(int)) + 1
+        rooms = int(self._read_sql("SELECT COUNT(*) AS rooms FROM habitaciones")['rooms'].iloc[0])
+        stays = self._read_sql(f"""
+            SELECT fecha_inicio, fecha_fin FROM {self._reservations}
+            WHERE estado != 'anulada' AND fecha_inicio <= ? AND fecha_fin > ?
+        """, [end_date, start_date])
+        sold = np.zeros(days + 1, dtype=np.int64)
+        if not stays.empty:
+            # Difference array: +1 on the first night, -1 after the last one, clipped to the window
+            check_in = pd.to_datetime(stays['fecha_inicio'], errors='coerce').values.astype('datetime64[D]')
+            check_out = pd.to_datetime(stays['fecha_fin'], errors='coerce').values.astype('datetime64[D]')
+            valid = ~(np.isnat(check_in) | np.isnat(check_out))
+            begin = np.clip((check_in[valid] - first).astype(int), 0, days)
+            end = np.clip((check_out[valid] - first).astype(int), 0, days)
+            keep = begin < end
+            np.add.at(sold, begin[keep], 1)
+            np.add.at(sold, end[keep], -1)
+        return {'rooms': rooms, 'start': start_date, 'sold': np.cumsum(sold)[:days]}
+    
+    def get_revenue_partial(self, start_date: str, end_date: str, sketch_accuracy: float = 0.01) -> Dict:
+        """
+        Revenue of bookings checking in within the period, as a mergeable partial.
+        
+        Args:
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            sketch_accuracy: Relative accuracy of the booking value sketch
+            
+        Returns:
+            Dictionary with booking count, revenue, room-nights and a
+            QuantileSketch of booking values
+        """
+        df = self._read_sql(f"""
+            SELECT monto_total, MAX(julianday(fecha_fin) - julianday(fecha_inicio), 0) AS nights
+            FROM {self._reservations}
+            WHERE estado != 'anulada' AND fecha_inicio BETWEEN ? AND ?
+        """, [start_date, end_date])
+        amounts = pd.to_numeric(df['monto_total'], errors='coerce').fillna(0.0).values
+        return {
+            'bookings': int(len(df)),
+            'revenue': float(amounts.sum()),
+            'room_nights': float(pd.to_numeric(df['nights'], errors='coerce').fillna(0.0).sum()),
+            'booking_values': QuantileSketch(sketch_accuracy).add(amounts)
+        }
     
+    def get_customer_partial(self) -> Dict:
+        """
+        Bookings and spend per guest on this property, keyed by a hash of the email.
+        
+        The same guest staying at two resorts has one account per shard;
+        the normalised email hash lets the chain report count them once
+        without shipping addresses between services.
+        
+        Returns:
+            Dictionary mapping email hash to [bookings, spent]
+        """
+        df = self._read_sql(f"""
+            SELECT u.email, COUNT(r.id) AS bookings, COALESCE(SUM(r.monto_total), 0) AS spent
+            FROM usuarios u
+            LEFT JOIN {self._reservations} r ON r.usuario_id = u.id AND r.estado != 'anulada'
+            WHERE u.rol = 'client'
+            GROUP BY u.id
+        """)
+        customers = {}
+        for email, bookings, spent in df.itertuples(index=False):
+            key = hashlib.sha256((email or '').strip().lower().encode()).hexdigest()
+            totals = customers.setdefault(key, [0, 0.0])
+            totals[0] += int(bookings)
+            totals[1] += float(spent)
+        return {'customers': customers}
+
+    def get_simulation_inputs(self, horizon_days: int = 30, history_days: int = 365,
+                              cancellation_prior_weight: float = 20.0) -> Dict:
+        """
+        Per room type demand, cancellation and price history for the
+        Monte Carlo simulator (see simulation.py).
+
+        Demand is the room-nights booked per past night, cancelled
+        bookings included (they were demand before they cancelled), by
+        day of week. Cancellation rates of thinly booked types are shrunk
+        towards the property-wide rate.
+
+        Args:
+            horizon_days: Future nights to load bookings on the books for, from today
+            history_days: Past nights the demand and rates are estimated from
+            cancellation_prior_weight: Bookings' worth of weight given to the property-wide rate
+
+        Returns:
+            Dictionary of NumPy arrays indexed by room type (and day of week or future night)
+        """
+        today = np.datetime64(datetime.now().strftime('%Y-%m-%d'), 'D')
+        first = today - history_days
+        end = today + horizon_days
+        rooms = self._read_sql("""
+            SELECT tipo, COUNT(*) AS rooms, AVG(precio_actual) AS price
+            FROM habitaciones WHERE estado != 'fuera de servicio'
+            GROUP BY tipo ORDER BY tipo
+        """)
+        stays = self._read_sql(f"""
+            SELECT h.tipo, r.fecha_inicio, r.fecha_fin, r.estado, r.monto_total
+            FROM {self._reservations} r JOIN habitaciones h ON h.id = r.habitacion_id
+            WHERE r.fecha_fin > ? AND r.fecha_inicio < ?
+        """, [str(first), str(end)])
+        types = rooms['tipo'].tolist()
+        index = {t: i for i, t in enumerate(types)}
+        stays = stays[stays['tipo'].isin(index)]
+        check_in = pd.to_datetime(stays['fecha_inicio'], errors='coerce').values.astype('datetime64[D]')
+        check_out = pd.to_datetime(stays['fecha_fin'], errors='coerce').values.astype('datetime64[D]')
+        valid = ~(np.isnat(check_in) | np.isnat(check_out)) & (check_in < check_out)
+        stays, check_in, check_out = stays[valid], check_in[valid], check_out[valid]
+        type_ids = stays['tipo'].map(index).values.astype(np.int64)
+        cancelled = (stays['estado'] == 'anulada').values
+        active = stays['estado'].isin(['pendiente', 'confirmada']).values
+        amounts = pd.to_numeric(stays['monto_total'], errors='coerce').fillna(0.0).values
+        nights = (check_out - check_in).astype(np.int64)
+
+        def nights_per_day(mask, origin, days):
+            # Difference array per type over the window, clipped at both ends
+            counts = np.zeros((len(types), days + 1), dtype=np.int64)
+            begin = np.clip((check_in[mask] - origin).astype(np.int64), 0, days)
+            finish = np.clip((check_out[mask] - origin).astype(np.int64), 0, days)
+            np.add.at(counts, (type_ids[mask], begin), 1)
+            np.add.at(counts, (type_ids[mask], finish), -1)
+            return np.cumsum(counts, axis=1)[:, :days]
+
+        # Demand history starts with the first recorded stay, not an empty year
+        past = check_in < today
+        if past.any():
+            first = max(first, check_in[past].min())
+        history = int((today - first).astype(int))
+        demand = nights_per_day(past, first, history)
+        weekday = (np.arange(history) + int(first.astype(int)) + 3) % 7
+        demand_mean = np.zeros((len(types), 7))
+        demand_var = np.zeros((len(types), 7))
+        for day in range(7):
+            sample = demand[:, weekday == day]
+            if sample.shape[1]:
+                demand_mean[:, day] = sample.mean(axis=1)
+                demand_var[:, day] = sample.var(axis=1)
+
+        decided = past & (check_in >= first)
+        overall_rate = cancelled[decided].mean() if decided.any() else 0.0
+        bookings = np.bincount(type_ids[decided], minlength=len(types))
+        cancellations = np.bincount(type_ids[decided], weights=cancelled[decided], minlength=len(types))
+        cancel_rate = (cancellations + overall_rate * cancellation_prior_weight) / (bookings + cancellation_prior_weight)
+
+        sold = ~cancelled
+        revenue = np.bincount(type_ids[sold], weights=amounts[sold], minlength=len(types))
+        sold_nights = np.bincount(type_ids[sold], weights=nights[sold], minlength=len(types))
+        list_price = pd.to_numeric(rooms['price'], errors='coerce').fillna(0.0).values
+        adr = np.where(sold_nights > 0, revenue / np.maximum(sold_nights, 1), list_price)
+
+        return {
+            'start': str(today),
+            'types': types,
+            'rooms': rooms['rooms'].values.astype(np.int64),
+            'demand_mean': demand_mean,
+            'demand_var': demand_var,
+            'cancel_rate': cancel_rate,
+            'adr': adr,
+            'on_the_books': nights_per_day(active, today, horizon_days),
+            'weekday': (np.arange(horizon_days) + int(today.astype(int)) + 3) % 7,
+            'history_nights': history,
+        }
+
     def get_occupancy_analytics(self, start_date: str, end_date: str) -> Dict:
         """
         Calculate occupancy analytics for the specified date range.
@@ -61,7 +338,10 @@ class HotelAnalytics:
             ORDER BY date
             """
             
-            df = pd.read_sql_query(query, self.conn, params=[start_date, end_date])
+            if self._use_snapshots():
+                df = self.snapshots.daily_occupancy(start_date, end_date)
+            else:
+                df = self._read_sql(query, [start_date, end_date])
             
             if df.empty:
                 return self._generate_mock_occupancy_data(start_date, end_date)
@@ -118,7 +398,10 @@ class HotelAnalytics:
             ORDER BY date
             """
             
-            df = pd.read_sql_query(query, self.conn, params=[start_date, end_date])
+            if self._use_snapshots():
+                df = self.snapshots.daily_revenue(start_date, end_date)
+            else:
+                df = self._read_sql(query, [start_date, end_date])
             
             if df.empty:
                 return self._generate_mock_revenue_data(start_date, end_date)
@@ -173,7 +456,10 @@ class HotelAnalytics:
             ORDER BY total_spent DESC
             """
             
-            df = pd.read_sql_query(query, self.conn)
+            if self._use_snapshots():
+                df = self.snapshots.customer_summary()
+            else:
+                df = self._read_sql(query)
             
             if df.empty:
                 return self._generate_mock_customer_data()
@@ -225,7 +511,10 @@ class HotelAnalytics:
             ORDER BY total_revenue DESC
             """
             
-            df = pd.read_sql_query(query, self.conn)
+            if self._use_snapshots():
+                df = self.snapshots.room_performance()
+            else:
+                df = self._read_sql(query)
             
             if df.empty:
                 return self._generate_mock_room_performance_data()
@@ -265,7 +554,11 @@ class HotelAnalytics:
             ORDER BY date
             """
             
-            df = pd.read_sql_query(query, self.conn)
+            if self._use_snapshots():
+                since = (datetime.now() - timedelta(days=182)).strftime('%Y-%m-%d')
+                df = self.snapshots.booking_history(since)
+            else:
+                df = self._read_sql(query)
             
             if df.empty:
                 return self._generate_mock_predictive_data()
@@ -561,9 +854,9 @@ class HotelAnalytics:
         ]
     
     def __del__(self):
-        """Close database connection when object is destroyed."""
-        if hasattr(self, 'conn') and self.conn:
-            self.conn.close()
+        """Close pooled connections when object is destroyed."""
+        if hasattr(self, 'pool') and self.pool:
+            self.pool.close()
 
 
 # Example usage and testing
@@ -0,0 +1,274 @@
+# Overbooking Simulation
+# Pacific Reef Hotel Management System - Monte Carlo what-if scenarios for overbooking and price moves
+
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _pickup(rng: np.random.Generator, mean: np.ndarray, dispersion: np.ndarray, scenarios: int) -> np.ndarray:
+    """Negative binomial draws with the given mean and variance/mean ratio (Poisson where it is <= 1)."""
+    shape = (scenarios,) + mean.shape
+    draws = rng.poisson(np.broadcast_to(mean, shape))
+    over = dispersion > 1.0 + 1e-9
+    if over.any():
+        p = 1.0 / dispersion[over]
+        n = mean[over] * p / (1.0 - p)
+        positive = n > 0
+        values = np.zeros((scenarios, int(over.sum())), dtype=np.int64)
+        values[:, positive] = rng.negative_binomial(n[positive], p[positive], size=(scenarios, int(positive.sum())))
+        draws[:, over] = values
+    return draws
+
+
+def _thin(rng: np.random.Generator, counts: np.ndarray, p) -> np.ndarray:
+    """Binomial(counts, p) drawn only where counts > 0 (most sweep cells add nothing)."""
+    result = np.zeros_like(counts)
+    cells = counts > 0
+    result[cells] = rng.binomial(counts[cells], np.broadcast_to(p, counts.shape)[cells])
+    return result
+
+
+def simulate_batch(model: Dict, params: Dict, scenarios: int, seed: int) -> Dict:
+    """
+    Run `scenarios` scenarios and return mergeable aggregates.
+
+    Per room type t and night d, each scenario draws the bookings still
+    to come (negative binomial around the historical demand for that
+    weekday, less what is already on the books, scaled by the price
+    elasticity), accepts them up to rooms + overbooking, then cancels
+    and no-shows them binomially. Guests who show up beyond the room
+    count are walked at `walk_cost` each. Nights are simulated
+    independently; stays spanning several nights are not linked.
+
+    The `levels` sweep (ascending) reuses the same draws for every
+    overbooking level, so the comparison between levels is not noise.
+    """
+    rng = np.random.default_rng(seed)
+    rooms = model['rooms'][:, None]
+    otb = model['on_the_books']
+    multiplier = (1.0 + params['price_change']) ** params['elasticity']
+    expected = model['demand_mean'][:, model['weekday']]
+    variance = model['demand_var'][:, model['weekday']]
+    dispersion = np.where(expected > 0, variance / np.maximum(expected, 1e-9), 1.0)
+    pickup = _pickup(rng, np.maximum(expected - otb, 0.0) * multiplier, dispersion, scenarios)
+
+    cancel = model['cancel_rate'][:, None]
+    show = 1.0 - params['no_show_rate']
+    adr = model['adr'][:, None]
+    walk_cost = adr * params['walk_cost_factor']
+
+    def outcome(limit):
+        # Bookings already taken stay even if they exceed today's limit
+        accepted = np.minimum(otb + pickup, np.maximum(otb, rooms + limit))
+        kept = _thin(rng, accepted, 1.0 - cancel)
+        arrived = _thin(rng, kept, show)
+        occupied = np.minimum(arrived, rooms)
+        walks = arrived - occupied
+        # Only bookings still to come pay the new price
+        new_share = np.where(accepted > 0, (accepted - otb).clip(0) / np.maximum(accepted, 1), 0.0)
+        revenue = occupied * adr * (1.0 + params['price_change'] * new_share) - walks * walk_cost
+        return occupied, walks, revenue
+
+    occupied, walks, revenue = outcome(params['overbooking'][:, None])
+    types, days = otb.shape
+    width = int(model['rooms'].max()) + 1
+    cells = (np.arange(types)[:, None] * days + np.arange(days)[None, :]) * width
+    histogram = np.bincount((cells[None] + occupied).ravel(), minlength=types * days * width)
+
+    # Sweep: each level adds the bookings it accepts on top of the previous one and only
+    # those are thinned, so levels share every draw and differ only by the extra rooms sold
+    sweep_revenue, sweep_walks, sweep_walk_nights = [], [], []
+    accepted = np.zeros_like(pickup)
+    arrived = np.zeros_like(pickup)
+    for level in params['levels']:
+        extra = np.minimum(otb + pickup, np.maximum(otb, rooms + level)) - accepted
+        accepted += extra
+        arrived += _thin(rng, _thin(rng, extra, 1.0 - cancel), show)
+        level_walks = arrived - np.minimum(arrived, rooms)
+        new_share = np.where(accepted > 0, (accepted - otb).clip(0) / np.maximum(accepted, 1), 0.0)
+        level_revenue = ((arrived - level_walks) * adr * (1.0 + params['price_change'] * new_share)
+                         - level_walks * walk_cost)
+        sweep_revenue.append(level_revenue.sum(axis=(0, 2)))
+        sweep_walks.append(level_walks.sum(axis=(0, 2)))
+        sweep_walk_nights.append((level_walks > 0).sum(axis=(0, 2)))
+
+    return {
+        'scenarios': scenarios,
+        'occupied': histogram.reshape(types, days, width),
+        'revenue': revenue.sum(axis=0),
+        'walks': walks.sum(axis=0),
+        'walk_scenarios': (walks > 0).sum(axis=0),
+        'any_walk_scenarios': int((walks > 0).any(axis=(1, 2)).sum()),
+        'totals': revenue.sum(axis=2),
+        'sweep_revenue': np.array(sweep_revenue).reshape(len(params['levels']), types),
+        'sweep_walks': np.array(sweep_walks).reshape(len(params['levels']), types),
+        'sweep_walk_nights': np.array(sweep_walk_nights).reshape(len(params['levels']), types),
+    }
+
+
+def merge(partials: Iterable[Dict]) -> Dict:
+    """Add batch aggregates together (per-scenario totals are concatenated)."""
+    merged = None
+    for part in partials:
+        if merged is None:
+            merged = {k: (v.copy() if isinstance(v, np.ndarray) else v) for k, v in part.items()}
+            continue
+        for key, value in part.items():
+            if key == 'totals':
+                merged[key] = np.concatenate([merged[key], value])
+            else:
+                merged[key] = merged[key] + value
+    return merged
+
+
+def _histogram_quantile(histogram: np.ndarray, q: float) -> np.ndarray:
+    """Quantile of integer counts from per-cell histograms over the last axis."""
+    cumulative = np.cumsum(histogram, axis=-1)
+    return (cumulative < q * cumulative[..., -1:]).sum(axis=-1)
+
+
+class OverbookingSimulator:
+    """
+    Monte Carlo overbooking and pricing what-if engine over HotelAnalytics.
+
+    Scenarios run in fixed-size batches spread over a process pool; each
+    batch returns sums and histograms, so merging costs nothing and the
+    result does not depend on how batches were split. The pool forks its
+    workers when start() is called, which the analytics API does before
+    its background threads exist.
+    """
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = 1000):
+        """
+        Args:
+            workers: Worker processes (default: CPU count; 1 runs batches in-process)
+            batch_size: Scenarios per batch
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.executor = None
+
+    def start(self) -> 'OverbookingSimulator':
+        if self.workers > 1 and self.executor is None and 'fork' in multiprocessing.get_all_start_methods():
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('fork'))
+            # All workers fork on the first submit: do it now, while the process is single-threaded
+            self.executor.submit(int).result()
+        return self
+
+    def run(self, engine, horizon_days: int = 30, scenarios: int = 10000,
+            overbooking: Union[int, Dict[str, int]] = 0, price_change: float = 0.0,
+            elasticity: float = -1.5, no_show_rate: float = 0.02, walk_cost_factor: float = 1.5,
+            levels: List[int] = (0, 1, 2, 3, 4, 5), history_days: int = 365, seed: Optional[int] = None) -> Dict:
+        """
+        Simulate the next `horizon_days` nights.
+
+        Args:
+            engine: HotelAnalytics of the property
+            horizon_days: Nights simulated, from today
+            scenarios: Number of scenarios
+            overbooking: Rooms sold beyond capacity, for all types or per type
+            price_change: Relative price move for bookings still to come (0.1 = +10%)
+            elasticity: Demand elasticity to price (demand scales by (1 + change) ** elasticity)
+            no_show_rate: Share of kept bookings that do not arrive (not recorded in reservas)
+            walk_cost_factor: Cost of walking a guest, in nights of the type's ADR
+            levels: Overbooking levels compared for the recommendation
+            history_days: Past nights the demand and rates are estimated from
+            seed: Seed for reproducible runs
+
+        Returns:
+            Dictionary with per type and night expected revenue, occupancy
+            percentiles and walk risk, per type totals and the overbooking sweep
+        """
+        model = engine.get_simulation_inputs(horizon_days, history_days)
+        types = model['types']
+        if not types:
+            raise ValueError('No rooms to simulate')
+        if isinstance(overbooking, dict):
+            unknown = set(overbooking) - set(types)
+            if unknown:
+                raise ValueError(f'Unknown room types: {sorted(unknown)}')
+            overbooking = np.array([int(overbooking.get(t, 0)) for t in types])
+        else:
+            overbooking = np.full(len(types), int(overbooking))
+        params = {
+            'overbooking': overbooking, 'price_change': float(price_change), 'elasticity': float(elasticity),
+            'no_show_rate': float(no_show_rate), 'walk_cost_factor': float(walk_cost_factor),
+            'levels': sorted({max(int(level), 0) for level in levels}) or [0],
+        }
+        sizes = [min(self.batch_size, scenarios - start) for start in range(0, scenarios, self.batch_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        seeds = [int(s.generate_state(1)[0]) for s in seeds]
+        if self.executor is not None:
+            futures = [self.executor.submit(simulate_batch, model, params, size, s) for size, s in zip(sizes, seeds)]
+            result = merge(f.result() for f in futures)
+        else:
+            result = merge(simulate_batch(model, params, size, s) for size, s in zip(sizes, seeds))
+        return self._summarize(model, params, result)
+
+    @staticmethod
+    def _summarize(model: Dict, params: Dict, result: Dict) -> Dict:
+        scenarios = result['scenarios']
+        rooms = model['rooms']
+        dates = (np.datetime64(model['start'], 'D') + np.arange(model['on_the_books'].shape[1])).astype(str).tolist()
+        quantiles = {f'p{int(q * 100)}': _histogram_quantile(result['occupied'], q) for q in (0.1, 0.5, 0.9)}
+        revenue = result['revenue'] / scenarios
+        totals = result['totals']
+        sweep = result['sweep_revenue'] / scenarios
+
+        by_type = {}
+        for t, tipo in enumerate(model['types']):
+            best = int(np.argmax(sweep[:, t]))
+            by_type[tipo] = {
+                'rooms': int(rooms[t]),
+                'overbooking': int(params['overbooking'][t]),
+                'adr': round(float(model['adr'][t]), 2),
+                'cancellation_rate': round(float(model['cancel_rate'][t]), 4),
+                'expected_revenue': round(float(revenue[t].sum()), 2),
+                'revenue_p5': round(float(np.percentile(totals[:, t], 5)), 2),
+                'revenue_p95': round(float(np.percentile(totals[:, t], 95)), 2),
+                'expected_walks': round(float(result['walks'][t].sum() / scenarios), 3),
+                'daily': [{
+                    'date': date,
+                    'on_the_books': int(model['on_the_books'][t, d]),
+                    'expected_revenue': round(float(revenue[t, d]), 2),
+                    'occupancy_p10': round(float(quantiles['p10'][t, d] / rooms[t] * 100), 1),
+                    'occupancy_p50': round(float(quantiles['p50'][t, d] / rooms[t] * 100), 1),
+                    'occupancy_p90': round(float(quantiles['p90'][t, d] / rooms[t] * 100), 1),
+                    'walk_probability': round(float(result['walk_scenarios'][t, d] / scenarios), 4),
+                } for d, date in enumerate(dates)],
+                'overbooking_sweep': [{
+                    'level': level,
+                    'expected_revenue': round(float(sweep[i, t]), 2),
+                    'expected_walks': round(float(result['sweep_walks'][i, t] / scenarios), 3),
+                    'walk_nights': round(float(result['sweep_walk_nights'][i, t] / scenarios), 3),
+                } for i, level in enumerate(params['levels'])],
+                'recommended_overbooking': params['levels'][best],
+            }
+        chain_totals = totals.sum(axis=1)
+        return {
+            'horizon': {'start': model['start'], 'days': len(dates)},
+            'scenarios': scenarios,
+            'assumptions': {
+                'price_change': params['price_change'], 'elasticity': params['elasticity'],
+                'no_show_rate': params['no_show_rate'], 'walk_cost_factor': params['walk_cost_factor'],
+                'history_nights': model['history_nights'],
+            },
+            'total': {
+                'expected_revenue': round(float(chain_totals.mean()), 2),
+                'revenue_p5': round(float(np.percentile(chain_totals, 5)), 2),
+                'revenue_p95': round(float(np.percentile(chain_totals, 95)), 2),
+                'walk_probability': round(result['any_walk_scenarios'] / scenarios, 4),
+            },
+            'room_types': by_type,
+        }
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
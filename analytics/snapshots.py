@@ -0,0 +1,418 @@
+# Columnar Snapshots
+# Pacific Reef Hotel Management System - Arrow snapshots for analytics reads
+
+import os
+import json
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from connection_pool import resolve_sqlite_uri
+
+logger = logging.getLogger(__name__)
+
+# Tables exported for analytics and the columns each snapshot keeps
+SNAPSHOT_TABLES = ['reservas', 'habitaciones', 'usuarios']
+
+# Columns never copied out of the booking database
+EXCLUDED_COLUMNS = {'usuarios': {'password'}}
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def _arrow_type(declared_type: str) -> pa.DataType:
+    """Map a declared SQLite column type to a fixed Arrow type."""
+    declared = (declared_type or '').upper()
+    if 'INT' in declared:
+        return pa.int64()
+    if any(t in declared for t in ('REAL', 'FLOA', 'DOUB', 'NUMERIC')):
+        return pa.float64()
+    return pa.string()
+
+
+class SnapshotExporter:
+    """
+    Periodically exports booking tables into memory-mappable Arrow IPC files.
+
+    Each table is written as one base file plus append-only delta files
+    holding rows whose rowid is above the last exported watermark. A cycle
+    is skipped entirely when PRAGMA data_version reports no commits since
+    the previous one. Deletes (detected by a shrinking row count below the
+    watermark) and in-place updates trigger a full rewrite of the table.
+    Updates are found in the booking API's change log (`cambios`) after
+    the version recorded at the table's last export; on databases without
+    it they only reach the snapshot on the full rewrite that runs every
+    full_refresh_every cycles.
+    """
+
+    def __init__(self, db_connection_string: str, snapshot_dir: str = 'snapshots',
+                 interval: float = 300.0, full_refresh_every: int = 12):
+        """
+        Initialize the exporter.
+
+        Args:
+            db_connection_string: Path, sqlite:/// URL or file: URI of the database
+            snapshot_dir: Directory where Arrow files and the manifest are written
+            interval: Seconds between export cycles when running in the background
+            full_refresh_every: Cycles between full rewrites of every table
+        """
+        self.uri = resolve_sqlite_uri(db_connection_string)
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self.full_refresh_every = full_refresh_every
+        self._conn = None
+        self._data_version = None
+        self._cycles = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending_deletes = []
+        self.manifest = self._load_manifest()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Long-lived read-only connection (data_version is per connection)."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+            self._conn.execute('PRAGMA query_only = ON')
+        return self._conn
+
+    def _load_manifest(self) -> Dict:
+        path = os.path.join(self.snapshot_dir, MANIFEST_NAME)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return {'generation': 0, 'exported_at': None, 'tables': {}}
+
+    def _write_manifest(self):
+        tmp = os.path.join(self.snapshot_dir, MANIFEST_NAME + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, os.path.join(self.snapshot_dir, MANIFEST_NAME))
+
+    def _schema(self, conn: sqlite3.Connection, table: str) -> pa.Schema:
+        excluded = EXCLUDED_COLUMNS.get(table, set())
+        fields = [pa.field('_rowid', pa.int64())]
+        for _, name, declared, *_ in conn.execute(f'PRAGMA table_info({table})'):
+            if name not in excluded:
+                fields.append(pa.field(name, _arrow_type(declared)))
+        return pa.schema(fields)
+
+    def _write_arrow(self, table: str, filename: str, schema: pa.Schema, rows: List[tuple]):
+        """Write rows as an uncompressed Arrow IPC file (mmap-friendly)."""
+        columns = list(zip(*rows)) if rows else [[] for _ in schema]
+        arrow_table = pa.Table.from_arrays(
+            [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+            schema=schema
+        )
+        table_dir = os.path.join(self.snapshot_dir, table)
+        os.makedirs(table_dir, exist_ok=True)
+        tmp = os.path.join(table_dir, filename + '.tmp')
+        with pa.OSFile(tmp, 'wb') as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                writer.write_table(arrow_table)
+        os.replace(tmp, os.path.join(table_dir, filename))
+
+    @staticmethod
+    def _change_version(conn: sqlite3.Connection, table: str) -> Optional[int]:
+        """Current change log version if `table` feeds `cambios`, else None."""
+        tracked = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (f'trg_{table}_update_cambios',)
+        ).fetchone()
+        if not tracked:
+            return None
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cambios'").fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _updated_since(conn: sqlite3.Connection, table: str, version: int) -> bool:
+        """True when rows of `table` changed in place after `version` (or the log was compacted past it)."""
+        purged = conn.execute('SELECT hasta_version FROM cambios_purga WHERE id = 1').fetchone()
+        if purged and version < purged[0]:
+            return True
+        return conn.execute(
+            "SELECT 1 FROM cambios WHERE tabla = ? AND version > ? AND operacion = 'update' LIMIT 1", (table, version)
+        ).fetchone() is not None
+
+    def _export_table(self, conn: sqlite3.Connection, table: str, full: bool) -> bool:
+        """Export one table; returns True when the snapshot changed."""
+        schema = self._schema(conn, table)
+        columns = ', '.join(f.name for f in schema if f.name != '_rowid')
+        state = self.manifest['tables'].get(table)
+        generation = self.manifest['generation']
+        change_version = self._change_version(conn, table)
+
+        if not full and state:
+            watermark = state['watermark']
+            remaining = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE rowid <= ?', (watermark,)).fetchone()[0]
+            full = remaining != state['rows'] or state.get('columns') != schema.names
+            if not full and change_version is not None:
+                seen = state.get('change_version')
+                full = seen is None or self._updated_since(conn, table, seen)
+
+        if full or not state:
+            rows = conn.execute(f'SELECT rowid, {columns} FROM {table} ORDER BY rowid').fetchall()
+            filename = f'base-{generation:06d}.arrow'
+            self._write_arrow(table, filename, schema, rows)
+            old_files = state['files'] if state else []
+            self.manifest['tables'][table] = {
+                'files': [filename],
+                'rows': len(rows),
+                'watermark': rows[-1][0] if rows else 0,
+                'columns': schema.names,
+                'change_version': change_version,
+                'full_refreshed_at': datetime.now().isoformat()
+            }
+            for old in old_files:
+                if old != filename:
+                    self._pending_deletes.append(os.path.join(self.snapshot_dir, table, old))
+            return True
+
+        rows = conn.execute(
+            f'SELECT rowid, {columns} FROM {table} WHERE rowid > ? ORDER BY rowid', (state['watermark'],)
+        ).fetchall()
+        if not rows:
+            return False
+        filename = f'delta-{generation:06d}-{len(state["files"]):04d}.arrow'
+        self._write_arrow(table, filename, schema, rows)
+        state['files'].append(filename)
+        state['rows'] += len(rows)
+        state['watermark'] = rows[-1][0]
+        state['change_version'] = change_version
+        return True
+
+    def refresh(self, force_full: bool = False) -> bool:
+        """
+        Run one export cycle.
+
+        Args:
+            force_full: Rewrite every table regardless of watermarks
+
+        Returns:
+            True if any snapshot file was written
+        """
+        conn = self._connection()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if not force_full and data_version == self._data_version and self.manifest['tables']:
+            return False
+        full = force_full or self._cycles % self.full_refresh_every == 0
+        self._cycles += 1
+
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        self._pending_deletes = []
+        changed = False
+        # One read transaction so all tables come from the same database state
+        conn.execute('BEGIN')
+        try:
+            if full:
+                self.manifest['generation'] += 1
+            for table in SNAPSHOT_TABLES:
+                changed = self._export_table(conn, table, full) or changed
+        finally:
+            conn.execute('COMMIT')
+
+        self._data_version = data_version
+        self.manifest['exported_at'] = datetime.now().isoformat()
+        self._write_manifest()
+        # Superseded files are removed only after the new manifest is visible;
+        # readers that already mapped them keep their pages until they close
+        for path in self._pending_deletes:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if changed:
+            logger.info(f"Analytics snapshot updated (generation {self.manifest['generation']})")
+        return changed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Snapshot export failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start exporting in a background daemon thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='snapshot-exporter', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and close the connection."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+
+class SnapshotReader:
+    """
+    Zero-copy reader over the Arrow snapshot directory.
+
+    Files are memory-mapped and the resulting tables are cached until the
+    manifest changes, so repeated analytics calls share the same pages.
+    """
+
+    def __init__(self, snapshot_dir: str = 'snapshots'):
+        """Initialize the reader for the given snapshot directory."""
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self._manifest = None
+        self._tables = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _sync(self):
+        path = os.path.join(self.snapshot_dir, MANIFEST_NAME)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                with open(path) as f:
+                    self._manifest = json.load(f)
+                self._manifest_mtime = mtime
+                self._tables = {}
+
+    def available(self) -> bool:
+        """True when a manifest exists in the snapshot directory."""
+        return os.path.exists(os.path.join(self.snapshot_dir, MANIFEST_NAME))
+
+    def table(self, name: str) -> pa.Table:
+        """Return the memory-mapped Arrow table for a snapshot table."""
+        self._sync()
+        with self._lock:
+            if name in self._tables:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+                parts = []
+                for filename in self._manifest['tables'][name]['files']:
+                    source = pa.memory_map(os.path.join(self.snapshot_dir, name, filename), 'r')
+                    parts.append(pa.ipc.open_file(source).read_all())
+                self._tables[name] = pa.concat_tables(parts)
+            return self._tables[name]
+
+    def frame(self, name: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Return a snapshot table (or selected columns) as a DataFrame."""
+        table = self.table(name)
+        if columns:
+            table = table.select(columns)
+        return table.to_pandas()
+
+    def freshness(self) -> Dict:
+        """
+        Describe how current the snapshot is.
+
+        `age_seconds` is the time since the last export cycle. Tables the
+        change log does not cover may miss in-place updates made since
+        their last full rewrite, so each table also reports that age and
+        `max_staleness_seconds` is the worst case over all tables.
+        """
+        self._sync()
+        now = datetime.now()
+
+        def age(stamp):
+            return round((now - datetime.fromisoformat(stamp)).total_seconds(), 1) if stamp else None
+
+        exported_at = self._manifest.get('exported_at')
+        tables = {}
+        worst = age(exported_at)
+        for name, state in self._manifest['tables'].items():
+            tracked = state.get('change_version') is not None
+            full_age = age(state.get('full_refreshed_at'))
+            tables[name] = {'updates_tracked': tracked, 'full_refresh_age_seconds': full_age}
+            if not tracked and full_age is not None and (worst is None or full_age > worst):
+                worst = full_age
+        return {
+            'source': 'snapshot',
+            'generation': self._manifest.get('generation'),
+            'exported_at': exported_at,
+            'age_seconds': age(exported_at),
+            'max_staleness_seconds': worst,
+            'tables': tables
+        }
+
+    # Analytics views over the snapshot (same columns as the SQL queries)
+
+    def _confirmed_reservations(self) -> pd.DataFrame:
+        reservas = self.frame('reservas', ['usuario_id', 'habitacion_id', 'fecha_inicio', 'monto_total', 'estado'])
+        return reservas[reservas['estado'].isin(['confirmada', 'completada'])]
+
+    def daily_occupancy(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """Occupied rooms per check-in date against rooms in service."""
+        reservas = self._confirmed_reservations()
+        reservas = reservas[reservas['fecha_inicio'].between(start_date, end_date)]
+        habitaciones = self.frame('habitaciones', ['estado'])
+        total_rooms = int((habitaciones['estado'] != 'fuera de servicio').sum())
+        df = reservas.groupby('fecha_inicio').size().reset_index(name='occupied_rooms')
+        df = df.rename(columns={'fecha_inicio': 'date'})
+        df['total_rooms'] = total_rooms
+        return df.sort_values('date').reset_index(drop=True)
+
+    def daily_revenue(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """Revenue, booking count and average value per check-in date."""
+        reservas = self._confirmed_reservations()
+        reservas = reservas[reservas['fecha_inicio'].between(start_date, end_date)]
+        df = reservas.groupby('fecha_inicio')['monto_total'].agg(['sum', 'count', 'mean']).reset_index()
+        df.columns = ['date', 'daily_revenue', 'reservations_count', 'avg_booking_value']
+        return df.sort_values('date').reset_index(drop=True)
+
+    def customer_summary(self) -> pd.DataFrame:
+        """Booking totals per client user."""
+        usuarios = self.frame('usuarios', ['id', 'nombre', 'rol'])
+        usuarios = usuarios[usuarios['rol'] == 'client']
+        reservas = self.frame('reservas', ['id', 'usuario_id', 'fecha_inicio', 'monto_total'])
+        merged = usuarios.merge(reservas, how='left', left_on='id', right_on='usuario_id', suffixes=('', '_res'))
+        df = merged.groupby(['id', 'nombre']).agg(
+            total_bookings=('id_res', 'count'),
+            total_spent=('monto_total', 'sum'),
+            avg_booking_value=('monto_total', 'mean'),
+            last_booking_date=('fecha_inicio', 'max'),
+            first_booking_date=('fecha_inicio', 'min')
+        ).reset_index().rename(columns={'nombre': 'full_name'})
+        return df.sort_values('total_spent', ascending=False).reset_index(drop=True)
+
+    def room_performance(self) -> pd.DataFrame:
+        """Bookings and revenue per room."""
+        habitaciones = self.frame('habitaciones', ['id', 'numero', 'tipo', 'precio_actual'])
+        reservas = self._confirmed_reservations()
+        merged = habitaciones.merge(reservas, left_on='id', right_on='habitacion_id')
+        df = merged.groupby(['id', 'numero', 'tipo', 'precio_actual'])['monto_total'].agg(
+            ['count', 'mean', 'sum']
+        ).reset_index()
+        df.columns = ['id', 'room_number', 'room_type', 'room_price', 'total_bookings',
+                      'avg_revenue_per_booking', 'total_revenue']
+        return df.drop(columns='id').sort_values('total_revenue', ascending=False).reset_index(drop=True)
+
+    def booking_history(self, since_date: str) -> pd.DataFrame:
+        """Bookings and revenue per check-in date since the given date."""
+        df = self.daily_revenue(since_date, '9999-12-31')
+        return df.rename(columns={'reservations_count': 'bookings', 'daily_revenue': 'revenue'})[
+            ['date', 'bookings', 'revenue']
+        ]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export Arrow snapshots for analytics')
+    parser.add_argument('--db', default=os.getenv('ANALYTICS_DB_URL', 'sqlite:///hotel_management.db'))
+    parser.add_argument('--dir', default=os.getenv('ANALYTICS_SNAPSHOT_DIR', 'snapshots'))
+    parser.add_argument('--interval', type=float, default=300.0)
+    parser.add_argument('--once', action='store_true', help='Run a single full export and exit')
+    args = parser.parse_args()
+
+    exporter = SnapshotExporter(args.db, args.dir, interval=args.interval)
+    if args.once:
+        exporter.refresh(force_full=True)
+        print(f"Snapshot written to {args.dir}")
+    else:
+        exporter._run()
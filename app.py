@@ -4,10 +4,19 @@ def login():
     password = data.get('password')
     role = data.get('role')
     conn = get_db_connection()
-    user = conn.execute('SELECT * FROM usuarios WHERE username=? AND password=? AND rol=?', (username, password, role)).fetchone()
+    user = conn.execute('SELECT * FROM usuarios WHERE username=? AND rol=?', (username, role)).fetchone()
     conn.close()
-    if user:
+    # KDF runs on the credentials executor; unknown users verify a dummy hash
+    matches, needs_rehash = credentials.hasher().verify_async(password or '', user['password'] if user else None).result()
+    if user and matches:
+        if needs_rehash:
+            # Legacy plaintext (or outdated cost): store a fresh hash, unless it changed meanwhile
+            stored = credentials.hasher().hash_async(password).result()
+            shard().writer.run(lambda conn: conn.execute(
+                'UPDATE usuarios SET password=? WHERE id=? AND password=?', (stored, user['id'], user['password'])
+            ))
         user_dict = dict(user)
+        user_dict.pop('password', None)
         # Map fields to frontend
         user_dict['name'] = user_dict.get('nombre')
         user_dict['role'] = user_dict.get('rol')
@@ -16,26 +25,201 @@ def login():
     else:
         return jsonify({ 'success': False, 'message': 'Credenciales inválidas' }), 401
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 import sqlite3
+import os
+from datetime import datetime
+import metrics
+import sql_profiler
+import request_profiler
+import admission
+import compression
+import archive
+import backup
+import changelog
+import events
+import amenities
+import search
+import writer
+import pricing
+import credentials
+import properties
+import shards
+import assignment
 
 DB_NAME = 'hotel_management.db'
+# One SQLite shard per resort (HOTEL_PROPERTIES=reef=hotel_management.db,coral=shards/coral.db);
+# requests pick theirs with the /p/<code> prefix or the X-Property header, default DB_NAME alone
+PROPERTIES = properties.load(DB_NAME)
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=[properties.HEADER])
+metrics.init_app(app)
+sql_profiler.init_app(app)
+request_profiler.init_app(app)
+admission.init_app(app)
+compression.init_app(app)
+properties.init_app(app, PROPERTIES)
+
+# Every mutation goes through one writer thread per shard (group commit, see writer.py)
+SHARDS = {
+    prop.code: shards.Shard(
+        prop,
+        max_pending=int(os.getenv('WRITE_QUEUE_SIZE', 1024)),
+        max_batch=int(os.getenv('WRITE_BATCH_MAX', 64)),
+        backup_dir=os.getenv('BACKUP_DIR', 'backups'),
+        backup_keep=int(os.getenv('BACKUP_KEEP', 7)),
+        pages_per_step=int(os.getenv('BACKUP_PAGES_PER_STEP', 1024)),
+        pause=float(os.getenv('BACKUP_PAUSE', 0.01))
+    )
+    for prop in PROPERTIES
+}
+
+def shard():
+    """Shard of the current request (or of the writer thread running the write)."""
+    return SHARDS[PROPERTIES.current().code]
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return shard().connect()
+
+@app.errorhandler(writer.WriterBusy)
+def writer_busy(e):
+    return jsonify({ 'message': str(e) }), 503, { 'Retry-After': '1' }
+
+def init_db():
+    # New shards start from the default property's schema
+    for s in SHARDS.values():
+        s.init_db(template=PROPERTIES.default.db_path)
+
+init_db()
+for s in SHARDS.values():
+    changelog.start_compactor(
+        s.writer.run,
+        interval=float(os.getenv('CHANGELOG_COMPACT_INTERVAL', 3600)),
+        retention_days=int(os.getenv('CHANGELOG_RETENTION_DAYS', 30))
+    )
+    # Past nights drop out of the price calendar at midnight, not only at startup
+    pricing.start_rollover(s.writer.run, s.prices)
+# Old completed/cancelled reservations move to the archive file (RESERVAS_ARCHIVE_INTERVAL seconds, off by default)
+ARCHIVE_SETTINGS = {
+    'older_than_days': int(os.getenv('RESERVAS_ARCHIVE_DAYS', 365)),
+    'batch_size': int(os.getenv('RESERVAS_ARCHIVE_BATCH', 500)),
+    'pause': float(os.getenv('RESERVAS_ARCHIVE_PAUSE', 0.05)),
+}
+if os.getenv('RESERVAS_ARCHIVE_INTERVAL'):
+    for s in SHARDS.values():
+        archive.start_archiver(s.writer.run, float(os.getenv('RESERVAS_ARCHIVE_INTERVAL')), **ARCHIVE_SETTINGS)
+
+@app.route('/api/propiedades', methods=['GET'])
+def get_propiedades():
+    return jsonify({ 'data': [p.to_dict() for p in PROPERTIES], 'current': PROPERTIES.current().code })
+
+# --- PROYECCIÓN (?fields=) ---
+# frontend field -> SQL expression, per list route; 'id' is always returned
+LIST_FIELDS = {
+    'habitaciones': {
+        'id': 'id', 'number': 'numero', 'name': 'nombre', 'type': 'tipo', 'floor': 'piso', 'status': 'estado',
+        'amenities': 'amenidades', 'capacity': 'capacidad', 'basePrice': 'precio_base', 'currentPrice': 'precio_actual',
+        'lastCleaned': 'ultima_limpieza', 'reservations': 'reservas_pendientes',
+    },
+    'reservas': {
+        'id': 'r.id', 'code': 'r.codigo', 'userName': 'u.nombre', 'roomNumber': 'h.numero', 'checkIn': 'r.fecha_inicio',
+        'checkOut': 'r.fecha_fin', 'totalAmount': 'r.monto_total', 'status': 'r.estado', 'payment': 'r.pago',
+        'userId': 'r.usuario_id', 'usuario_id': 'r.usuario_id', 'habitacion_id': 'r.habitacion_id',
+    },
+    'usuarios': {
+        'id': 'id', 'username': 'username', 'name': 'nombre', 'email': 'email', 'role': 'rol', 'status': 'estado',
+    },
+}
+
+def list_fields(table):
+    """Fields requested with ?fields=a,b, or None for the full row."""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in LIST_FIELDS[table]]
+    if unknown:
+        raise ValueError(f'Campos desconocidos: {", ".join(unknown)}')
+    return ['id'] + [f for f in dict.fromkeys(fields) if f != 'id']
+
+def select_columns(table, fields):
+    return ', '.join(f'{LIST_FIELDS[table][f]} AS "{f}"' for f in fields)
+
+def projected(row):
+    r = dict(row)
+    if 'amenities' in r:
+        r['amenities'] = r['amenities'].split(',') if r['amenities'] else []
+    return r
+
+# --- VALIDACIÓN ---
+ESTADOS_HABITACION = ('disponible', 'ocupada', 'mantenimiento', 'limpieza', 'fuera de servicio')
+TIPOS_HABITACION = ('suite', 'deluxe', 'standard', 'villa')
+ESTADOS_RESERVA = ('pendiente', 'confirmada', 'completada', 'anulada')
+PAGOS_RESERVA = ('Pagado', 'Pago Pendiente', 'N/A')
+ROLES_USUARIO = ('admin', 'client')
+
+def _text(value):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError('debe ser texto no vacío')
+    return value
+
+def _integer(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError('debe ser un entero')
+    return value
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError('debe ser un número positivo')
+    return value
+
+def _date(value):
+    datetime.strptime(value if isinstance(value, str) else '', '%Y-%m-%d')
+    return value
+
+def _choice(options):
+    def check(value):
+        if value not in options:
+            raise ValueError(f'debe ser uno de {list(options)}')
+        return value
+    return check
+
+def _amenities(value):
+    if not isinstance(value, list) or not all(isinstance(a, str) for a in value):
+        raise ValueError('debe ser una lista de textos')
+    return ','.join(value)
 
 # --- HABITACIONES ---
+# Full rows without internal columns (amenidades_mask only serves the SQL amenity filter)
+HABITACIONES_COLUMNS = ('id, numero, nombre, tipo, piso, estado, capacidad, precio_base, precio_actual, '
+                        'ultima_limpieza, reservas_pendientes, amenidades')
+
 @app.route('/api/habitaciones', methods=['GET'])
 def get_habitaciones():
+    since = request.args.get('since', type=int)
+    try:
+        fields = list_fields('habitaciones')
+    except ValueError as e:
+        return jsonify({ 'message': str(e) }), 400
+    columns = select_columns('habitaciones', fields) if fields else HABITACIONES_COLUMNS
     conn = get_db_connection()
-    habitaciones = conn.execute('SELECT * FROM habitaciones').fetchall()
+    version = changelog.current_version(conn)
+    if since is None:
+        habitaciones = conn.execute(f'SELECT {columns} FROM habitaciones').fetchall()
+    else:
+        try:
+            changelog.check_since(conn, since)
+        except changelog.ResyncRequired as e:
+            conn.close()
+            return jsonify({ 'message': str(e), 'resync': True, 'version': version }), 410
+        habitaciones = conn.execute(f'SELECT {columns} FROM habitaciones WHERE id IN ({changelog.CHANGED_IDS})', ('habitaciones', since)).fetchall()
+        deleted = changelog.tombstones(conn, 'habitaciones', since)
     result = []
     for row in habitaciones:
+        if fields:
+            result.append(projected(row))
+            continue
         r = dict(row)
         # amenities stored as comma-separated string, convert to array
         r['amenities'] = r.get('amenidades', '').split(',') if r.get('amenidades') else []
@@ -51,153 +235,456 @@ def get_habitaciones():
         r['reservations'] = r.get('reservas_pendientes')
         result.append(r)
     conn.close()
-    return jsonify({ 'data': result })
+    if since is not None:
+        return jsonify({ 'data': result, 'deleted': deleted, 'version': version })
+    return jsonify({ 'data': result, 'version': version })
 
-# Create room
-@app.route('/api/habitaciones', methods=['POST'])
-def create_habitacion():
-    data = request.json
-    conn = get_db_connection()
+def insert_habitacion(conn, data):
+    mask = amenities.mask_for(conn, data.get('amenities', []))
     cur = conn.execute(
-        'INSERT INTO habitaciones (numero, nombre, tipo, piso, estado, amenidades, capacidad, precio_base, precio_actual, ultima_limpieza, reservas_pendientes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        'INSERT INTO habitaciones (numero, nombre, tipo, piso, estado, amenidades, amenidades_mask, capacidad, precio_base, precio_actual, ultima_limpieza, reservas_pendientes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
         (
-            data.get('number'), data.get('name'), data.get('type'), data.get('floor'), data.get('status'), ','.join(data.get('amenities', [])),
+            data.get('number'), data.get('name'), data.get('type'), data.get('floor'), data.get('status'), ','.join(data.get('amenities', [])), mask,
             data.get('capacity'), data.get('basePrice'), data.get('currentPrice'), data.get('lastCleaned'), data.get('reservations', 0)
         )
     )
-    conn.commit()
-    room_id = cur.lastrowid
+    amenities.link_room(conn, cur.lastrowid, data.get('amenities', []))
+    pricing.recompute(conn, [pricing.room_span(conn, cur.lastrowid)], cache=shard().prices)
+    shard().grid.touch_rooms()
+    return cur.lastrowid
+
+def write_habitacion(conn, room_id, data):
+    before = pricing.room_span(conn, room_id)
+    priced = conn.execute('SELECT tipo, precio_base FROM habitaciones WHERE id=?', (room_id,)).fetchone()
+    mask = amenities.mask_for(conn, data.get('amenities', []))
+    cur = conn.execute(
+        'UPDATE habitaciones SET numero=?, nombre=?, tipo=?, piso=?, estado=?, amenidades=?, amenidades_mask=?, capacidad=?, precio_base=?, precio_actual=?, ultima_limpieza=?, reservas_pendientes=? WHERE id=?',
+        (
+            data.get('number'), data.get('name'), data.get('type'), data.get('floor'), data.get('status'), ','.join(data.get('amenities', [])), mask,
+            data.get('capacity'), data.get('basePrice'), data.get('currentPrice'), data.get('lastCleaned'), data.get('reservations', 0), room_id
+        )
+    )
+    if cur.rowcount:
+        amenities.link_room(conn, room_id, data.get('amenities', []))
+        # Only the type and base price move the calendar (see PRICING_COLUMNS)
+        if priced is None or (priced['tipo'], priced['precio_base']) != (data.get('type'), data.get('basePrice')):
+            pricing.recompute(conn, [before, pricing.room_span(conn, room_id)], cache=shard().prices)
+        shard().grid.touch_rooms()
+    return cur.rowcount
+
+def remove_habitacion(conn, room_id):
+    before = pricing.room_span(conn, room_id)
+    rowcount = conn.execute('DELETE FROM habitaciones WHERE id=?', (room_id,)).rowcount
+    pricing.recompute(conn, [before], cache=shard().prices)
+    shard().grid.touch_rooms()
+    return rowcount
+
+# Room search: ?amenities=Jacuzzi,Vista al Mar&type=suite&floor=1&status=disponible&minCapacity=2
+@app.route('/api/habitaciones/buscar', methods=['GET'])
+def buscar_habitaciones():
+    conditions, params = [], []
+    wanted = amenities.clean_names(request.args.get('amenities', '').split(','))
+    if wanted:
+        conn = get_db_connection()
+        bits = amenities.amenity_bits(conn, wanted, create=False)
+        conn.close()
+        if len(bits) < len(wanted):
+            # An amenity no room has cannot match
+            return jsonify({ 'data': [], 'total': 0 })
+        mask = sum(1 << bit for bit in bits.values())
+        conditions.append('(amenidades_mask & ?) = ?')
+        params += [mask, mask]
+    for arg, column in (('type', 'tipo'), ('status', 'estado')):
+        if request.args.get(arg):
+            conditions.append(f'{column} = ?')
+            params.append(request.args.get(arg))
+    if request.args.get('floor') is not None:
+        conditions.append('piso = ?')
+        params.append(request.args.get('floor', type=int))
+    if request.args.get('minCapacity') is not None:
+        conditions.append('capacidad >= ?')
+        params.append(request.args.get('minCapacity', type=int))
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    try:
+        fields = list_fields('habitaciones')
+    except ValueError as e:
+        return jsonify({ 'message': str(e) }), 400
+    columns = select_columns('habitaciones', fields) if fields else 'id, numero, nombre, tipo, piso, estado, capacidad, precio_actual, amenidades'
+    conn = get_db_connection()
+    rows = conn.execute(f'SELECT {columns} FROM habitaciones{where} ORDER BY numero', params).fetchall()
     conn.close()
+    if fields:
+        result = [projected(r) for r in rows]
+        return jsonify({ 'data': result, 'total': len(result) })
+    result = [{
+        'id': r['id'], 'number': r['numero'], 'name': r['nombre'], 'type': r['tipo'], 'floor': r['piso'],
+        'status': r['estado'], 'capacity': r['capacidad'], 'currentPrice': r['precio_actual'],
+        'amenities': r['amenidades'].split(',') if r['amenidades'] else []
+    } for r in rows]
+    return jsonify({ 'data': result, 'total': len(result) })
+
+@app.route('/api/amenidades', methods=['GET'])
+def get_amenidades():
+    conn = get_db_connection()
+    result = amenities.list_amenities(conn)
+    conn.close()
+    return jsonify({ 'data': result })
+
+# Create room
+@app.route('/api/habitaciones', methods=['POST'])
+def create_habitacion():
+    data = request.json
+    room_id = shard().writer.run(lambda conn: insert_habitacion(conn, data), after_commit=publish_habitacion)
     return jsonify({ 'message': 'Habitación creada', 'data': { 'id': room_id } }), 201
 
 # Update room
 @app.route('/api/habitaciones/<int:room_id>', methods=['PUT'])
 def update_habitacion(room_id):
     data = request.json
-    conn = get_db_connection()
-    conn.execute(
-        'UPDATE habitaciones SET numero=?, nombre=?, tipo=?, piso=?, estado=?, amenidades=?, capacidad=?, precio_base=?, precio_actual=?, ultima_limpieza=?, reservas_pendientes=? WHERE id=?',
-        (
-            data.get('number'), data.get('name'), data.get('type'), data.get('floor'), data.get('status'), ','.join(data.get('amenities', [])),
-            data.get('capacity'), data.get('basePrice'), data.get('currentPrice'), data.get('lastCleaned'), data.get('reservations', 0), room_id
-        )
-    )
-    conn.commit()
-    conn.close()
+    shard().writer.run(lambda conn: write_habitacion(conn, room_id, data), after_commit=lambda conn, _: publish_habitacion(conn, room_id))
     return jsonify({ 'message': 'Habitación actualizada' })
 
 # Delete room
 @app.route('/api/habitaciones/<int:room_id>', methods=['DELETE'])
 def delete_habitacion(room_id):
+    shard().writer.run(lambda conn: remove_habitacion(conn, room_id), after_commit=lambda conn, _: publish_habitacion(conn, room_id))
+    return jsonify({ 'message': 'Habitación eliminada' })
+
+# Nightly price calendar: ?from=YYYY-MM-DD&days=30
+@app.route('/api/habitaciones/<int:room_id>/precios', methods=['GET'])
+def get_precios(room_id):
+    try:
+        start = pricing.day_number(request.args.get('from') or datetime.now().strftime('%Y-%m-%d'))
+    except ValueError:
+        return jsonify({ 'message': 'Fecha inválida' }), 400
+    days = max(1, min(request.args.get('days', 30, type=int), pricing.HORIZON_DAYS))
     conn = get_db_connection()
-    conn.execute('DELETE FROM habitaciones WHERE id=?', (room_id,))
-    conn.commit()
+    rows = conn.execute(
+        'SELECT dia, precio_centavos FROM precios_calendario WHERE habitacion_id=? AND dia >= ? AND dia < ? ORDER BY dia',
+        (room_id, start, start + days)
+    ).fetchall()
     conn.close()
-    return jsonify({ 'message': 'Habitación eliminada' })
+    return jsonify({ 'data': [{ 'date': pricing.day_string(r[0]), 'price': r[1] / 100 } for r in rows] })
+
+# Quote for a stay: ?checkIn=YYYY-MM-DD&checkOut=YYYY-MM-DD (one night if checkOut is omitted)
+@app.route('/api/habitaciones/<int:room_id>/cotizacion', methods=['GET'])
+def get_cotizacion(room_id):
+    conn = get_db_connection()
+    try:
+        result = pricing.quote(conn, room_id, request.args.get('checkIn', ''), request.args.get('checkOut'), shard().prices)
+    except ValueError:
+        return jsonify({ 'message': 'Fecha inválida' }), 400
+    finally:
+        conn.close()
+    if result is None:
+        return jsonify({ 'message': 'Fechas fuera del calendario de precios o habitación inexistente' }), 404
+    return jsonify({ 'data': result })
+
+# Free rooms per type per night: ?from=YYYY-MM-DD&days=30
+# ?grid=1 returns per-room occupied flags instead (e.g. a whole month for the admin board)
+@app.route('/api/disponibilidad', methods=['GET'])
+def get_disponibilidad():
+    try:
+        start = pricing.day_number(request.args.get('from') or datetime.now().strftime('%Y-%m-%d'))
+    except ValueError:
+        return jsonify({ 'message': 'Fecha inválida' }), 400
+    days = request.args.get('days', 30, type=int)
+    conn = get_db_connection()
+    try:
+        if request.args.get('grid', '').lower() in ('1', 'true'):
+            result = shard().grid.grid(conn, start, days)
+        else:
+            result = shard().grid.free_by_type(conn, start, days)
+    except ValueError as e:
+        return jsonify({ 'message': str(e) }), 400
+    finally:
+        conn.close()
+    return jsonify({ 'data': result })
+
+# Rooms the assigner would pick, best first: ?type=suite&guests=2&checkIn=YYYY-MM-DD&checkOut=YYYY-MM-DD&limit=5
+@app.route('/api/asignacion', methods=['GET'])
+def get_asignacion():
+    if request.args.get('type') not in TIPOS_HABITACION:
+        return jsonify({ 'message': f'type debe ser uno de {list(TIPOS_HABITACION)}' }), 400
+    try:
+        pricing.day_number(request.args.get('checkIn', ''))
+        pricing.day_number(request.args.get('checkOut', ''))
+    except ValueError:
+        return jsonify({ 'message': 'Fecha inválida' }), 400
+    conn = get_db_connection()
+    try:
+        result = assignment.rank(conn, shard().grid, request.args['type'], request.args.get('guests', 1, type=int),
+                                 request.args['checkIn'], request.args['checkOut'],
+                                 limit=max(1, min(request.args.get('limit', 5, type=int), 100)))
+    except ValueError as e:
+        return jsonify({ 'message': str(e) }), 400
+    finally:
+        conn.close()
+    return jsonify({ 'data': result })
 
 # --- RESERVAS ---
 @app.route('/api/reservas', methods=['GET'])
 def get_reservas():
+    since = request.args.get('since', type=int)
+    try:
+        fields = list_fields('reservas')
+    except ValueError as e:
+        return jsonify({ 'message': str(e) }), 400
     conn = get_db_connection()
-    # Join with users and rooms for frontend fields
-    query = '''
-        SELECT r.id, r.codigo as code, u.nombre as userName, h.numero as roomNumber, r.fecha_inicio as checkIn, r.fecha_fin as checkOut,
-               r.monto_total as totalAmount, r.estado as status, r.pago as payment, r.usuario_id, r.habitacion_id
+    version = changelog.current_version(conn)
+    # Join with users and rooms for frontend fields (unused LEFT JOINs are dropped by the planner)
+    columns = select_columns('reservas', fields) if fields else '''r.id, r.codigo as code, u.nombre as userName, h.numero as roomNumber, r.fecha_inicio as checkIn, r.fecha_fin as checkOut,
+               r.monto_total as totalAmount, r.estado as status, r.pago as payment, r.usuario_id, r.habitacion_id'''
+    query = f'''
+        SELECT {columns}
         FROM reservas r
         LEFT JOIN usuarios u ON r.usuario_id = u.id
         LEFT JOIN habitaciones h ON r.habitacion_id = h.id
     '''
-    reservas = conn.execute(query).fetchall()
+    if since is None:
+        reservas = conn.execute(query).fetchall()
+    else:
+        try:
+            changelog.check_since(conn, since)
+        except changelog.ResyncRequired as e:
+            conn.close()
+            return jsonify({ 'message': str(e), 'resync': True, 'version': version }), 410
+        reservas = conn.execute(query + f' WHERE r.id IN ({changelog.CHANGED_IDS})', ('reservas', since)).fetchall()
+        deleted = changelog.tombstones(conn, 'reservas', since)
     result = []
     for row in reservas:
+        if fields:
+            result.append(projected(row))
+            continue
         r = dict(row)
         r['guests'] = 1 # Si quieres agregar campo de huéspedes, ajusta aquí
         r['userId'] = r.get('usuario_id')
         result.append(r)
     conn.close()
-    return jsonify({ 'data': result })
+    if since is not None:
+        return jsonify({ 'data': result, 'deleted': deleted, 'version': version })
+    return jsonify({ 'data': result, 'version': version })
 
-# Create reservation
-@app.route('/api/reservas', methods=['POST'])
-def crear_reserva():
-    data = request.json
-    conn = get_db_connection()
+def auto_assign(conn, data):
+    # Sin habitacion_id pero con roomType: el asignador elige la habitación (y cotiza si falta el monto)
+    room = assignment.assign(conn, shard().grid, data.get('roomType'), data.get('guests') or 1,
+                             data.get('checkIn') or '', data.get('checkOut') or '')
+    data = dict(data, habitacion_id=room['roomId'])
+    if data.get('totalAmount') is None:
+        quote = pricing.quote(conn, room['roomId'], data['checkIn'], data['checkOut'], shard().prices)
+        data['totalAmount'] = quote['total'] if quote else None
+    return data
+
+def insert_reserva(conn, data):
+    auto = data.get('habitacion_id') is None and data.get('roomType') is not None
+    if auto:
+        data = auto_assign(conn, data)
     cur = conn.execute(
-        'INSERT INTO reservas (codigo, usuario_id, habitacion_id, fecha_inicio, fecha_fin, monto_total, pago, estado) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        'INSERT INTO reservas (codigo, usuario_id, habitacion_id, fecha_inicio, fecha_fin, monto_total, pago, estado, asignacion_auto) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
         (
             data.get('code'), data.get('usuario_id'), data.get('habitacion_id'), data.get('checkIn'), data.get('checkOut'),
-            data.get('totalAmount'), data.get('payment'), data.get('status')
+            data.get('totalAmount'), data.get('payment'), data.get('status'), int(auto)
         )
     )
-    conn.commit()
-    res_id = cur.lastrowid
-    conn.close()
-    return jsonify({ 'message': 'Reserva creada', 'data': { 'id': res_id } }), 201
+    pricing.recompute(conn, [pricing.reservation_span(conn, cur.lastrowid)], cache=shard().prices)
+    shard().grid.touch(cur.lastrowid)
+    return cur.lastrowid
 
-# Update reservation
-@app.route('/api/reservas/<int:res_id>', methods=['PUT'])
-def update_reserva(res_id):
-    data = request.json
-    conn = get_db_connection()
-    conn.execute(
-        'UPDATE reservas SET codigo=?, usuario_id=?, habitacion_id=?, fecha_inicio=?, fecha_fin=?, monto_total=?, pago=?, estado=? WHERE id=?',
+def write_reserva(conn, res_id, data):
+    before = pricing.reservation_span(conn, res_id)
+    cur = conn.execute(
+        # Cambiar la habitación a mano la fija: la reoptimización ya no la mueve
+        'UPDATE reservas SET codigo=?, usuario_id=?, habitacion_id=?, fecha_inicio=?, fecha_fin=?, monto_total=?, pago=?, estado=?, '
+        'asignacion_auto = CASE WHEN habitacion_id IS ? THEN asignacion_auto ELSE 0 END WHERE id=?',
         (
             data.get('code'), data.get('usuario_id'), data.get('habitacion_id'), data.get('checkIn'), data.get('checkOut'),
-            data.get('totalAmount'), data.get('payment'), data.get('status'), res_id
+            data.get('totalAmount'), data.get('payment'), data.get('status'), data.get('habitacion_id'), res_id
         )
     )
-    conn.commit()
-    conn.close()
+    pricing.recompute(conn, [before, pricing.reservation_span(conn, res_id)], cache=shard().prices)
+    shard().grid.touch(res_id)
+    return cur.rowcount
+
+def remove_reserva(conn, res_id):
+    before = pricing.reservation_span(conn, res_id)
+    rowcount = conn.execute('DELETE FROM reservas WHERE id=?', (res_id,)).rowcount
+    pricing.recompute(conn, [before], cache=shard().prices)
+    shard().grid.touch(res_id)
+    return rowcount
+
+# Create reservation; without habitacion_id, send roomType (+ guests) to have a room assigned
+@app.route('/api/reservas', methods=['POST'])
+def crear_reserva():
+    data = request.json
+    def create(conn):
+        res_id = insert_reserva(conn, data)
+        return res_id, conn.execute('SELECT habitacion_id FROM reservas WHERE id=?', (res_id,)).fetchone()[0]
+    try:
+        res_id, room_id = shard().writer.run(create, after_commit=lambda conn, result: publish_reserva(conn, result[0]))
+    except assignment.NoRoomAvailable as e:
+        return jsonify({ 'message': str(e) }), 409
+    except ValueError:
+        return jsonify({ 'message': 'Fecha inválida' }), 400
+    return jsonify({ 'message': 'Reserva creada', 'data': { 'id': res_id, 'habitacion_id': room_id } }), 201
+
+# Update reservation
+@app.route('/api/reservas/<int:res_id>', methods=['PUT'])
+def update_reserva(res_id):
+    data = request.json
+    shard().writer.run(lambda conn: write_reserva(conn, res_id, data), after_commit=lambda conn, _: publish_reserva(conn, res_id))
     return jsonify({ 'message': 'Reserva actualizada' })
 
 # Delete/cancel reservation
 @app.route('/api/reservas/<int:res_id>', methods=['DELETE'])
 def delete_reserva(res_id):
+    shard().writer.run(lambda conn: remove_reserva(conn, res_id), after_commit=lambda conn, _: publish_reserva(conn, res_id))
+    return jsonify({ 'message': 'Reserva eliminada/anulada' })
+
+# A guest's reservations, newest check-in first: ?status=pendiente,confirmada&from=YYYY-MM-DD&to=YYYY-MM-DD&limit=20&offset=0
+# from/to filter on check-in date; the summary covers every matching reservation, not just the page
+MAX_PAGE_SIZE = 100
+
+@app.route('/api/usuarios/<int:user_id>/reservas', methods=['GET'])
+def get_usuario_reservas(user_id):
+    statuses = [s for s in request.args.get('status', '').split(',') if s]
+    unknown = [s for s in statuses if s not in ESTADOS_RESERVA]
+    if unknown:
+        return jsonify({ 'message': f'Estados desconocidos: {", ".join(unknown)}' }), 400
+    conditions, params = ['usuario_id = ?'], [user_id]
+    if statuses:
+        conditions.append(f'estado IN ({", ".join("?" for _ in statuses)})')
+        params += statuses
+    for arg, op in (('from', '>='), ('to', '<=')):
+        if request.args.get(arg):
+            try:
+                params.append(_date(request.args.get(arg)))
+            except ValueError:
+                return jsonify({ 'message': f'Fecha inválida en {arg}' }), 400
+            conditions.append(f'fecha_inicio {op} ?')
+    limit = max(1, min(request.args.get('limit', 20, type=int), MAX_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
     conn = get_db_connection()
-    conn.execute('DELETE FROM reservas WHERE id=?', (res_id,))
-    conn.commit()
+    if conn.execute('SELECT 1 FROM usuarios WHERE id=?', (user_id,)).fetchone() is None:
+        conn.close()
+        return jsonify({ 'message': 'Usuario no encontrado' }), 404
+    # One statement: the page and the summary both come from the (usuario_id, fecha_inicio) index;
+    # the summary row is returned even when the page is past the end
+    rows = conn.execute(f'''
+        WITH mias AS (
+            SELECT id, codigo, habitacion_id, fecha_inicio, fecha_fin, monto_total, pago, estado
+            FROM reservas WHERE {' AND '.join(conditions)}
+        ),
+        pagina AS (
+            SELECT * FROM mias ORDER BY fecha_inicio DESC, id DESC LIMIT ? OFFSET ?
+        )
+        SELECT p.id, p.codigo AS code, h.numero AS roomNumber, h.tipo AS roomType, p.fecha_inicio AS checkIn,
+               p.fecha_fin AS checkOut, p.monto_total AS totalAmount, p.estado AS status, p.pago AS payment,
+               p.habitacion_id, s.total, s.upcoming, s.spent
+        FROM (
+            SELECT COUNT(*) AS total,
+                   COALESCE(SUM(fecha_inicio >= date('now') AND estado IN ('pendiente', 'confirmada')), 0) AS upcoming,
+                   COALESCE(SUM(CASE WHEN estado != 'anulada' THEN monto_total ELSE 0 END), 0) AS spent
+            FROM mias
+        ) s
+        LEFT JOIN pagina p ON 1
+        LEFT JOIN habitaciones h ON h.id = p.habitacion_id
+        ORDER BY p.fecha_inicio DESC, p.id DESC
+    ''', params + [limit, offset]).fetchall()
     conn.close()
-    return jsonify({ 'message': 'Reserva eliminada/anulada' })
+    summary = rows[0]
+    result = []
+    for row in rows:
+        if row['id'] is None:
+            continue
+        r = dict(row)
+        for key in ('total', 'upcoming', 'spent'):
+            r.pop(key)
+        r['userId'] = user_id
+        result.append(r)
+    return jsonify({
+        'data': result,
+        'summary': { 'total': summary['total'], 'upcoming': summary['upcoming'], 'totalSpent': summary['spent'] },
+        'limit': limit,
+        'offset': offset
+    })
 
 # --- USUARIOS ---
 @app.route('/api/usuarios', methods=['GET'])
 def get_usuarios():
+    since = request.args.get('since', type=int)
+    try:
+        fields = list_fields('usuarios')
+    except ValueError as e:
+        return jsonify({ 'message': str(e) }), 400
+    # Never the password column, projected or not
+    columns = select_columns('usuarios', fields) if fields else 'id, username, nombre, email, rol, estado'
     conn = get_db_connection()
-    usuarios = conn.execute('SELECT * FROM usuarios').fetchall()
+    version = changelog.current_version(conn)
+    if since is None:
+        usuarios = conn.execute(f'SELECT {columns} FROM usuarios').fetchall()
+    else:
+        try:
+            changelog.check_since(conn, since)
+        except changelog.ResyncRequired as e:
+            conn.close()
+            return jsonify({ 'message': str(e), 'resync': True, 'version': version }), 410
+        usuarios = conn.execute(f'SELECT {columns} FROM usuarios WHERE id IN ({changelog.CHANGED_IDS})', ('usuarios', since)).fetchall()
+        deleted = changelog.tombstones(conn, 'usuarios', since)
     result = []
     for row in usuarios:
+        if fields:
+            result.append(projected(row))
+            continue
         r = dict(row)
         r['name'] = r.get('nombre')
         r['role'] = r.get('rol')
         r['status'] = r.get('estado')
         result.append(r)
     conn.close()
-    return jsonify({ 'data': result })
+    if since is not None:
+        return jsonify({ 'data': result, 'deleted': deleted, 'version': version })
+    return jsonify({ 'data': result, 'version': version })
+
+def with_password_hash(data):
+    # Hash before the write is queued so the writer thread never runs the KDF
+    if isinstance(data, dict) and isinstance(data.get('password'), str):
+        return dict(data, password=credentials.hasher().hash_async(data['password']).result())
+    return data
+
+def insert_usuario(conn, data):
+    cur = conn.execute(
+        'INSERT INTO usuarios (username, nombre, email, password, rol, estado) VALUES (?, ?, ?, ?, ?, ?)',
+        (
+            data.get('username'),
+            data.get('name'),
+            data.get('email'),
+            data.get('password'),
+            data.get('role'),
+            data.get('status')
+        )
+    )
+    return cur.lastrowid
+
+def write_usuario(conn, user_id, data):
+    cur = conn.execute(
+        'UPDATE usuarios SET nombre=?, email=?, rol=?, estado=? WHERE id=?',
+        (data.get('name'), data.get('email'), data.get('role'), data.get('status'), user_id)
+    )
+    return cur.rowcount
+
+def remove_usuario(conn, user_id):
+    return conn.execute('DELETE FROM usuarios WHERE id=?', (user_id,)).rowcount
 
 # Create user
 @app.route('/api/usuarios', methods=['POST'])
 def create_usuario():
-    data = request.json
-    conn = get_db_connection()
+    data = with_password_hash(request.json)
     try:
-        cur = conn.execute(
-            'INSERT INTO usuarios (username, nombre, email, password, rol, estado) VALUES (?, ?, ?, ?, ?, ?)',
-            (
-                data.get('username'),
-                data.get('name'),
-                data.get('email'),
-                data.get('password'),
-                data.get('role'),
-                data.get('status')
-            )
-        )
-        conn.commit()
-        user_id = cur.lastrowid
-        conn.close()
+        user_id = shard().writer.run(lambda conn: insert_usuario(conn, data))
         return jsonify({ 'message': 'Usuario creado', 'data': { 'id': user_id } }), 201
+    except writer.WriterBusy:
+        raise
     except Exception as e:
-        conn.rollback()
-        conn.close()
         if 'UNIQUE constraint failed' in str(e):
             return jsonify({ 'message': 'El usuario o email ya existe.' }), 400
         return jsonify({ 'message': 'Error al registrar usuario.' }), 500
@@ -206,23 +693,357 @@ def create_usuario():
 @app.route('/api/usuarios/<int:user_id>', methods=['PUT'])
 def update_usuario(user_id):
     data = request.json
-    conn = get_db_connection()
-    conn.execute(
-        'UPDATE usuarios SET nombre=?, email=?, rol=?, estado=? WHERE id=?',
-        (data.get('name'), data.get('email'), data.get('role'), data.get('status'), user_id)
-    )
-    conn.commit()
-    conn.close()
+    shard().writer.run(lambda conn: write_usuario(conn, user_id, data))
     return jsonify({ 'message': 'Usuario actualizado' })
 
 # Delete user
 @app.route('/api/usuarios/<int:user_id>', methods=['DELETE'])
 def delete_usuario(user_id):
+    shard().writer.run(lambda conn: remove_usuario(conn, user_id))
+    return jsonify({ 'message': 'Usuario eliminado' })
+
+# --- PATCH (actualizaciones parciales) ---
+# frontend field -> (column, validator, nullable); mirrors the CHECK/NOT NULL constraints
+PATCH_FIELDS = {
+    'habitaciones': {
+        'number': ('numero', _text, False),
+        'name': ('nombre', _text, False),
+        'type': ('tipo', _choice(TIPOS_HABITACION), False),
+        'floor': ('piso', _integer, False),
+        'status': ('estado', _choice(ESTADOS_HABITACION), False),
+        'amenities': ('amenidades', _amenities, True),
+        'capacity': ('capacidad', _integer, False),
+        'basePrice': ('precio_base', _number, False),
+        'currentPrice': ('precio_actual', _number, False),
+        'lastCleaned': ('ultima_limpieza', _date, True),
+        'reservations': ('reservas_pendientes', _integer, False),
+    },
+    'reservas': {
+        'code': ('codigo', _text, False),
+        'usuario_id': ('usuario_id', _integer, False),
+        'habitacion_id': ('habitacion_id', _integer, False),
+        'checkIn': ('fecha_inicio', _date, False),
+        'checkOut': ('fecha_fin', _date, False),
+        'totalAmount': ('monto_total', _number, False),
+        'payment': ('pago', _choice(PAGOS_RESERVA), False),
+        'status': ('estado', _choice(ESTADOS_RESERVA), False),
+    },
+    'usuarios': {
+        'name': ('nombre', _text, False),
+        'email': ('email', _text, False),
+        'role': ('rol', _choice(ROLES_USUARIO), False),
+        'status': ('estado', _text, True),
+    },
+}
+
+# Columns that move prices in the calendar when patched
+PRICING_SPANS = { 'habitaciones': pricing.room_span, 'reservas': pricing.reservation_span }
+PRICING_COLUMNS = {
+    'habitaciones': { 'tipo', 'precio_base' },
+    'reservas': { 'habitacion_id', 'fecha_inicio', 'fecha_fin', 'estado' },
+}
+
+def patch_columns(table, data):
+    # Validate the supplied fields and map them to column values
+    fields = PATCH_FIELDS[table]
+    unknown = [k for k in data if k not in fields]
+    if unknown:
+        raise ValueError(f'Campos no permitidos: {", ".join(unknown)}')
+    columns = {}
+    for key, value in data.items():
+        column, validate, nullable = fields[key]
+        if value is None:
+            if not nullable:
+                raise ValueError(f'{key} no puede ser nulo')
+            columns[column] = None
+            continue
+        try:
+            columns[column] = validate(value)
+        except ValueError as e:
+            raise ValueError(f'{key} {e}')
+    return columns
+
+def patch_row(conn, table, row_id, data):
+    """Update only the supplied fields; returns (found, changed)."""
+    columns = patch_columns(table, data)
+    if table == 'habitaciones' and data.get('amenities') is not None:
+        columns['amenidades_mask'] = amenities.mask_for(conn, data['amenities'])
+    if table == 'reservas' and 'habitacion_id' in columns:
+        columns['asignacion_auto'] = 0
+    if table == 'reservas' and columns.keys() & { 'fecha_inicio', 'fecha_fin' }:
+        # Una fecha suelta se valida contra la otra, tal como queda en la fila
+        current = conn.execute('SELECT fecha_inicio, fecha_fin FROM reservas WHERE id=?', (row_id,)).fetchone()
+        if current is not None:
+            try:
+                nights = pricing.day_number(columns.get('fecha_fin', current['fecha_fin'])) - \
+                    pricing.day_number(columns.get('fecha_inicio', current['fecha_inicio']))
+            except (TypeError, ValueError):
+                nights = None  # fechas antiguas en texto libre: no hay con qué comparar
+            if nights is not None and nights <= 0:
+                raise ValueError('checkOut debe ser posterior a checkIn')
+    if not columns:
+        found = conn.execute(f'SELECT 1 FROM {table} WHERE id=?', (row_id,)).fetchone()
+        return bool(found), False
+    # Nights whose price depends on this row, before and after the change
+    span = PRICING_SPANS.get(table)
+    before = span(conn, row_id) if span and PRICING_COLUMNS[table] & columns.keys() else None
+    assignments = ', '.join(f'{c}=?' for c in columns)
+    # Rows whose values already match are filtered out, so no page is written
+    differs = ' OR '.join(f'{c} IS NOT ?' for c in columns)
+    values = list(columns.values())
+    cur = conn.execute(
+        f'UPDATE {table} SET {assignments} WHERE id=? AND ({differs})',
+        values + [row_id] + values
+    )
+    if cur.rowcount:
+        if 'amenidades_mask' in columns:
+            amenities.link_room(conn, row_id, data['amenities'])
+        if before is not None:
+            pricing.recompute(conn, [before, span(conn, row_id)], cache=shard().prices)
+        if table == 'reservas':
+            shard().grid.touch(row_id)
+        elif table == 'habitaciones' and 'tipo' in columns:
+            shard().grid.touch_rooms()
+        return True, True
+    found = conn.execute(f'SELECT 1 FROM {table} WHERE id=?', (row_id,)).fetchone()
+    return bool(found), False
+
+def patch_response(table, row_id, updated_message, missing_message):
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({ 'message': 'Se requiere un objeto JSON' }), 400
+    def published(conn, result):
+        if result[1]:
+            publish_change(conn, table, row_id)
+    try:
+        found, changed = shard().writer.run(lambda conn: patch_row(conn, table, row_id, data), after_commit=published)
+    except ValueError as e:
+        return jsonify({ 'message': str(e) }), 400
+    except sqlite3.IntegrityError as e:
+        return jsonify({ 'message': str(e) }), 409
+    if not found:
+        return jsonify({ 'message': missing_message }), 404
+    return jsonify({ 'message': updated_message if changed else 'Sin cambios', 'changed': changed })
+
+@app.route('/api/habitaciones/<int:room_id>', methods=['PATCH'])
+def patch_habitacion(room_id):
+    return patch_response('habitaciones', room_id, 'Habitación actualizada', 'Habitación no encontrada')
+
+@app.route('/api/reservas/<int:res_id>', methods=['PATCH'])
+def patch_reserva(res_id):
+    return patch_response('reservas', res_id, 'Reserva actualizada', 'Reserva no encontrada')
+
+@app.route('/api/usuarios/<int:user_id>', methods=['PATCH'])
+def patch_usuario(user_id):
+    return patch_response('usuarios', user_id, 'Usuario actualizado', 'Usuario no encontrado')
+
+# --- BATCH ---
+MAX_BATCH_OPERATIONS = 100
+
+BATCH_HANDLERS = {
+    'habitaciones': { 'create': insert_habitacion, 'update': write_habitacion, 'delete': remove_habitacion,
+                      'patch': lambda conn, row_id, data: patch_row(conn, 'habitaciones', row_id, data)[0] },
+    'reservas': { 'create': insert_reserva, 'update': write_reserva, 'delete': remove_reserva,
+                  'patch': lambda conn, row_id, data: patch_row(conn, 'reservas', row_id, data)[0] },
+    'usuarios': { 'create': insert_usuario, 'update': write_usuario, 'delete': remove_usuario,
+                  'patch': lambda conn, row_id, data: patch_row(conn, 'usuarios', row_id, data)[0] },
+}
+
+class BatchError(Exception):
+    def __init__(self, index, message, status=400):
+        super().__init__(message)
+        self.index = index
+        self.message = message
+        self.status = status
+
+def resolve_batch_ref(value, results, index):
+    # "$n" refers to the id produced by operation n of the same batch
+    if isinstance(value, str) and value.startswith('$') and value[1:].isdigit():
+        ref = int(value[1:])
+        if ref >= index or results[ref].get('id') is None:
+            raise BatchError(index, f'Referencia inválida {value}')
+        return results[ref]['id']
+    return value
+
+def run_batch_operation(conn, index, operation, results):
+    resource = operation.get('resource')
+    op = operation.get('op')
+    handler = BATCH_HANDLERS.get(resource, {}).get(op)
+    if handler is None:
+        raise BatchError(index, f'Operación no soportada: {op} {resource}')
+    data = { k: resolve_batch_ref(v, results, index) for k, v in (operation.get('data') or {}).items() }
+    if op == 'create':
+        try:
+            return { 'op': op, 'resource': resource, 'id': handler(conn, data) }
+        except assignment.NoRoomAvailable as e:
+            raise BatchError(index, str(e), 409)
+        except ValueError as e:
+            raise BatchError(index, str(e))
+    row_id = resolve_batch_ref(operation.get('id'), results, index)
+    if row_id is None:
+        raise BatchError(index, 'Falta id')
+    try:
+        rowcount = handler(conn, row_id, data) if op in ('update', 'patch') else handler(conn, row_id)
+    except ValueError as e:
+        raise BatchError(index, str(e))
+    if not rowcount:
+        raise BatchError(index, f'{resource} {row_id} no encontrado', 404)
+    return { 'op': op, 'resource': resource, 'id': row_id }
+
+# Execute several create/update/delete operations in one all-or-nothing transaction
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    operations = (request.json or {}).get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({ 'message': 'Se requiere una lista de operaciones' }), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({ 'message': f'Máximo {MAX_BATCH_OPERATIONS} operaciones por lote' }), 400
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or not isinstance(operation.get('data') or {}, dict):
+            return jsonify({ 'message': f'Operación {index} inválida: se espera un objeto con data como objeto', 'failedIndex': index }), 400
+    operations = [
+        dict(o, data=with_password_hash(o.get('data'))) if o.get('resource') == 'usuarios' else o
+        for o in operations
+    ]
+
+    # Runs inside one savepoint of the writer's group transaction: a failure rolls back the whole batch
+    def apply_batch(conn):
+        results = []
+        for index, operation in enumerate(operations):
+            try:
+                results.append(run_batch_operation(conn, index, operation, results))
+            except sqlite3.Error as e:
+                raise BatchError(index, str(e), 409 if isinstance(e, sqlite3.IntegrityError) else 500)
+        return results
+
+    def published(conn, results):
+        for result in results:
+            publish_change(conn, result['resource'], result['id'])
+
+    try:
+        results = shard().writer.run(apply_batch, after_commit=published)
+    except BatchError as e:
+        return jsonify({ 'message': f'Lote revertido: {e.message}', 'failedIndex': e.index }), e.status
+    return jsonify({ 'message': 'Lote aplicado', 'data': results })
+
+# --- EVENTOS (SSE) ---
+def publish_habitacion(conn, room_id):
+    row = conn.execute('SELECT numero, estado FROM habitaciones WHERE id=?', (room_id,)).fetchone()
+    shard().events.publish('habitacion', {
+        'id': room_id,
+        'number': row['numero'] if row else None,
+        'status': row['estado'] if row else None,
+        'deleted': row is None,
+        'version': changelog.current_version(conn)
+    })
+
+def publish_reserva(conn, res_id):
+    row = conn.execute('SELECT habitacion_id, estado, fecha_inicio, fecha_fin FROM reservas WHERE id=?', (res_id,)).fetchone()
+    shard().events.publish('reserva', {
+        'id': res_id,
+        'roomId': row['habitacion_id'] if row else None,
+        'status': row['estado'] if row else None,
+        'checkIn': row['fecha_inicio'] if row else None,
+        'checkOut': row['fecha_fin'] if row else None,
+        'deleted': row is None,
+        'version': changelog.current_version(conn)
+    })
+
+def publish_change(conn, table, row_id):
+    if table == 'habitaciones':
+        publish_habitacion(conn, row_id)
+    elif table == 'reservas':
+        publish_reserva(conn, row_id)
+
+# Live feed for room boards: ?topics=habitacion,reserva (default both).
+# Each client holds a worker thread, so serve with a threaded/async server.
+@app.route('/api/eventos', methods=['GET'])
+def stream_eventos():
+    topics = [t for t in request.args.get('topics', '').split(',') if t] or None
+    return Response(
+        stream_with_context(events.sse_stream(shard().events, topics)),
+        mimetype='text/event-stream',
+        headers={ 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no' }
+    )
+
+# --- ARCHIVO DE RESERVAS ---
+@app.route('/api/admin/archivo', methods=['GET'])
+def get_archivo():
     conn = get_db_connection()
-    conn.execute('DELETE FROM usuarios WHERE id=?', (user_id,))
-    conn.commit()
+    archive.attach(conn, shard().property.archive_db)
+    result = archive.stats(conn)
     conn.close()
-    return jsonify({ 'message': 'Usuario eliminado' })
+    return jsonify({ 'data': result, 'settings': ARCHIVE_SETTINGS })
+
+# Run one archiving pass now; ?days= overrides the horizon
+@app.route('/api/admin/archivo', methods=['POST'])
+def run_archivo():
+    settings = dict(ARCHIVE_SETTINGS)
+    if request.args.get('days') is not None:
+        settings['older_than_days'] = request.args.get('days', type=int)
+    result = archive.run(shard().writer.run, **settings)
+    return jsonify({ 'message': 'Archivado completado', 'data': result })
+
+# --- ASIGNACIÓN ---
+def apply_moves(conn, moves):
+    for move in moves:
+        before = pricing.reservation_span(conn, move['id'])
+        conn.execute('UPDATE reservas SET habitacion_id=? WHERE id=?', (move['to'], move['id']))
+        pricing.recompute(conn, [before, pricing.reservation_span(conn, move['id'])], cache=shard().prices)
+        shard().grid.touch(move['id'])
+
+# Re-pack future auto-assigned reservations to remove orphan nights: ?days=90&type=suite&dryRun=1
+@app.route('/api/admin/asignacion/optimizar', methods=['POST'])
+def optimizar_asignacion():
+    days = max(1, min(request.args.get('days', 90, type=int), pricing.HORIZON_DAYS))
+    room_type = request.args.get('type')
+    if room_type is not None and room_type not in TIPOS_HABITACION:
+        return jsonify({ 'message': f'type debe ser uno de {list(TIPOS_HABITACION)}' }), 400
+    dry_run = request.args.get('dryRun', '').lower() in ('1', 'true')
+    # Planned and applied in one writer transaction, so no booking lands in between
+    def optimize(conn):
+        plan = assignment.reoptimize(conn, days, room_type)
+        if not dry_run:
+            apply_moves(conn, plan['moves'])
+        return plan
+    def published(conn, plan):
+        if not dry_run:
+            for move in plan['moves']:
+                publish_reserva(conn, move['id'])
+    plan = shard().writer.run(optimize, after_commit=published)
+    return jsonify({ 'message': 'Simulación' if dry_run else 'Reoptimización aplicada', 'data': plan })
+
+# --- RESPALDOS ---
+@app.route('/api/admin/backups', methods=['GET'])
+def get_backups():
+    return jsonify({ 'data': backup.list_backups(shard().backups.backup_dir), 'job': shard().backups.status() })
+
+# Starts an online backup in the background; poll GET for the result
+@app.route('/api/admin/backups', methods=['POST'])
+def create_backup():
+    if not shard().backups.start():
+        return jsonify({ 'message': 'Ya hay un respaldo en curso' }), 409
+    return jsonify({ 'message': 'Respaldo iniciado' }), 202
+
+@app.route('/api/admin/backups/<name>/verify', methods=['POST'])
+def verify_backup(name):
+    try:
+        result = backup.verify(shard().backups.backup_dir, name)
+    except FileNotFoundError as e:
+        return jsonify({ 'message': str(e) }), 404
+    return jsonify({ 'data': result }), 200 if result['ok'] else 422
+
+# Búsqueda de texto completo (admin): ?q=ana gom&type=usuarios|reservas|all&limit=20&offset=0
+@app.route('/api/search', methods=['GET'])
+def search_route():
+    kind = request.args.get('type', 'all')
+    if kind != 'all' and kind not in search.SEARCHES:
+        return jsonify({ 'message': f'Tipo de búsqueda inválido: {kind}' }), 400
+    limit, offset = search.page(request.args.get('limit', 20, type=int), request.args.get('offset', 0, type=int))
+    conn = get_db_connection()
+    result = search.search(conn, request.args.get('q', ''), kind, limit, offset)
+    conn.close()
+    return jsonify({ 'data': result, 'query': request.args.get('q', ''), 'limit': limit, 'offset': offset })
 
 @app.route('/api/login', methods=['POST'])
 def login_route():
@@ -0,0 +1,174 @@
+# Archive
+# Pacific Reef Hotel Management System - Hot/archive partitioning of historical reservations
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SCHEMA = 'archivo'
+ARCHIVED_STATES = ('completada', 'anulada')
+COLUMNS = 'id, codigo, usuario_id, habitacion_id, fecha_inicio, fecha_fin, monto_total, pago, estado'
+
+# Hot rows plus archived rows, tagged with where they live; TEMP because a
+# view in the main schema cannot reference an attached database
+HISTORY_VIEW = f'''
+    CREATE TEMP VIEW IF NOT EXISTS reservas_historicas AS
+    SELECT {COLUMNS}, 'activa' AS origen FROM main.reservas
+    UNION ALL
+    SELECT {COLUMNS}, 'archivo' AS origen FROM {ARCHIVE_SCHEMA}.reservas
+'''
+
+
+def default_path(db_path: str = 'hotel_management.db') -> str:
+    """Archive file next to the main database unless RESERVAS_ARCHIVE_DB says otherwise."""
+    return os.getenv('RESERVAS_ARCHIVE_DB') or os.path.join(os.path.dirname(db_path) or '.', 'hotel_archive.db')
+
+
+def attach(conn, path: str, read_only: bool = False):
+    """
+    Attach the archive as `archivo` and create the reservas_historicas view.
+
+    Must run outside a transaction (SQLite refuses ATTACH inside one) and,
+    on read-only connections, before PRAGMA query_only.
+    """
+    attached = [row[1] for row in conn.execute('PRAGMA database_list')]
+    if ARCHIVE_SCHEMA not in attached:
+        if read_only:
+            conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (f'file:{path}?mode=ro',))
+        else:
+            conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (path,))
+            conn.execute(f'PRAGMA {ARCHIVE_SCHEMA}.journal_mode=WAL')
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.reservas (
+                    id INTEGER PRIMARY KEY,
+                    codigo TEXT NOT NULL,
+                    usuario_id INTEGER NOT NULL,
+                    habitacion_id INTEGER NOT NULL,
+                    fecha_inicio DATE NOT NULL,
+                    fecha_fin DATE NOT NULL,
+                    monto_total REAL NOT NULL,
+                    pago TEXT NOT NULL,
+                    estado TEXT NOT NULL,
+                    archivada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_reservas_fecha ON reservas(fecha_inicio)')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_reservas_usuario ON reservas(usuario_id)')
+    conn.execute(HISTORY_VIEW)
+
+
+def archive_batch(conn, older_than_days: int, batch_size: int) -> int:
+    """
+    Move one batch of old finished reservations into the archive.
+
+    Copy first, then delete: with WAL each file commits on its own, so a
+    crash in between leaves the rows in both places and the next run's
+    INSERT OR REPLACE + DELETE finishes the move. Returns the rows moved.
+    """
+    states = ','.join('?' for _ in ARCHIVED_STATES)
+    ids = [row[0] for row in conn.execute(f'''
+        SELECT id FROM main.reservas
+        WHERE estado IN ({states}) AND fecha_fin < date('now', ?)
+        ORDER BY id LIMIT ?
+    ''', ARCHIVED_STATES + (f'-{int(older_than_days)} days', batch_size)).fetchall()]
+    if not ids:
+        return 0
+    placeholders = ','.join('?' for _ in ids)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.reservas ({COLUMNS})
+        SELECT {COLUMNS} FROM main.reservas WHERE id IN ({placeholders})
+    ''', ids)
+    # Archived rows still exist, so the delete must not reach delta-sync
+    # clients as tombstones; the guard row lives only inside this transaction
+    conn.execute("INSERT OR IGNORE INTO main.cambios_silencio (tabla) VALUES ('reservas')")
+    conn.execute(f'DELETE FROM main.reservas WHERE id IN ({placeholders})', ids)
+    conn.execute("DELETE FROM main.cambios_silencio WHERE tabla = 'reservas'")
+    return len(ids)
+
+
+def run(execute: Callable[[Callable], int], older_than_days: int = 365, batch_size: int = 500,
+        pause: float = 0.05, max_batches: Optional[int] = None) -> Dict:
+    """
+    Archive in short transactions until nothing is left.
+
+    `execute(fn)` runs fn(conn) in one transaction and returns its result:
+    the booking API passes its single writer, the CLI a plain
+    BEGIN IMMEDIATE wrapper. Sleeping `pause` seconds between batches lets
+    booking writes in between, so no write lock is held for long.
+    """
+    moved, batches = 0, 0
+    start = time.perf_counter()
+    while max_batches is None or batches < max_batches:
+        count = execute(lambda conn: archive_batch(conn, older_than_days, batch_size))
+        if not count:
+            break
+        moved += count
+        batches += 1
+        time.sleep(pause)
+    return {'moved': moved, 'batches': batches, 'seconds': round(time.perf_counter() - start, 3)}
+
+
+def stats(conn) -> Dict:
+    """Row counts and date ranges of the hot table and the archive (conn must have the archive attached)."""
+    result = {}
+    for origin, table in (('hot', 'main.reservas'), ('archive', f'{ARCHIVE_SCHEMA}.reservas')):
+        count, first, last = conn.execute(f'SELECT COUNT(*), MIN(fecha_inicio), MAX(fecha_fin) FROM {table}').fetchone()
+        result[origin] = {'rows': count, 'from': first, 'to': last}
+    return result
+
+
+def start_archiver(execute: Callable[[Callable], int], interval: float, older_than_days: int, batch_size: int,
+                   pause: float):
+    """Run an archiving pass every `interval` seconds in a daemon thread."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                result = run(execute, older_than_days, batch_size, pause)
+                if result['moved']:
+                    logger.info(f'Reservations archived: {result}')
+            except Exception as e:
+                logger.error(f'Reservation archiving failed: {e}')
+
+    threading.Thread(target=loop, name='reservas-archiver', daemon=True).start()
+    return stop
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Move old finished reservations to the archive database')
+    parser.add_argument('db', nargs='?', default='hotel_management.db')
+    parser.add_argument('--archive', help='Archive database file (default: hotel_archive.db next to db)')
+    parser.add_argument('--days', type=int, default=365, help='Archive reservations that ended more than N days ago')
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between batches')
+    parser.add_argument('--stats', action='store_true', help='Only print row counts')
+    args = parser.parse_args()
+
+    from database.migrations import apply_migrations
+
+    conn = sqlite3.connect(args.db, isolation_level=None, timeout=30)
+    apply_migrations(conn)
+    attach(conn, args.archive or default_path(args.db))
+
+    def in_transaction(fn):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn)
+            conn.execute('COMMIT')
+            return result
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    if not args.stats:
+        print(run(in_transaction, args.days, args.batch, args.pause))
+    print(stats(conn))
+    conn.close()
@@ -0,0 +1,219 @@
+# Room Assignment
+# Pacific Reef Hotel Management System - Picks rooms for bookings so stays pack without orphan nights
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from pricing import ACTIVE_STATES, day_number, day_string, today_number
+
+MIN_STAY = 2            # free runs shorter than this between two stays cannot be sold
+LOOKAROUND = 28         # nights inspected on each side of a stay
+ORPHAN_PENALTY = 1000   # cost of leaving orphan nights next to a stay
+OUT_OF_SERVICE = 'fuera de servicio'
+
+OVERLAP_QUERY = f'''
+    SELECT 1 FROM reservas
+    WHERE habitacion_id = ? AND fecha_inicio < ? AND fecha_fin > ? AND id != ?
+      AND estado IN ({','.join('?' for _ in ACTIVE_STATES)})
+    LIMIT 1
+'''
+
+
+class NoRoomAvailable(ValueError):
+    pass
+
+
+def _side_cost(gap: np.ndarray, min_stay: int) -> np.ndarray:
+    # Touching a neighbour costs nothing, a sellable leftover costs its length, orphan nights the penalty
+    return np.where(gap == 0, 0, np.where(gap < min_stay, ORPHAN_PENALTY, gap))
+
+
+def score(occupied: np.ndarray, nights: int, lookaround: int = LOOKAROUND, min_stay: int = MIN_STAY):
+    """
+    Fragmentation cost of placing a stay in each room.
+
+    `occupied` holds one row per room covering `lookaround` nights
+    before the stay, the stay and `lookaround` nights after it. The cost
+    is best fit over the free gaps the stay would leave on each side:
+    rooms where it closes a gap exactly come first, then the tightest
+    sellable leftover, then empty stretches (a gap as long as the
+    lookaround); rooms that are taken during the stay cost inf.
+
+    Returns:
+        (cost, gap_before, gap_after) arrays, one entry per row
+    """
+    stay = occupied[:, lookaround:lookaround + nights]
+    before = occupied[:, :lookaround][:, ::-1]
+    after = occupied[:, lookaround + nights:]
+    gap_before = np.where(before.any(axis=1), before.argmax(axis=1), lookaround)
+    gap_after = np.where(after.any(axis=1), after.argmax(axis=1), lookaround)
+    cost = (_side_cost(gap_before, min_stay) + _side_cost(gap_after, min_stay)).astype(np.float64)
+    cost[stay.any(axis=1)] = np.inf
+    return cost, gap_before, gap_after
+
+
+def orphan_nights(occupied: np.ndarray, min_stay: int = MIN_STAY) -> int:
+    """
+    Free nights in runs shorter than `min_stay` with a stay on both sides.
+
+    Runs touching the right edge of the matrix are open-ended and never
+    count; the left edge counts as booked (nights before today).
+    """
+    rooms, width = occupied.shape
+    padded = np.ones((rooms, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = occupied
+    steps = np.diff(padded, axis=1)
+    # With both edges booked every free run opens and closes in the same row, in row-major order
+    opens = np.argwhere(steps == -1)[:, 1]
+    closes = np.argwhere(steps == 1)[:, 1]
+    lengths = closes - opens
+    return int(lengths[(closes < width) & (lengths < min_stay)].sum())
+
+
+def candidates(conn, room_type: str, guests: int) -> List:
+    """Rooms of `room_type` that fit `guests` and are in service."""
+    return conn.execute(
+        'SELECT id, numero FROM habitaciones WHERE tipo = ? AND capacidad >= ? AND estado != ? ORDER BY id',
+        (room_type, guests, OUT_OF_SERVICE)
+    ).fetchall()
+
+
+def rank(conn, grid, room_type: str, guests: int, check_in: str, check_out: str,
+         limit: Optional[int] = None) -> List[Dict]:
+    """
+    Candidate rooms for a stay from the availability grid, best first.
+
+    Nights before today count as booked so stays starting today are not
+    charged for the gap behind them.
+    """
+    start, end = day_number(check_in), day_number(check_out)
+    if end <= start:
+        raise ValueError('La salida debe ser posterior a la llegada')
+    rooms = candidates(conn, room_type, guests)
+    if not rooms:
+        return []
+    ids = [r[0] for r in rooms]
+    occupied = grid.occupancy(conn, ids, start - LOOKAROUND, end + LOOKAROUND)
+    past = today_number() - (start - LOOKAROUND)
+    if past > 0:
+        occupied[:, :past] = True
+    cost, gap_before, gap_after = score(occupied, end - start)
+    order = [i for i in np.argsort(cost, kind='stable') if np.isfinite(cost[i])]
+    return [{
+        'roomId': ids[i], 'number': rooms[i][1], 'cost': float(cost[i]),
+        'gapBefore': int(gap_before[i]), 'gapAfter': int(gap_after[i]),
+    } for i in order[:limit]]
+
+
+def overlaps(conn, room_id: int, check_in: str, check_out: str, res_id: int = 0) -> bool:
+    return conn.execute(OVERLAP_QUERY, (room_id, check_out, check_in, res_id) + ACTIVE_STATES).fetchone() is not None
+
+
+def assign(conn, grid, room_type: str, guests: int, check_in: str, check_out: str) -> Dict:
+    """
+    Best room for a new stay.
+
+    The grid only reflects committed reservations, so each pick is
+    checked against `reservas` on the writer's connection, which also
+    sees bookings made earlier in the same group commit.
+
+    Raises:
+        NoRoomAvailable: no room of the type is free for the whole stay
+    """
+    for room in rank(conn, grid, room_type, guests, check_in, check_out):
+        if not overlaps(conn, room['roomId'], check_in, check_out):
+            return room
+    raise NoRoomAvailable(f'No hay habitaciones {room_type} para {guests} huésped(es) del {check_in} al {check_out}')
+
+
+def reoptimize(conn, horizon_days: int = 90, room_type: Optional[str] = None) -> Dict:
+    """
+    Re-pack future auto-assigned reservations (asignacion_auto = 1).
+
+    Works per room type on a booked-nights matrix read through `conn`
+    (run it on the writer so nothing commits in between). Guest-chosen
+    and started reservations stay put; movable ones arriving within
+    `horizon_days` are removed and placed again in arrival order, longest
+    first, each in the room with the lowest fragmentation cost among
+    those that fit its room's capacity (its current room wins ties). A
+    type's plan is kept only if it leaves fewer orphan nights.
+
+    Returns:
+        Per-type orphan nights before/after and the moves to apply
+        ({'id', 'from', 'to'} per reservation)
+    """
+    today = today_number()
+    states = ACTIVE_STATES
+    marks = ','.join('?' for _ in states)
+    rooms = conn.execute('SELECT id, tipo, capacidad, estado FROM habitaciones ORDER BY id').fetchall()
+    reservations = conn.execute(f'''
+        SELECT id, habitacion_id, fecha_inicio, fecha_fin, asignacion_auto FROM reservas
+        WHERE estado IN ({marks}) AND fecha_fin > ?
+    ''', states + (day_string(today),)).fetchall()
+
+    spans = []
+    for res_id, room_id, check_in, check_out, auto in reservations:
+        try:
+            start, end = max(day_number(check_in), today), day_number(check_out)
+        except (TypeError, ValueError):
+            continue
+        movable = bool(auto) and day_number(check_in) > today and start < today + horizon_days
+        spans.append((res_id, room_id, start, end, movable))
+    last = max([end for *_, end, _ in spans] + [today + horizon_days])
+    # Column 0 is today minus the lookaround (booked), plus free padding after the last night
+    origin = today - LOOKAROUND
+    width = last - origin + LOOKAROUND
+
+    result = {'horizonDays': horizon_days, 'types': {}, 'moves': []}
+    for tipo in sorted({r[1] for r in rooms} if room_type is None else {room_type}):
+        type_rooms = [r for r in rooms if r[1] == tipo]
+        row_of = {r[0]: i for i, r in enumerate(type_rooms)}
+        capacity = np.array([r[2] for r in type_rooms])
+        in_service = np.array([r[3] != OUT_OF_SERVICE for r in type_rooms], dtype=bool)
+        fixed = np.zeros((len(type_rooms), width + 1), dtype=np.int32)
+        fixed[:, 0] = 1
+        fixed[:, LOOKAROUND] = -1
+        moving = []
+        for res_id, room_id, start, end, movable in spans:
+            row = row_of.get(room_id)
+            if row is None:
+                continue
+            if movable:
+                moving.append((res_id, row, start - origin, end - origin))
+            else:
+                fixed[row, start - origin] += 1
+                fixed[row, end - origin] -= 1
+        if not moving:
+            continue
+        occupied = np.cumsum(fixed[:, :width], axis=1) > 0
+        before = occupied.copy()
+        for _, row, start, end in moving:
+            before[row, start:end] = True
+
+        after = occupied.copy()
+        plan = []
+        for res_id, row, start, end in sorted(moving, key=lambda m: (m[2], m[2] - m[3], m[0])):
+            cost, _, _ = score(after[:, start - LOOKAROUND:end + LOOKAROUND], end - start)
+            cost[(capacity < capacity[row]) | ~in_service] = np.inf
+            cost[row] -= 0.5
+            best = int(np.argmin(cost))
+            if not np.isfinite(cost[best]):
+                plan = None
+                break
+            after[best, start:end] = True
+            plan.append((res_id, row, best))
+
+        orphans_before = orphan_nights(before[:, LOOKAROUND:])
+        orphans_after = orphan_nights(after[:, LOOKAROUND:]) if plan is not None else None
+        improved = plan is not None and orphans_after < orphans_before
+        moves = [{'id': res_id, 'from': type_rooms[row][0], 'to': type_rooms[best][0]}
+                 for res_id, row, best in (plan or []) if best != row] if improved else []
+        result['types'][tipo] = {
+            'rooms': len(type_rooms), 'movable': len(moving),
+            'orphanNightsBefore': orphans_before,
+            'orphanNightsAfter': orphans_after if improved else orphans_before,
+            'moved': len(moves),
+        }
+        result['moves'].extend(moves)
+    return result
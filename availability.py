@@ -0,0 +1,192 @@
+# Availability
+# Pacific Reef Hotel Management System - In-memory rooms x days occupancy grid
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pricing import ACTIVE_STATES, day_number, day_string, today_number
+
+PAST_DAYS = 31       # keep last month's nights for month grids
+HORIZON_DAYS = 365   # nights ahead of today
+
+RESERVATION_QUERY = f'''
+    SELECT id, habitacion_id, fecha_inicio, fecha_fin FROM reservas
+    WHERE estado IN ({','.join('?' for _ in ACTIVE_STATES)})
+'''
+
+
+class AvailabilityGrid:
+    """
+    Booked-reservation counts for every room and night over a rolling window.
+
+    The matrix is built once from `reservas` and then maintained
+    incrementally: write helpers call touch()/touch_rooms() inside their
+    transaction and the writer calls committed() after COMMIT, which
+    re-reads only the touched reservations. Re-reading committed rows
+    (instead of trusting what the handler saw) keeps the grid right even
+    when a savepoint was rolled back. Counts rather than booleans make
+    removing one of two overlapping reservations exact.
+    """
+
+    def __init__(self, past_days: int = PAST_DAYS, horizon_days: int = HORIZON_DAYS):
+        self.past_days = past_days
+        self.horizon_days = horizon_days
+        self._lock = threading.Lock()
+        self._touched = set()
+        self._rooms_dirty = False
+        self._built = False
+        self.first_day = 0
+        self.counts = np.zeros((0, 0), dtype=np.int16)
+        self.room_ids = np.zeros(0, dtype=np.int64)
+        self.room_numbers: List[str] = []
+        self._rows: Dict[int, int] = {}
+        self._types: Dict[str, slice] = {}
+        self._spans: Dict[int, Tuple[int, int, int]] = {}
+        self.builds = 0
+        self.incremental_updates = 0
+
+    # --- maintenance ---
+
+    def touch(self, res_id: int):
+        """Mark a reservation as changed by the current transaction."""
+        self._touched.add(res_id)
+
+    def touch_rooms(self):
+        """Rooms were added, removed or retyped: rebuild on next commit."""
+        self._rooms_dirty = True
+
+    def committed(self, conn):
+        with self._lock:
+            if not self._built:
+                self._touched.clear()
+                return
+            if self._rooms_dirty or self.first_day != today_number() - self.past_days:
+                self._touched.clear()
+                self._build(conn)
+                return
+            touched, self._touched = self._touched, set()
+            for res_id in touched:
+                self._apply(res_id, self._read_span(conn, res_id))
+            self.incremental_updates += len(touched)
+
+    def build(self, conn):
+        with self._lock:
+            self._build(conn)
+
+    def _build(self, conn):
+        rooms = conn.execute('SELECT id, tipo, numero FROM habitaciones ORDER BY tipo, id').fetchall()
+        self.first_day = today_number() - self.past_days
+        width = self.past_days + self.horizon_days
+        self.room_ids = np.array([r[0] for r in rooms], dtype=np.int64)
+        self.room_numbers = [r[2] for r in rooms]
+        self._rows = {r[0]: i for i, r in enumerate(rooms)}
+        self._types = {}
+        for i, r in enumerate(rooms):
+            current = self._types.get(r[1])
+            self._types[r[1]] = slice(current.start if current else i, i + 1)
+        self.counts = np.zeros((len(rooms), width), dtype=np.int16)
+        self._spans = {}
+
+        rows = conn.execute(RESERVATION_QUERY, ACTIVE_STATES).fetchall()
+        spans = [(r[0], self._clip(r[1], r[2], r[3])) for r in rows]
+        spans = [(res_id, span) for res_id, span in spans if span is not None]
+        if spans:
+            room_rows = np.array([s[0] for _, s in spans])
+            starts = np.array([s[1] for _, s in spans])
+            ends = np.array([s[2] for _, s in spans])
+            # Difference array per room, then one cumulative sum across all nights
+            diff = np.zeros((len(rooms), width + 1), dtype=np.int32)
+            np.add.at(diff, (room_rows, starts), 1)
+            np.add.at(diff, (room_rows, ends), -1)
+            self.counts = np.cumsum(diff[:, :width], axis=1).astype(np.int16)
+            self._spans = dict(spans)
+        # Pending touches are kept: a transaction still open may commit after this build
+        self._rooms_dirty = False
+        self._built = True
+        self.builds += 1
+
+    def _clip(self, room_id, check_in, check_out) -> Optional[Tuple[int, int, int]]:
+        row = self._rows.get(room_id)
+        if row is None:
+            return None
+        try:
+            start = max(day_number(check_in) - self.first_day, 0)
+            end = min(day_number(check_out) - self.first_day, self.past_days + self.horizon_days)
+        except (TypeError, ValueError):
+            return None
+        return (row, start, end) if start < end else None
+
+    def _read_span(self, conn, res_id):
+        row = conn.execute(RESERVATION_QUERY + ' AND id = ?', ACTIVE_STATES + (res_id,)).fetchone()
+        return self._clip(row[1], row[2], row[3]) if row else None
+
+    def _apply(self, res_id, span):
+        old = self._spans.pop(res_id, None)
+        if old is not None:
+            self.counts[old[0], old[1]:old[2]] -= 1
+        if span is not None:
+            self.counts[span[0], span[1]:span[2]] += 1
+            self._spans[res_id] = span
+
+    # --- queries ---
+
+    def _window(self, conn, start: int, days: int) -> Tuple[int, int]:
+        if not self._built or self.first_day != today_number() - self.past_days:
+            self._build(conn)
+        first = start - self.first_day
+        if first < 0 or first + days > self.counts.shape[1] or days <= 0:
+            raise ValueError(f'Rango fuera del calendario ({day_string(self.first_day)} .. '
+                             f'{day_string(self.first_day + self.counts.shape[1] - 1)})')
+        return first, first + days
+
+    def free_by_type(self, conn, start: int, days: int) -> Dict:
+        """Free rooms per type for each night start..start+days-1."""
+        with self._lock:
+            first, last = self._window(conn, start, days)
+            free = self.counts[:, first:last] == 0
+            by_type = {tipo: free[rows].sum(axis=0).tolist() for tipo, rows in self._types.items()}
+        return {
+            'dates': [day_string(start + i) for i in range(days)],
+            'types': by_type,
+            'rooms': {tipo: rows.stop - rows.start for tipo, rows in self._types.items()},
+        }
+
+    def grid(self, conn, start: int, days: int) -> Dict:
+        """Per-room occupied flags (1 = booked) for nights start..start+days-1."""
+        with self._lock:
+            first, last = self._window(conn, start, days)
+            occupied = (self.counts[:, first:last] > 0).astype(np.uint8)
+            rooms = [{
+                'id': int(self.room_ids[i]), 'number': self.room_numbers[i], 'type': tipo,
+                'occupied': occupied[i].tolist()
+            } for tipo, rows in self._types.items() for i in range(rows.start, rows.stop)]
+        return {'dates': [day_string(start + i) for i in range(days)], 'rooms': rooms}
+
+    def occupancy(self, conn, room_ids, start: int, end: int) -> np.ndarray:
+        """
+        Booked flags of `room_ids` (in that order) for nights start..end-1.
+
+        Unlike grid(), the range may run past either end of the window:
+        nights outside it, and rooms the grid does not know, read as free.
+        """
+        with self._lock:
+            if not self._built or self.first_day != today_number() - self.past_days:
+                self._build(conn)
+            result = np.zeros((len(room_ids), max(end - start, 0)), dtype=bool)
+            first = max(start - self.first_day, 0)
+            last = min(end - self.first_day, self.counts.shape[1])
+            if first < last:
+                rows = [self._rows.get(room_id, -1) for room_id in room_ids]
+                known = np.array([r >= 0 for r in rows], dtype=bool)
+                offset = first - (start - self.first_day)
+                result[known, offset:offset + last - first] = self.counts[np.array(rows)[known], first:last] > 0
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'rooms': int(self.counts.shape[0]), 'days': int(self.counts.shape[1]),
+            'reservations': len(self._spans), 'builds': self.builds,
+            'incremental_updates': self.incremental_updates,
+        }
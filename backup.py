@@ -0,0 +1,345 @@
+# Backup
+# Pacific Reef Hotel Management System - Online incremental backups, retention, verify and restore
+
+import os
+import gzip
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from archive import ARCHIVE_SCHEMA, default_path
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = '.db.gz'
+CHUNK = 1024 * 1024
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _row_counts(conn) -> Dict[str, int]:
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+        "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%'")]
+    return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+
+
+def _copy(src, schema: str, partial: str, pages_per_step: int, progress) -> Dict:
+    """Back up one schema of `src` into `partial`; returns its page geometry and row counts."""
+    dst = sqlite3.connect(partial)
+    try:
+        src.backup(dst, pages=pages_per_step, progress=progress, name=schema)
+        # Self-contained file: no -wal needed next to it
+        dst.execute('PRAGMA journal_mode=DELETE')
+        return {
+            'page_size': dst.execute('PRAGMA page_size').fetchone()[0],
+            'pages': dst.execute('PRAGMA page_count').fetchone()[0],
+            'tables': _row_counts(dst),
+        }
+    finally:
+        dst.close()
+
+
+def _store(partial: str, final: str, compress: bool) -> Dict:
+    """Checksum the copy and move it into place (gzipped when `compress`)."""
+    checksum = _sha256(partial)
+    size = os.path.getsize(partial)
+    if compress:
+        with open(partial, 'rb') as raw, gzip.open(final + '.tmp', 'wb', compresslevel=6) as packed:
+            shutil.copyfileobj(raw, packed, CHUNK)
+        os.replace(final + '.tmp', final)
+        os.remove(partial)
+    else:
+        os.replace(partial, final)
+    return {'file': os.path.basename(final), 'bytes': size, 'stored_bytes': os.path.getsize(final), 'sha256': checksum}
+
+
+def create_backup(db_path: str, backup_dir: str = 'backups', pages_per_step: int = 1024, pause: float = 0.01,
+                  compress: bool = True, archive_path: Optional[str] = None) -> Dict:
+    """
+    Copy a live database with the online backup API, a few pages at a time.
+
+    A read transaction is held on the source for the whole copy, so the
+    backup is one consistent snapshot and writes from other connections
+    do not restart it; in WAL mode those writes keep committing while
+    the copy sleeps `pause` seconds between steps. The WAL cannot be
+    checkpointed past that snapshot until the backup ends.
+
+    When `archive_path` exists (the reservations archive, see
+    archive.py) it is attached and copied in the same read transaction,
+    so both files come from the same moment.
+
+    The result is written as <name>.db.gz (or .db), plus
+    <name>-archive.db.gz, with a JSON manifest holding checksums and
+    per-table row counts for verify().
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    name = f'{os.path.splitext(os.path.basename(db_path))[0]}-{stamp}'
+    extension = SUFFIX if compress else '.db'
+    with_archive = bool(archive_path) and os.path.exists(archive_path)
+    start = time.perf_counter()
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if remaining and pause:
+            time.sleep(pause)
+
+    src = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        if with_archive:
+            src.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (archive_path,))
+        src.execute('BEGIN')
+        src.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        if with_archive:
+            src.execute(f'SELECT COUNT(*) FROM {ARCHIVE_SCHEMA}.sqlite_master').fetchone()
+        main = _copy(src, 'main', os.path.join(backup_dir, f'.{name}.partial'), pages_per_step, progress)
+        if with_archive:
+            archived = _copy(src, ARCHIVE_SCHEMA, os.path.join(backup_dir, f'.{name}-archive.partial'),
+                             pages_per_step, progress)
+        src.execute('COMMIT')
+    finally:
+        src.close()
+
+    stored = _store(os.path.join(backup_dir, f'.{name}.partial'), os.path.join(backup_dir, name + extension), compress)
+    manifest = {
+        'name': name,
+        'file': stored['file'],
+        'source': os.path.abspath(db_path),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'page_size': main['page_size'],
+        'pages': main['pages'],
+        'bytes': stored['bytes'],
+        'stored_bytes': stored['stored_bytes'],
+        'sha256': stored['sha256'],
+        'tables': main['tables'],
+        'archive': None,
+        'steps': steps,
+    }
+    if with_archive:
+        manifest['archive'] = {
+            **_store(os.path.join(backup_dir, f'.{name}-archive.partial'),
+                     os.path.join(backup_dir, f'{name}-archive{extension}'), compress),
+            'source': os.path.abspath(archive_path),
+            'pages': archived['pages'],
+            'tables': archived['tables'],
+        }
+    manifest['seconds'] = round(time.perf_counter() - start, 3)
+    with open(os.path.join(backup_dir, name + '.json.tmp'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(backup_dir, name + '.json.tmp'), os.path.join(backup_dir, name + '.json'))
+    return manifest
+
+
+def list_backups(backup_dir: str = 'backups') -> List[Dict]:
+    """Manifests of every finished backup, oldest first."""
+    if not os.path.isdir(backup_dir):
+        return []
+    manifests = []
+    for entry in os.listdir(backup_dir):
+        if entry.endswith('.json'):
+            with open(os.path.join(backup_dir, entry)) as f:
+                manifests.append(json.load(f))
+    return sorted(manifests, key=lambda m: m['created_at'])
+
+
+def prune(backup_dir: str = 'backups', keep: int = 7, max_age_days: Optional[float] = None) -> List[str]:
+    """Delete all but the `keep` newest backups, and any older than max_age_days."""
+    manifests = list_backups(backup_dir)
+    now = datetime.now(timezone.utc)
+    removed = []
+    for index, manifest in enumerate(manifests):
+        newest = index >= len(manifests) - keep
+        age_days = (now - datetime.fromisoformat(manifest['created_at'])).total_seconds() / 86400
+        if newest and (max_age_days is None or age_days <= max_age_days):
+            continue
+        files = [manifest['file'], manifest['name'] + '.json']
+        if manifest.get('archive'):
+            files.append(manifest['archive']['file'])
+        for path in files:
+            try:
+                os.remove(os.path.join(backup_dir, path))
+            except FileNotFoundError:
+                pass
+        removed.append(manifest['name'])
+    return removed
+
+
+def _find(backup_dir: str, name: str) -> Dict:
+    for manifest in list_backups(backup_dir):
+        if manifest['name'] == name:
+            return manifest
+    raise FileNotFoundError(f'No existe el respaldo {name}')
+
+
+def _extract(backup_dir: str, manifest: Dict, target: str):
+    # `manifest` is a backup's manifest or its 'archive' entry (both carry file/sha256/tables)
+    source = os.path.join(backup_dir, manifest['file'])
+    opener = gzip.open if manifest['file'].endswith(SUFFIX) else open
+    with opener(source, 'rb') as packed, open(target, 'wb') as raw:
+        shutil.copyfileobj(packed, raw, CHUNK)
+
+
+def _check(path: str, manifest: Dict) -> List[str]:
+    problems = []
+    if _sha256(path) != manifest['sha256']:
+        problems.append('checksum mismatch')
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        integrity = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+        if integrity != ['ok']:
+            problems += integrity[:10]
+        counts = _row_counts(conn)
+    finally:
+        conn.close()
+    for table, expected in manifest['tables'].items():
+        if counts.get(table) != expected:
+            problems.append(f'{table}: {counts.get(table)} rows, expected {expected}')
+    return problems
+
+
+def verify(backup_dir: str, name: str) -> Dict:
+    """Decompress a backup (and its archive) to temporary files and check checksum, integrity and row counts."""
+    manifest = _find(backup_dir, name)
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, part in (('', manifest), ('archive: ', manifest.get('archive'))):
+            if part:
+                path = os.path.join(tmp, 'verify.db')
+                _extract(backup_dir, part, path)
+                problems += [label + problem for problem in _check(path, part)]
+                os.remove(path)
+    return {'name': manifest['name'], 'ok': not problems, 'problems': problems}
+
+
+def restore(backup_dir: str, target: str, at: Optional[str] = None, name: Optional[str] = None,
+            archive_target: Optional[str] = None) -> Dict:
+    """
+    Restore into a NEW file: the named backup, or the newest one taken at or before `at` (ISO time).
+
+    Point-in-time granularity is the backup schedule; the live database
+    is never touched. A backup that includes the reservations archive
+    restores it too, to `archive_target` (default <target>_archive.db).
+    The restored files are verified before returning.
+    """
+    archive_target = archive_target or os.path.splitext(target)[0] + '_archive.db'
+    for path in (target, archive_target):
+        if os.path.exists(path):
+            raise FileExistsError(f'{path} ya existe; la restauración solo escribe archivos nuevos')
+    if name:
+        manifest = _find(backup_dir, name)
+    else:
+        limit = datetime.fromisoformat(at) if at else datetime.now(timezone.utc)
+        if limit.tzinfo is None:
+            limit = limit.replace(tzinfo=timezone.utc)
+        candidates = [m for m in list_backups(backup_dir) if datetime.fromisoformat(m['created_at']) <= limit]
+        if not candidates:
+            raise FileNotFoundError(f'No hay respaldos anteriores a {limit.isoformat()}')
+        manifest = candidates[-1]
+    parts = [(manifest, target)] + ([(manifest['archive'], archive_target)] if manifest.get('archive') else [])
+    for part, path in parts:
+        _extract(backup_dir, part, path + '.partial')
+        problems = _check(path + '.partial', part)
+        if problems:
+            for _, partial in parts:
+                if os.path.exists(partial + '.partial'):
+                    os.remove(partial + '.partial')
+            raise ValueError(f'El respaldo {manifest["name"]} no pasó la verificación: {problems}')
+    for _, path in parts:
+        os.replace(path + '.partial', path)
+    return {'restored': manifest['name'], 'created_at': manifest['created_at'], 'target': os.path.abspath(target),
+            'archive_target': os.path.abspath(archive_target) if manifest.get('archive') else None}
+
+
+class BackupJob:
+    """One backup at a time in a background thread, with its last result for the admin API."""
+
+    def __init__(self, db_path: str, backup_dir: str, keep: int, archive_path: Optional[str] = None, **options):
+        self.db_path = db_path
+        self.archive_path = archive_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.options = options
+        self._lock = threading.Lock()
+        self.running = False
+        self.last_result = None
+        self.last_error = None
+
+    def start(self) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+        threading.Thread(target=self._run, name='backup', daemon=True).start()
+        return True
+
+    def _run(self):
+        try:
+            self.last_result = create_backup(self.db_path, self.backup_dir, archive_path=self.archive_path, **self.options)
+            self.last_error = None
+            prune(self.backup_dir, self.keep)
+        except Exception as e:
+            logger.error(f'Backup failed: {e}')
+            self.last_error = str(e)
+        finally:
+            self.running = False
+
+    def status(self) -> Dict:
+        return {'running': self.running, 'last_result': self.last_result, 'last_error': self.last_error}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Online backups of the booking database')
+    parser.add_argument('--dir', default='backups', help='Backup directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    create = commands.add_parser('create', help='Take an online backup')
+    create.add_argument('db', nargs='?', default='hotel_management.db')
+    create.add_argument('--pages', type=int, default=1024, help='Pages copied per step')
+    create.add_argument('--pause', type=float, default=0.01, help='Seconds to sleep between steps')
+    create.add_argument('--no-compress', action='store_true')
+    create.add_argument('--archive', help='Reservations archive to back up with it (default: hotel_archive.db next to db)')
+    create.add_argument('--keep', type=int, help='Prune to the N newest backups afterwards')
+    commands.add_parser('list', help='List backups')
+    check = commands.add_parser('verify', help='Verify a backup')
+    check.add_argument('name')
+    back = commands.add_parser('restore', help='Restore into a new file')
+    back.add_argument('target')
+    back.add_argument('--at', help='Newest backup taken at or before this ISO time')
+    back.add_argument('--name', help='Restore this backup')
+    back.add_argument('--archive-target', help='Where to restore the archive (default: <target>_archive.db)')
+    trim = commands.add_parser('prune', help='Apply retention')
+    trim.add_argument('--keep', type=int, default=7)
+    trim.add_argument('--max-age-days', type=float)
+    args = parser.parse_args()
+
+    if args.command == 'create':
+        archive_path = args.archive or default_path(args.db)
+        print(json.dumps(create_backup(args.db, args.dir, args.pages, args.pause, not args.no_compress, archive_path), indent=2))
+        if args.keep:
+            print(f'Eliminados: {prune(args.dir, args.keep)}')
+    elif args.command == 'list':
+        for m in list_backups(args.dir):
+            print(f"{m['name']}  {m['created_at']}  {m['bytes'] / 1e6:.1f} MB -> {m['stored_bytes'] / 1e6:.1f} MB  {m['seconds']}s")
+    elif args.command == 'verify':
+        print(json.dumps(verify(args.dir, args.name), indent=2))
+    elif args.command == 'restore':
+        print(json.dumps(restore(args.dir, args.target, args.at, args.name, args.archive_target), indent=2))
+    elif args.command == 'prune':
+        print(f'Eliminados: {prune(args.dir, args.keep, args.max_age_days)}')
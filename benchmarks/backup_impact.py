@@ -0,0 +1,98 @@
+# Backup Impact Benchmark
+# Pacific Reef Hotel Management System - write latency before and during an online backup
+#
+# Builds a synthetic WAL database of --size-mb (use 2048+ for the multi-GB case), keeps a
+# writer committing small reservations, and compares commit latency without and with a backup:
+#   python benchmarks/backup_impact.py --size-mb 512
+#   python benchmarks/backup_impact.py --size-mb 3072 --pages 4096 --pause 0.005
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import backup
+
+ROW_BYTES = 1000
+
+
+def build(path, size_mb):
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE relleno (id INTEGER PRIMARY KEY, datos BLOB)')
+    conn.execute('CREATE TABLE reservas (id INTEGER PRIMARY KEY, codigo TEXT, fecha TEXT)')
+    rows = size_mb * 1024 * 1024 // ROW_BYTES
+    # 64 random blobs (64 KB) cycle beyond gzip's 32 KB window: near worst case for compression time
+    payloads = [os.urandom(ROW_BYTES) for _ in range(64)]
+    for start in range(0, rows, 50_000):
+        conn.executemany('INSERT INTO relleno (datos) VALUES (?)',
+                         ((payloads[i % 64],) for i in range(min(50_000, rows - start))))
+        conn.commit()
+    conn.close()
+
+
+def write_latencies(path, stop, interval):
+    conn = sqlite3.connect(path, timeout=30)
+    latencies = []
+    n = 0
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        conn.execute("INSERT INTO reservas (codigo, fecha) VALUES (?, date('now'))", (f'BK-{n}',))
+        conn.commit()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        n += 1
+        time.sleep(interval)
+    conn.close()
+    return latencies
+
+
+def phase(path, seconds_or_fn, interval):
+    stop = threading.Event()
+    result = {}
+    writer = threading.Thread(target=lambda: result.setdefault('lat', write_latencies(path, stop, interval)))
+    writer.start()
+    extra = None
+    if callable(seconds_or_fn):
+        extra = seconds_or_fn()
+    else:
+        time.sleep(seconds_or_fn)
+    stop.set()
+    writer.join()
+    return np.array(result['lat']), extra
+
+
+def report(label, lat):
+    print(f'{label:<18} writes={lat.size:6d} p50={np.percentile(lat, 50):7.2f}ms p99={np.percentile(lat, 99):7.2f}ms '
+          f'max={lat.max():8.2f}ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write latency impact of an online backup')
+    parser.add_argument('--size-mb', type=int, default=512)
+    parser.add_argument('--pages', type=int, default=1024, help='Pages per backup step')
+    parser.add_argument('--pause', type=float, default=0.01, help='Sleep between backup steps')
+    parser.add_argument('--write-interval', type=float, default=0.005, help='Sleep between writer commits')
+    parser.add_argument('--no-compress', action='store_true')
+    parser.add_argument('--dir', help='Work directory (default: a temporary one)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        db = os.path.join(tmp, 'bench.db')
+        t0 = time.perf_counter()
+        build(db, args.size_mb)
+        print(f'built {os.path.getsize(db) / 1e9:.2f} GB in {time.perf_counter() - t0:.1f}s')
+
+        baseline, _ = phase(db, 5.0, args.write_interval)
+        during, manifest = phase(db, lambda: backup.create_backup(
+            db, os.path.join(tmp, 'backups'), args.pages, args.pause, not args.no_compress), args.write_interval)
+        report('baseline', baseline)
+        report('during backup', during)
+        print(f"backup: {manifest['bytes'] / 1e9:.2f} GB -> {manifest['stored_bytes'] / 1e9:.2f} GB, "
+              f"{manifest['steps']} steps, {manifest['seconds']}s")
+        print(backup.verify(os.path.join(tmp, 'backups'), manifest['name']))
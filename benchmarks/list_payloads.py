@@ -0,0 +1,82 @@
+# List Payload Benchmark
+# Pacific Reef Hotel Management System - bytes on the wire and time for ?fields= and compression
+#
+# Runs the booking API in-process against a temporary, enlarged copy of the database:
+#   python benchmarks/list_payloads.py --rooms 500 --reservations 20000
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CASES = [
+    ('/api/habitaciones', None),
+    ('/api/habitaciones', 'id,number,status'),
+    ('/api/reservas', None),
+    ('/api/reservas', 'id,code,status'),
+    ('/api/usuarios', None),
+    ('/api/usuarios', 'id,name'),
+]
+
+
+def enlarge(db, rooms, reservations):
+    conn = sqlite3.connect(db)
+    conn.executemany(
+        "INSERT INTO habitaciones (numero, nombre, tipo, piso, estado, amenidades, capacidad, precio_base, precio_actual) "
+        "VALUES (?, ?, 'standard', ?, 'disponible', 'WiFi,TV,Aire Acondicionado', 2, 120, 120)",
+        [(f'B{i}', f'Habitación de prueba {i}', i % 10 + 1) for i in range(rooms)]
+    )
+    conn.executemany(
+        "INSERT INTO reservas (codigo, usuario_id, habitacion_id, fecha_inicio, fecha_fin, monto_total, pago, estado) "
+        "VALUES (?, 2, ?, '2024-01-01', '2024-01-03', 240, 'Pagado', 'completada')",
+        [(f'BENCH-{i}', i % 8 + 1) for i in range(reservations)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def measure(client, url, encoding, runs):
+    headers = {'Accept-Encoding': encoding} if encoding else {'Accept-Encoding': 'identity'}
+    times, size = [], 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        times.append((time.perf_counter() - start) * 1000)
+        size = len(response.data)
+    return size, statistics.median(times)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='List endpoint payload size and latency')
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--reservations', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(os.path.join(ROOT, 'hotel_management.db'), tmp)
+        os.chdir(tmp)
+        os.environ['ADMISSION_CONTROL'] = 'false'
+        import app as booking
+        import compression
+        enlarge(os.path.join(tmp, 'hotel_management.db'), args.rooms, args.reservations)
+        client = booking.app.test_client()
+
+        encodings = [None, 'gzip'] + (['br'] if compression.brotli else [])
+        print(f'{"route":<44}' + ''.join(f'{(e or "identity"):>22}' for e in encodings))
+        for path, fields in CASES:
+            url = f'{path}?fields={fields}' if fields else path
+            cells = []
+            for encoding in encodings:
+                size, ms = measure(client, url, encoding, args.runs)
+                cells.append(f'{size / 1024:9.1f}KiB {ms:7.1f}ms')
+            print(f'{url:<44}' + ''.join(f'{c:>22}' for c in cells))
+        if not compression.brotli:
+            print('(brotli not installed: br column skipped)')
@@ -0,0 +1,79 @@
+# Login Hashing Benchmark
+# Pacific Reef Hotel Management System - login throughput at different KDF cost settings
+#
+#   python benchmarks/login_hashing.py --clients 16 --logins 10
+#   python benchmarks/login_hashing.py --workers 4 --scrypt-n 16384 32768 65536 --pbkdf2 200000 600000
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from credentials import PasswordHasher
+
+
+def bench(label, hasher, clients, logins):
+    stored = hasher.hash('client123')
+    latencies = []
+    lock = threading.Lock()
+    gate = threading.Barrier(clients + 1)
+    # A cheap request running next to the logins: shows whether request threads stall
+    cheap = []
+    stop = threading.Event()
+
+    def client():
+        local = []
+        gate.wait()
+        for _ in range(logins):
+            t0 = time.perf_counter()
+            matches, _ = hasher.verify_async('client123', stored).result()
+            assert matches
+            local.append((time.perf_counter() - t0) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    def cheap_requests():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            sum(range(1000))
+            cheap.append((time.perf_counter() - t0) * 1000)
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    side = threading.Thread(target=cheap_requests)
+    side.start()
+    gate.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    side.join()
+
+    arr = np.array(latencies)
+    print(f'{label:<28} logins/s={len(arr) / elapsed:7.1f} p50={np.percentile(arr, 50):8.1f}ms '
+          f'p99={np.percentile(arr, 99):8.1f}ms cheap-request p99={np.percentile(cheap, 99):.2f}ms')
+    hasher.executor.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Password hashing login throughput')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent login threads')
+    parser.add_argument('--logins', type=int, default=10, help='Logins per client')
+    parser.add_argument('--workers', type=int, default=2, help='KDF executor threads')
+    parser.add_argument('--scrypt-n', type=int, nargs='*', default=[2 ** 13, 2 ** 14, 2 ** 15])
+    parser.add_argument('--pbkdf2', type=int, nargs='*', default=[100_000, 600_000])
+    args = parser.parse_args()
+
+    print(f'clients={args.clients} logins/client={args.logins} workers={args.workers} cpus={os.cpu_count()}')
+    for n in args.scrypt_n:
+        bench(f'scrypt n={n}', PasswordHasher('scrypt', scrypt_n=n, workers=args.workers), args.clients, args.logins)
+    for iterations in args.pbkdf2:
+        bench(f'pbkdf2_sha256 i={iterations}', PasswordHasher('pbkdf2_sha256', pbkdf2_iterations=iterations,
+                                                             workers=args.workers), args.clients, args.logins)
@@ -0,0 +1,149 @@
+# Room Assignment Benchmark
+# Pacific Reef Hotel Management System - first free room vs the fragmentation-aware assigner
+#
+# Builds a synthetic hotel of --rooms rooms on a copy of the schema, books a random stream of
+# stays (arrivals within --days, requested in random order) under each policy, cancels a share
+# of them and re-packs the rest with the batch re-optimizer:
+#   python benchmarks/room_assignment.py --rooms 2000 --days 30
+#   python benchmarks/room_assignment.py --rooms 5000 --days 14 --load 0.9
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import assignment
+import properties
+from availability import AvailabilityGrid
+from database.migrations import apply_migrations
+from pricing import ACTIVE_STATES, day_string, today_number
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TYPES = ('standard', 'deluxe', 'suite', 'villa')
+
+
+def build(path, template, rooms):
+    properties.clone_schema(template, path)
+    conn = sqlite3.connect(path)
+    apply_migrations(conn)
+    conn.execute("INSERT INTO usuarios (username, password, nombre, email, rol, estado) "
+                 "VALUES ('bench', 'x', 'Bench', 'bench@example.com', 'client', 'activo')")
+    conn.executemany(
+        "INSERT INTO habitaciones (numero, nombre, tipo, piso, estado, capacidad, precio_base, precio_actual) "
+        "VALUES (?, ?, ?, ?, 'disponible', ?, 100, 100)",
+        ((str(1000 + i), f'Hab {i}', TYPES[i % len(TYPES)], i // 100, 2 + (i // len(TYPES)) % 3) for i in range(rooms))
+    )
+    conn.commit()
+    return conn
+
+
+def stream(rooms, days, load, seed):
+    """Random (type, guests, check-in, check-out) requests worth `load` of the room-nights."""
+    rng = np.random.default_rng(seed)
+    today = today_number()
+    nights = np.clip(rng.geometric(0.3, size=rooms * days), 1, 10)
+    count = int(np.searchsorted(np.cumsum(nights), rooms * days * load))
+    arrivals = today + rng.integers(0, days, size=count)
+    return [(TYPES[rng.integers(len(TYPES))], int(rng.integers(1, 4)), day_string(int(a)), day_string(int(a + n)))
+            for a, n in zip(arrivals, nights[:count])]
+
+
+def first_free(conn, grid, room_type, guests, check_in, check_out):
+    # Baseline: the lowest-numbered room that is free, as a front desk picking from a list would
+    rooms = assignment.candidates(conn, room_type, guests)
+    for room_id, number in rooms:
+        if not assignment.overlaps(conn, room_id, check_in, check_out):
+            return {'roomId': room_id, 'number': number}
+    raise assignment.NoRoomAvailable(room_type)
+
+
+def book(conn, grid, requests, pick):
+    latencies, rejected = [], 0
+    for n, (room_type, guests, check_in, check_out) in enumerate(requests):
+        t0 = time.perf_counter()
+        try:
+            room = pick(conn, grid, room_type, guests, check_in, check_out)
+        except assignment.NoRoomAvailable:
+            rejected += 1
+            continue
+        cur = conn.execute(
+            "INSERT INTO reservas (codigo, usuario_id, habitacion_id, fecha_inicio, fecha_fin, monto_total, pago, estado, asignacion_auto) "
+            "VALUES (?, 1, ?, ?, ?, 100, 'Pagado', 'confirmada', 1)",
+            (f'BENCH-{n}', room['roomId'], check_in, check_out)
+        )
+        conn.commit()
+        grid.touch(cur.lastrowid)
+        grid.committed(conn)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return np.array(latencies), rejected
+
+
+def orphans(conn, days):
+    today = today_number()
+    room_ids = [r[0] for r in conn.execute('SELECT id FROM habitaciones ORDER BY id')]
+    grid = AvailabilityGrid(past_days=0, horizon_days=days + 30)
+    grid.build(conn)
+    # Nights before today count as booked, as in the assigner
+    occupied = np.hstack([np.ones((len(room_ids), 1), dtype=bool), grid.occupancy(conn, room_ids, today, today + days + 30)])
+    return assignment.orphan_nights(occupied)
+
+
+def run(policy, pick, path, template, args):
+    conn = build(path, template, args.rooms)
+    grid = AvailabilityGrid()
+    grid.build(conn)
+    requests = stream(args.rooms, args.days, args.load, args.seed)
+    latencies, rejected = book(conn, grid, requests, pick)
+    booked = len(latencies)
+    print(f'{policy}: {len(requests)} requests, booked={booked} rejected={rejected} orphan_nights={orphans(conn, args.days)} '
+          f'p50={np.percentile(latencies, 50):.2f}ms p99={np.percentile(latencies, 99):.2f}ms')
+
+    # Cancellations open holes; the batch re-optimizer packs what is left
+    rng = np.random.default_rng(args.seed + 1)
+    ids = [r[0] for r in conn.execute('SELECT id FROM reservas')]
+    cancelled = rng.choice(ids, size=int(len(ids) * args.cancel), replace=False).tolist()
+    conn.executemany("UPDATE reservas SET estado='anulada' WHERE id=?", ((i,) for i in cancelled))
+    conn.commit()
+    before = orphans(conn, args.days)
+    t0 = time.perf_counter()
+    plan = assignment.reoptimize(conn, horizon_days=args.days + 1)
+    planned = time.perf_counter() - t0
+    conn.executemany('UPDATE reservas SET habitacion_id=? WHERE id=?', ((m['to'], m['id']) for m in plan['moves']))
+    conn.commit()
+    marks = ','.join('?' for _ in ACTIVE_STATES)
+    clashes = conn.execute(f'''
+        SELECT COUNT(*) FROM reservas a JOIN reservas b
+          ON a.habitacion_id = b.habitacion_id AND a.id < b.id
+         AND a.fecha_inicio < b.fecha_fin AND b.fecha_inicio < a.fecha_fin
+        WHERE a.estado IN ({marks}) AND b.estado IN ({marks})
+    ''', ACTIVE_STATES + ACTIVE_STATES).fetchone()[0]
+    print(f'  after {len(cancelled)} cancellations: orphan_nights={before} -> reoptimized={orphans(conn, args.days)} '
+          f'moves={len(plan["moves"])} plan={planned:.2f}s overlaps={clashes}')
+    conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Room assignment fragmentation benchmark')
+    parser.add_argument('--db', default=os.path.join(ROOT, 'hotel_management.db'), help='Schema template')
+    parser.add_argument('--rooms', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=30, help='Arrival window in days')
+    parser.add_argument('--load', type=float, default=0.85, help='Requested room-nights / available')
+    parser.add_argument('--cancel', type=float, default=0.15, help='Share of bookings cancelled before re-optimizing')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, 'template.db')
+        conn = sqlite3.connect(args.db)
+        conn.execute(f"VACUUM INTO '{template}'")
+        conn.close()
+        conn = sqlite3.connect(template)
+        apply_migrations(conn)
+        conn.close()
+        run('first free room', first_free, os.path.join(tmp, 'first_free.db'), template, args)
+        run('assigner       ', assignment.assign, os.path.join(tmp, 'assigner.db'), template, args)
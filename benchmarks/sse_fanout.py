@@ -0,0 +1,127 @@
+# SSE Fan-out Load Test
+# Pacific Reef Hotel Management System - latency from publish to every subscriber
+#
+# In-process (broker only):
+#   python benchmarks/sse_fanout.py --clients 500 --events 200
+# End-to-end against a running app.py (threaded server):
+#   python benchmarks/sse_fanout.py --url http://127.0.0.1:5000 --clients 200 --events 50 --room 3
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from events import EventBroker, EVICTED
+
+
+def summarize(label, latencies_ms, extra=''):
+    arr = np.array(latencies_ms)
+    if arr.size == 0:
+        print(f'{label}: no deliveries')
+        return
+    print(f'{label}: n={arr.size} p50={np.percentile(arr, 50):.3f}ms p95={np.percentile(arr, 95):.3f}ms '
+          f'p99={np.percentile(arr, 99):.3f}ms max={arr.max():.3f}ms {extra}')
+
+
+def run_in_process(clients, events, rate, slow, queue_size):
+    broker = EventBroker(queue_size=queue_size)
+    latencies = []
+    lock = threading.Lock()
+    done = threading.Barrier(clients + 1)
+
+    def consumer(sub, is_slow):
+        local = []
+        while True:
+            event = sub.queue.get()
+            if event is EVICTED:
+                break
+            local.append((time.time() - event['published_at']) * 1000)
+            if is_slow:
+                time.sleep(0.05)
+            if event['data'].get('last'):
+                break
+        with lock:
+            latencies.extend(local)
+        done.wait()
+
+    subs = [broker.subscribe() for _ in range(clients)]
+    for i, sub in enumerate(subs):
+        threading.Thread(target=consumer, args=(sub, i < slow), daemon=True).start()
+
+    interval = 1.0 / rate if rate else 0
+    start = time.perf_counter()
+    for i in range(events):
+        broker.publish('habitacion', {'id': 1, 'status': 'limpieza', 'last': i == events - 1})
+        if interval:
+            time.sleep(interval)
+    publish_time = time.perf_counter() - start
+    done.wait()
+
+    summarize(f'in-process clients={clients} events={events}', latencies,
+              f'publish_total={publish_time * 1000:.1f}ms stats={broker.stats()}')
+
+
+def run_http(url, clients, events, room):
+    latencies = []
+    lock = threading.Lock()
+    ready = threading.Barrier(clients + 1)
+    sent = []
+
+    def consumer():
+        resp = urllib.request.urlopen(f'{url}/api/eventos?topics=habitacion')
+        ready.wait()
+        received = 0
+        for raw in resp:
+            line = raw.decode().strip()
+            if not line.startswith('data:'):
+                continue
+            # The n-th event answers the n-th PATCH (no other writers assumed)
+            if received < len(sent):
+                with lock:
+                    latencies.append((time.time() - sent[received]) * 1000)
+            received += 1
+            if received >= events:
+                break
+        resp.close()
+
+    threads = [threading.Thread(target=consumer, daemon=True) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    time.sleep(0.5)
+
+    statuses = ['limpieza', 'disponible']
+    for i in range(events):
+        status = statuses[i % 2]
+        sent.append(time.time())
+        req = urllib.request.Request(
+            f'{url}/api/habitaciones/{room}', data=json.dumps({'status': status}).encode(),
+            method='PATCH', headers={'Content-Type': 'application/json'})
+        urllib.request.urlopen(req).read()
+        time.sleep(0.05)
+    for t in threads:
+        t.join(timeout=10)
+    summarize(f'http clients={clients} events={events}', latencies)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SSE fan-out latency load test')
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=200.0, help='Events per second (0 = as fast as possible)')
+    parser.add_argument('--slow', type=int, default=5, help='Slow consumers (in-process mode)')
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--url', help='Base URL of a running app.py for end-to-end mode')
+    parser.add_argument('--room', type=int, default=1, help='Room id toggled in end-to-end mode')
+    args = parser.parse_args()
+
+    if args.url:
+        run_http(args.url, args.clients, args.events, args.room)
+    else:
+        run_in_process(args.clients, args.events, args.rate, args.slow, args.queue_size)
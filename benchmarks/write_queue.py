@@ -0,0 +1,112 @@
+# Write Throughput Benchmark
+# Pacific Reef Hotel Management System - direct commits vs the single-writer group-commit queue
+#
+# Works on a temporary copy of the database:
+#   python benchmarks/write_queue.py --writers 50 --writes 40
+#   python benchmarks/write_queue.py --writers 200 --writes 20 --busy-timeout 1
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from writer import WriteQueue
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def insert_reserva(conn, writer_id, n):
+    conn.execute(
+        'INSERT INTO reservas (codigo, usuario_id, habitacion_id, fecha_inicio, fecha_fin, monto_total, pago, estado) '
+        "VALUES (?, 1, 1, '2030-01-01', '2030-01-02', 100, 'Pagado', 'pendiente')",
+        (f'BENCH-{writer_id}-{n}-{time.perf_counter_ns()}',)
+    )
+
+
+def run_writers(writers, writes, work):
+    """Start `writers` threads doing `writes` calls of work(writer_id, n); returns latencies and errors."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start_gate = threading.Barrier(writers + 1)
+
+    def worker(writer_id):
+        local, failed = [], []
+        start_gate.wait()
+        for n in range(writes):
+            t0 = time.perf_counter()
+            try:
+                work(writer_id, n)
+                local.append((time.perf_counter() - t0) * 1000)
+            except sqlite3.OperationalError as e:
+                failed.append(str(e))
+        with lock:
+            latencies.extend(local)
+            errors.extend(failed)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    start_gate.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    return latencies, errors, time.perf_counter() - t0
+
+
+def report(label, latencies, errors, elapsed, extra=''):
+    arr = np.array(latencies) if latencies else np.zeros(1)
+    print(f'{label}: ok={len(latencies)} errors={len(errors)} throughput={len(latencies) / elapsed:.0f} writes/s '
+          f'p50={np.percentile(arr, 50):.2f}ms p99={np.percentile(arr, 99):.2f}ms {extra}')
+    if errors:
+        print(f'  first error: {errors[0]}')
+
+
+def bench_direct(db, writers, writes, busy_timeout):
+    # What the routes did before: one connection and one commit per request
+    def work(writer_id, n):
+        conn = sqlite3.connect(db, timeout=busy_timeout)
+        try:
+            insert_reserva(conn, writer_id, n)
+            conn.commit()
+        finally:
+            conn.close()
+    report('direct commits', *run_writers(writers, writes, work))
+
+
+def bench_queue(db, writers, writes, busy_timeout, max_batch):
+    queue = WriteQueue(lambda: sqlite3.connect(db, timeout=busy_timeout, check_same_thread=False), max_batch=max_batch)
+
+    def work(writer_id, n):
+        queue.run(lambda conn: insert_reserva(conn, writer_id, n))
+    latencies, errors, elapsed = run_writers(writers, writes, work)
+    queue.stop()
+    report('group commit  ', latencies, errors, elapsed, str(queue.stats()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent write throughput benchmark')
+    parser.add_argument('--db', default=os.path.join(ROOT, 'hotel_management.db'))
+    parser.add_argument('--writers', type=int, default=50)
+    parser.add_argument('--writes', type=int, default=40, help='Writes per writer thread')
+    parser.add_argument('--busy-timeout', type=float, default=5.0, help='sqlite3 busy timeout in seconds')
+    parser.add_argument('--max-batch', type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('direct', 'queue'):
+            db = os.path.join(tmp, f'{mode}.db')
+            shutil.copy(args.db, db)
+            conn = sqlite3.connect(db)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.close()
+            if mode == 'direct':
+                bench_direct(db, args.writers, args.writes, args.busy_timeout)
+            else:
+                bench_queue(db, args.writers, args.writes, args.busy_timeout, args.max_batch)
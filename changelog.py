@@ -0,0 +1,80 @@
+# Change Log
+# Pacific Reef Hotel Management System - Delta sync over the `cambios` table
+
+import threading
+import logging
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Ids changed (inserted/updated) after a version; rows still present are returned
+CHANGED_IDS = "SELECT registro_id FROM cambios WHERE tabla = ? AND version > ? AND operacion != 'delete'"
+
+
+class ResyncRequired(Exception):
+    """The requested version was compacted away; the client must reload the table."""
+
+
+def current_version(conn) -> int:
+    """Highest version ever written to the change log (survives compaction)."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cambios'").fetchone()
+    return row[0] if row else 0
+
+
+def check_since(conn, since: int):
+    """Raise ResyncRequired when entries after `since` may have been purged."""
+    purged = conn.execute('SELECT hasta_version FROM cambios_purga WHERE id = 1').fetchone()[0]
+    if since < purged:
+        raise ResyncRequired(f'La versión {since} ya fue compactada (mínimo {purged})')
+
+
+def tombstones(conn, table: str, since: int):
+    """Ids deleted after `since` that no longer exist."""
+    rows = conn.execute(
+        f'''SELECT DISTINCT c.registro_id FROM cambios c
+            WHERE c.tabla = ? AND c.version > ? AND c.operacion = 'delete'
+            AND NOT EXISTS (SELECT 1 FROM {table} t WHERE t.id = c.registro_id)''',
+        (table, since)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def compact(conn, retention_days: int = 30) -> dict:
+    """
+    Compact the change log.
+
+    Keeps only the latest entry per (tabla, registro_id), which is lossless
+    for delta sync, then drops entries older than retention_days and
+    raises the purge floor so clients behind it get a resync answer.
+    Runs inside the caller's transaction (a shard writer job).
+    """
+    duplicates = conn.execute('''
+        DELETE FROM cambios WHERE version NOT IN (
+            SELECT MAX(version) FROM cambios GROUP BY tabla, registro_id
+        )
+    ''').rowcount
+    floor = conn.execute(
+        "SELECT MAX(version) FROM cambios WHERE fecha < datetime('now', ?)",
+        (f'-{int(retention_days)} days',)
+    ).fetchone()[0]
+    expired = 0
+    if floor is not None:
+        expired = conn.execute('DELETE FROM cambios WHERE version <= ?', (floor,)).rowcount
+        conn.execute('UPDATE cambios_purga SET hasta_version = MAX(hasta_version, ?) WHERE id = 1', (floor,))
+    return {'duplicates_removed': duplicates, 'expired_removed': expired}
+
+
+def start_compactor(execute: Callable[[Callable], dict], interval: float = 3600.0, retention_days: int = 30):
+    """Run compact() through `execute` (the shard writer) every `interval` seconds in a daemon thread."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                result = execute(lambda conn: compact(conn, retention_days))
+                logger.info(f'Change log compacted: {result}')
+            except Exception as e:
+                logger.error(f'Change log compaction failed: {e}')
+
+    threading.Thread(target=run, name='changelog-compactor', daemon=True).start()
+    return stop
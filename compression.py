@@ -0,0 +1,83 @@
+# Compression
+# Pacific Reef Hotel Management System - gzip/brotli response negotiation
+
+import os
+import gzip
+import time
+
+from flask import request
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/csv', 'text/html')
+
+
+def choose_encoding(accept_encoding: str):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header (q=0 means refused)."""
+    offered = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    for encoding in (('br',) if brotli else ()) + ('gzip',):
+        if offered.get(encoding, offered.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=min(level, 11))
+    return gzip.compress(body, compresslevel=min(level, 9), mtime=0)
+
+
+def init_app(app, min_size: int = None, level: int = None, registry: metrics.MetricsRegistry = metrics.REGISTRY):
+    """
+    Compress responses above `min_size` bytes for clients that accept it.
+
+    Streaming responses (SSE) and already-encoded bodies are left alone.
+    Defaults come from COMPRESS_MIN_SIZE (1024) and COMPRESS_LEVEL (5,
+    fast enough to win over the bytes saved on typical list payloads).
+    """
+    min_size = int(os.getenv('COMPRESS_MIN_SIZE', 1024)) if min_size is None else min_size
+    level = int(os.getenv('COMPRESS_LEVEL', 5)) if level is None else level
+    bytes_in = registry.register(metrics.Counter(
+        'http_response_bytes_uncompressed_total', 'Response bytes before compression', ('encoding',)))
+    bytes_out = registry.register(metrics.Counter(
+        'http_response_bytes_sent_total', 'Response bytes after compression', ('encoding',)))
+    seconds = registry.register(metrics.Counter(
+        'http_compression_seconds_total', 'Time spent compressing responses', ('encoding',)))
+
+    @app.after_request
+    def _compress(response):
+        if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+                or response.status_code in (204, 304) or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        response.headers.add('Vary', 'Accept-Encoding')
+        body = response.get_data()
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None or len(body) < min_size:
+            bytes_in.inc('identity', amount=len(body))
+            bytes_out.inc('identity', amount=len(body))
+            return response
+        start = time.perf_counter()
+        compressed = compress(body, encoding, level)
+        seconds.inc(encoding, amount=time.perf_counter() - start)
+        bytes_in.inc(encoding, amount=len(body))
+        bytes_out.inc(encoding, amount=len(compressed))
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    return app
@@ -0,0 +1,124 @@
+# Credentials
+# Pacific Reef Hotel Management System - Password hashing on a dedicated executor
+
+import os
+import hmac
+import base64
+import hashlib
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+SALT_BYTES = 16
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class PasswordHasher:
+    """
+    Tunable-cost password hashing with the stdlib KDFs.
+
+    Hashes are stored as self-describing strings, so the cost can be
+    raised later and old hashes still verify:
+        scrypt$<n>$<r>$<p>$<salt>$<hash>
+        pbkdf2_sha256$<iterations>$<salt>$<hash>
+    Anything else in usuarios.password is a legacy plaintext value; it is
+    compared in constant time and reported as needing a rehash.
+
+    hashlib's scrypt and pbkdf2_hmac release the GIL while they run, so a
+    small thread pool keeps KDF work off the request threads' CPU budget
+    and caps how many hashes run at once.
+    """
+
+    def __init__(self, scheme: str = 'scrypt', scrypt_n: int = 2 ** 14, scrypt_r: int = 8, scrypt_p: int = 1,
+                 pbkdf2_iterations: int = 600_000, workers: int = 2):
+        if scheme not in ('scrypt', 'pbkdf2_sha256'):
+            raise ValueError(f'Esquema de hash no soportado: {scheme}')
+        self.scheme = scheme
+        self.scrypt_params = (scrypt_n, scrypt_r, scrypt_p)
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='kdf')
+        # Verified when the user does not exist, so both paths cost the same
+        self._dummy = self.hash('dummy-password')
+
+    @classmethod
+    def from_env(cls) -> 'PasswordHasher':
+        return cls(
+            scheme=os.getenv('PASSWORD_SCHEME', 'scrypt'),
+            scrypt_n=int(os.getenv('PASSWORD_SCRYPT_N', 2 ** 14)),
+            scrypt_r=int(os.getenv('PASSWORD_SCRYPT_R', 8)),
+            scrypt_p=int(os.getenv('PASSWORD_SCRYPT_P', 1)),
+            pbkdf2_iterations=int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', 600_000)),
+            workers=int(os.getenv('PASSWORD_WORKERS', 2)),
+        )
+
+    # --- synchronous primitives (run on the executor) ---
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_bytes(SALT_BYTES)
+        if self.scheme == 'scrypt':
+            n, r, p = self.scrypt_params
+            digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=_scrypt_maxmem(n, r, p))
+            return f'scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}'
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, self.pbkdf2_iterations)
+        return f'pbkdf2_sha256${self.pbkdf2_iterations}${_b64(salt)}${_b64(digest)}'
+
+    def verify(self, password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+        """Returns (matches, needs_rehash)."""
+        if stored is None:
+            self.verify(password, self._dummy)
+            return False, False
+        parts = stored.split('$')
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            expected = _unb64(parts[5])
+            digest = hashlib.scrypt(password.encode(), salt=_unb64(parts[4]), n=n, r=r, p=p,
+                                    maxmem=_scrypt_maxmem(n, r, p), dklen=len(expected))
+            current = self.scheme == 'scrypt' and (n, r, p) == self.scrypt_params
+        elif parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            iterations = int(parts[1])
+            expected = _unb64(parts[3])
+            digest = hashlib.pbkdf2_hmac('sha256', password.encode(), _unb64(parts[2]), iterations, dklen=len(expected))
+            current = self.scheme == 'pbkdf2_sha256' and iterations == self.pbkdf2_iterations
+        else:
+            # Legacy plaintext row
+            return hmac.compare_digest(password.encode(), stored.encode()), True
+        matches = hmac.compare_digest(digest, expected)
+        return matches, matches and not current
+
+    # --- executor-backed API used by the routes ---
+
+    def hash_async(self, password: str):
+        return self.executor.submit(self.hash, password)
+
+    def verify_async(self, password: str, stored: Optional[str]):
+        return self.executor.submit(self.verify, password, stored)
+
+
+def _scrypt_maxmem(n: int, r: int, p: int) -> int:
+    # OpenSSL's default cap (32 MiB) is too low for n=2**15 and above
+    return 128 * r * (n + p + 2) + 1024 * 1024
+
+
+def is_hashed(stored: Optional[str]) -> bool:
+    return bool(stored) and stored.split('$', 1)[0] in ('scrypt', 'pbkdf2_sha256')
+
+
+HASHER = None
+_hasher_lock = threading.Lock()
+
+
+def hasher() -> PasswordHasher:
+    """Process-wide hasher configured from the environment (created on first use)."""
+    global HASHER
+    with _hasher_lock:
+        if HASHER is None:
+            HASHER = PasswordHasher.from_env()
+    return HASHER
@@ -1,5 +1,6 @@
 import sqlite3
 import os
+from migrations import apply_migrations
 
 DB_NAME = "hotel_management.db"
 
@@ -9,6 +10,8 @@ def create_database():
         os.remove(DB_NAME)
 
     conn = sqlite3.connect(DB_NAME)
+    # WAL: lectores de analytics no bloquean al escritor de reservas
+    conn.execute("PRAGMA journal_mode=WAL")
     cursor = conn.cursor()
 
     # Crear tabla de usuarios con username
@@ -173,6 +176,9 @@ def create_database():
     """, reservas)
 
     conn.commit()
+
+    # Extensiones de esquema (registro de cambios, ...)
+    apply_migrations(conn)
     conn.close()
     print("Base de datos actualizada y poblada correctamente.")
 
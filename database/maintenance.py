@@ -0,0 +1,301 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+
+# Diagnóstico y mantenimiento de hotel_management.db, seguro contra la base en uso:
+# cada paso es una transacción corta con busy_timeout y pausas entre pasos.
+#   python maintenance.py report [--save]      filas, páginas, freelist, índices, fragmentación, crecimiento
+#   python maintenance.py analyze              ANALYZE por tabla + PRAGMA optimize
+#   python maintenance.py vacuum [--pages N]   incremental_vacuum por tramos
+#   python maintenance.py check                integrity_check tabla por tabla
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_NAME = "hotel_management.db"
+BUSY_TIMEOUT_MS = 5000
+AUTO_VACUUM = {0: "none", 1: "full", 2: "incremental"}
+
+
+def connect(db_name):
+    if not os.path.exists(db_name):
+        raise SystemExit(f"No existe la base de datos {db_name}")
+    # Autocommit: cada sentencia es su propia transacción corta
+    conn = sqlite3.connect(db_name, isolation_level=None, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def pragma(conn, name):
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def user_tables(conn):
+    # Tablas normales (sin internas de SQLite ni sombras de FTS, que se cuentan como objetos en dbstat)
+    return [row[0] for row in conn.execute("""
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL TABLE%'
+          AND name NOT IN (SELECT name || suffix FROM sqlite_master,
+                           (SELECT '_data' AS suffix UNION ALL SELECT '_idx' UNION ALL SELECT '_content'
+                            UNION ALL SELECT '_docsize' UNION ALL SELECT '_config')
+                           WHERE sql LIKE 'CREATE VIRTUAL TABLE%')
+        ORDER BY name
+    """)]
+
+
+def has_dbstat(conn):
+    try:
+        conn.execute("SELECT 1 FROM dbstat LIMIT 1").fetchall()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def file_usage(conn):
+    page_size = pragma(conn, "page_size")
+    page_count = pragma(conn, "page_count")
+    freelist = pragma(conn, "freelist_count")
+    return {
+        "page_size": page_size,
+        "pages": page_count,
+        "bytes": page_size * page_count,
+        "freelist_pages": freelist,
+        "freelist_pct": round(100 * freelist / page_count, 1) if page_count else 0.0,
+        "auto_vacuum": AUTO_VACUUM.get(pragma(conn, "auto_vacuum"), "?"),
+        "journal_mode": pragma(conn, "journal_mode"),
+    }
+
+
+def object_sizes(conn):
+    """
+    Páginas, bytes, llenado y fragmentación por tabla e índice a partir de dbstat.
+
+    Fragmentación = porcentaje de páginas que no siguen a la anterior en el
+    archivo al recorrer el árbol en orden; una tabla recién compactada ronda 0%.
+    Recorre todas las páginas, así que en bases grandes tarda lo que una lectura completa.
+    """
+    kinds = dict(conn.execute("SELECT name, type FROM sqlite_master"))
+    sizes = {}
+    for name, pages, payload, unused, size in conn.execute("""
+        SELECT name, COUNT(*), SUM(payload), SUM(unused), SUM(pgsize) FROM dbstat GROUP BY name
+    """):
+        sizes[name] = {
+            "type": kinds.get(name, "table"),
+            "pages": pages,
+            "bytes": size,
+            "fill_pct": round(100 * payload / (payload + unused), 1) if payload + unused else 0.0,
+            "fragmentation_pct": 0.0,
+        }
+    current, previous, jumps, total = None, None, 0, 0
+    # Lectura en streaming ordenada por árbol; se reparte por objeto al cambiar de nombre
+    for name, pageno in conn.execute("SELECT name, pageno FROM dbstat ORDER BY name, path"):
+        if name != current:
+            if current is not None and total > 1:
+                sizes[current]["fragmentation_pct"] = round(100 * jumps / (total - 1), 1)
+            current, previous, jumps, total = name, None, 0, 0
+        if previous is not None and pageno != previous + 1:
+            jumps += 1
+        previous = pageno
+        total += 1
+    if current is not None and total > 1:
+        sizes[current]["fragmentation_pct"] = round(100 * jumps / (total - 1), 1)
+    return dict(sorted(sizes.items(), key=lambda item: -item[1]["bytes"]))
+
+
+def row_counts(conn):
+    return {tabla: conn.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0] for tabla in user_tables(conn)}
+
+
+def legacy_passwords(conn):
+    # Contraseñas aún en texto plano (se migran a hash en el siguiente login)
+    import credentials
+    try:
+        return sum(1 for (stored,) in conn.execute("SELECT password FROM usuarios") if not credentials.is_hashed(stored))
+    except sqlite3.OperationalError:
+        return None
+
+
+def has_stats_table(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'estadisticas_tablas'"
+    ).fetchone() is not None
+
+
+def save_sample(conn, counts, sizes):
+    fecha = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    rows = [(fecha, name, counts.get(name), info["pages"], info["bytes"]) for name, info in sizes.items()]
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany(
+        "INSERT OR REPLACE INTO estadisticas_tablas (fecha, objeto, filas, paginas, bytes) VALUES (?, ?, ?, ?, ?)", rows
+    )
+    conn.execute("COMMIT")
+    return fecha
+
+
+def growth(conn):
+    # Diferencia entre la primera y la última muestra de cada objeto, normalizada por día
+    result = {}
+    for objeto, desde, hasta, filas_0, filas_1, bytes_0, bytes_1 in conn.execute("""
+        SELECT objeto, MIN(fecha), MAX(fecha),
+               (SELECT filas FROM estadisticas_tablas e2 WHERE e2.objeto = e.objeto ORDER BY fecha LIMIT 1),
+               (SELECT filas FROM estadisticas_tablas e2 WHERE e2.objeto = e.objeto ORDER BY fecha DESC LIMIT 1),
+               (SELECT bytes FROM estadisticas_tablas e2 WHERE e2.objeto = e.objeto ORDER BY fecha LIMIT 1),
+               (SELECT bytes FROM estadisticas_tablas e2 WHERE e2.objeto = e.objeto ORDER BY fecha DESC LIMIT 1)
+        FROM estadisticas_tablas e GROUP BY objeto
+    """):
+        days = (datetime.fromisoformat(hasta) - datetime.fromisoformat(desde)).total_seconds() / 86400
+        # Con menos de una hora entre muestras la extrapolación por día no dice nada
+        if days < 1 / 24:
+            continue
+        result[objeto] = {
+            "since": desde,
+            "days": round(days, 2),
+            "rows_per_day": round((filas_1 - filas_0) / days, 1) if filas_0 is not None and filas_1 is not None else None,
+            "bytes_per_day": round((bytes_1 - bytes_0) / days),
+        }
+    return result
+
+
+def report(conn, save=False):
+    counts = row_counts(conn)
+    result = {"file": file_usage(conn), "rows": counts, "legacy_passwords": legacy_passwords(conn)}
+    if has_dbstat(conn):
+        result["objects"] = object_sizes(conn)
+    else:
+        result["objects"] = None
+    if has_stats_table(conn):
+        if save and result["objects"]:
+            result["saved_sample"] = save_sample(conn, counts, result["objects"])
+        result["growth"] = growth(conn)
+    return result
+
+
+def analyze(conn, pause=0.1, analysis_limit=1000):
+    # analysis_limit acota las filas que examina ANALYZE por índice: estadísticas aproximadas pero baratas
+    conn.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+    timings = {}
+    for tabla in user_tables(conn):
+        start = time.perf_counter()
+        conn.execute(f'ANALYZE "{tabla}"')
+        timings[tabla] = round(time.perf_counter() - start, 4)
+        time.sleep(pause)
+    conn.execute("PRAGMA optimize")
+    return timings
+
+
+def incremental_vacuum(conn, pages_per_step=256, pause=0.05, max_steps=None):
+    """
+    Devuelve páginas libres al sistema de archivos en tramos de `pages_per_step`.
+
+    Solo funciona con auto_vacuum=incremental; pasar a ese modo exige un
+    VACUUM completo (enable_incremental), que bloquea la base mientras dura.
+    """
+    if pragma(conn, "auto_vacuum") != 2:
+        return {"skipped": "auto_vacuum no es incremental (usar --enable-incremental con la base detenida)"}
+    freed, steps = 0, 0
+    while max_steps is None or steps < max_steps:
+        before = pragma(conn, "freelist_count")
+        if not before:
+            break
+        # sqlite3 avanza el PRAGMA un solo paso (una página) por execute: el tramo
+        # se arma con N llamadas dentro de una transacción de escritura corta
+        conn.execute("BEGIN IMMEDIATE")
+        for _ in range(min(int(pages_per_step), before)):
+            conn.execute("PRAGMA incremental_vacuum(1)")
+        conn.execute("COMMIT")
+        freed += before - pragma(conn, "freelist_count")
+        steps += 1
+        time.sleep(pause)
+    return {"freed_pages": freed, "steps": steps, "freelist_pages": pragma(conn, "freelist_count")}
+
+
+def enable_incremental(conn):
+    # Cambiar auto_vacuum requiere reconstruir el archivo: VACUUM completo, no apto con la base en uso
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return AUTO_VACUUM[pragma(conn, "auto_vacuum")]
+
+
+def integrity(conn, pause=0.05, quick=False):
+    # Una tabla (y sus índices) por transacción de lectura, en lugar de un único recorrido largo
+    check = "quick_check" if quick else "integrity_check"
+    problems = {}
+    for tabla in user_tables(conn):
+        result = [row[0] for row in conn.execute(f'PRAGMA {check}("{tabla}")')]
+        if result != ["ok"]:
+            problems[tabla] = result[:20]
+        time.sleep(pause)
+    foreign_keys = conn.execute("PRAGMA foreign_key_check").fetchall()
+    if foreign_keys:
+        problems["foreign_keys"] = [list(row) for row in foreign_keys[:20]]
+    return {"ok": not problems, "problems": problems}
+
+
+def print_report(result):
+    usage = result["file"]
+    print(f"📦 Archivo: {usage['bytes'] / 1e6:.2f} MB, {usage['pages']} páginas de {usage['page_size']} B, "
+          f"journal={usage['journal_mode']}, auto_vacuum={usage['auto_vacuum']}")
+    print(f"   Páginas libres: {usage['freelist_pages']} ({usage['freelist_pct']}%)")
+    print("\n📊 Filas por tabla:")
+    for tabla, filas in result["rows"].items():
+        print(f"   {tabla:<28} {filas:>10}")
+    if result["legacy_passwords"]:
+        print(f"\n🔐 Contraseñas sin hash: {result['legacy_passwords']} (se migran en el próximo login)")
+    if result["objects"] is None:
+        print("\n(dbstat no disponible en este SQLite: sin tamaños por índice ni fragmentación)")
+    else:
+        print(f"\n🗂️  {'Objeto':<40}{'Tipo':<7}{'Páginas':>9}{'KB':>10}{'Llenado':>9}{'Fragm.':>8}")
+        for name, info in result["objects"].items():
+            print(f"   {name:<40}{info['type']:<7}{info['pages']:>9}{info['bytes'] / 1024:>10.1f}"
+                  f"{info['fill_pct']:>8}%{info['fragmentation_pct']:>7}%")
+    if "growth" in result:
+        print("\n📈 Crecimiento:")
+        if not result["growth"]:
+            print("   Sin muestras suficientes (usar report --save periódicamente)")
+        changed = {name: info for name, info in result["growth"].items() if info["bytes_per_day"] or info["rows_per_day"]}
+        if result["growth"] and not changed:
+            print("   Sin cambios entre muestras")
+        for name, info in sorted(changed.items(), key=lambda item: -abs(item[1]["bytes_per_day"])):
+            filas = f"{info['rows_per_day']:+} filas/día, " if info["rows_per_day"] is not None else ""
+            print(f"   {name:<40} {filas}{info['bytes_per_day'] / 1024:+.1f} KB/día desde {info['since']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diagnóstico y mantenimiento de la base de reservas")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--pause", type=float, default=0.05, help="Segundos de pausa entre pasos")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rep = commands.add_parser("report", help="Filas, páginas, índices, fragmentación y crecimiento")
+    rep.add_argument("--save", action="store_true", help="Guardar una muestra en estadisticas_tablas")
+    ana = commands.add_parser("analyze", help="ANALYZE por tabla y PRAGMA optimize")
+    ana.add_argument("--limit", type=int, default=1000, help="PRAGMA analysis_limit (0 = sin límite)")
+    vac = commands.add_parser("vacuum", help="Vacuum incremental por tramos")
+    vac.add_argument("--pages", type=int, default=256, help="Páginas liberadas por paso")
+    vac.add_argument("--max-steps", type=int)
+    vac.add_argument("--enable-incremental", action="store_true",
+                     help="Pasar a auto_vacuum=incremental con un VACUUM completo (base detenida)")
+    chk = commands.add_parser("check", help="integrity_check tabla por tabla")
+    chk.add_argument("--quick", action="store_true", help="quick_check: sin verificar el contenido de índices")
+    commands.add_parser("all", help="report --save, analyze, vacuum y check")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    try:
+        if args.command in ("report", "all"):
+            print_report(report(conn, save=getattr(args, "save", False) or args.command == "all"))
+        if args.command in ("analyze", "all"):
+            timings = analyze(conn, args.pause, getattr(args, "limit", 1000))
+            print(f"\n🔎 ANALYZE: {sum(timings.values()):.3f}s en {len(timings)} tablas; PRAGMA optimize aplicado")
+        if args.command in ("vacuum", "all"):
+            if getattr(args, "enable_incremental", False):
+                print(f"auto_vacuum = {enable_incremental(conn)}")
+            print(f"\n🧹 Vacuum: {incremental_vacuum(conn, getattr(args, 'pages', 256), args.pause, getattr(args, 'max_steps', None))}")
+        if args.command in ("check", "all"):
+            result = integrity(conn, args.pause, getattr(args, "quick", False))
+            print("\n✅ Integridad correcta" if result["ok"] else f"\n❌ Problemas de integridad: {result['problems']}")
+            if not result["ok"]:
+                sys.exit(1)
+    finally:
+        conn.close()
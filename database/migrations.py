@@ -0,0 +1,271 @@
+import sqlite3
+
+# Cada migración se aplica una sola vez; PRAGMA user_version guarda la última aplicada.
+
+SYNC_TABLES = ("habitaciones", "reservas", "usuarios")
+MAX_AMENITIES = 63  # bits 0..62, igual que amenities.MAX_AMENITIES
+
+
+def migration_001_registro_cambios(conn):
+    # Registro de cambios (version, tabla, id, operación) alimentado por triggers
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cambios (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabla TEXT NOT NULL,
+            registro_id INTEGER NOT NULL,
+            operacion TEXT NOT NULL CHECK(operacion IN ('insert', 'update', 'delete')),
+            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cambios_tabla_version ON cambios(tabla, version)")
+    # Versión más alta purgada por la compactación: clientes por debajo deben resincronizar
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cambios_purga (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            hasta_version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO cambios_purga (id, hasta_version) VALUES (1, 0)")
+    for tabla in SYNC_TABLES:
+        for operacion, evento, fila in (("insert", "INSERT", "NEW"), ("update", "UPDATE", "NEW"), ("delete", "DELETE", "OLD")):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{tabla}_{operacion}_cambios
+                AFTER {evento} ON {tabla}
+                BEGIN
+                    INSERT INTO cambios (tabla, registro_id, operacion) VALUES ('{tabla}', {fila}.id, '{operacion}');
+                END
+            """)
+
+
+def migration_002_amenidades(conn):
+    # Amenidades normalizadas + máscara de bits por habitación para filtrar en SQL
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS amenidades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT UNIQUE NOT NULL,
+            bit INTEGER UNIQUE NOT NULL CHECK(bit BETWEEN 0 AND 62)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS habitacion_amenidades (
+            habitacion_id INTEGER NOT NULL,
+            amenidad_id INTEGER NOT NULL,
+            PRIMARY KEY (habitacion_id, amenidad_id),
+            FOREIGN KEY (habitacion_id) REFERENCES habitaciones(id) ON DELETE CASCADE,
+            FOREIGN KEY (amenidad_id) REFERENCES amenidades(id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_habitacion_amenidades_amenidad ON habitacion_amenidades(amenidad_id)")
+    columnas = [row[1] for row in conn.execute("PRAGMA table_info(habitaciones)")]
+    if "amenidades_mask" not in columnas:
+        conn.execute("ALTER TABLE habitaciones ADD COLUMN amenidades_mask INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_habitaciones_tipo_estado ON habitaciones(tipo, estado)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_habitaciones_piso ON habitaciones(piso)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_habitaciones_capacidad ON habitaciones(capacidad)")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_habitaciones_delete_amenidades
+        AFTER DELETE ON habitaciones
+        BEGIN
+            DELETE FROM habitacion_amenidades WHERE habitacion_id = OLD.id;
+        END
+    """)
+
+    # Migrar los textos separados por comas existentes
+    bits = {nombre: bit for nombre, bit in conn.execute("SELECT nombre, bit FROM amenidades")}
+    for room_id, texto in conn.execute("SELECT id, amenidades FROM habitaciones").fetchall():
+        nombres = [n.strip() for n in (texto or "").split(",") if n.strip()]
+        mask = 0
+        for nombre in nombres:
+            if nombre not in bits:
+                if len(bits) >= MAX_AMENITIES:
+                    raise ValueError(f"No se pueden registrar más de {MAX_AMENITIES} amenidades")
+                bits[nombre] = len(bits)
+                conn.execute("INSERT INTO amenidades (nombre, bit) VALUES (?, ?)", (nombre, bits[nombre]))
+            mask |= 1 << bits[nombre]
+            conn.execute("""
+                INSERT OR IGNORE INTO habitacion_amenidades (habitacion_id, amenidad_id)
+                SELECT ?, id FROM amenidades WHERE nombre = ?
+            """, (room_id, nombre))
+        conn.execute("UPDATE habitaciones SET amenidades_mask = ? WHERE id = ?", (mask, room_id))
+
+
+def migration_003_busqueda_fts(conn):
+    # Índices FTS5 para la búsqueda del panel admin (prefijos de 2 y 3 caracteres precalculados)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS usuarios_fts USING fts5(
+            username, nombre, email,
+            content='usuarios', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    for trigger in (
+        """
+            CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_insert AFTER INSERT ON usuarios BEGIN
+                INSERT INTO usuarios_fts (rowid, username, nombre, email) VALUES (NEW.id, NEW.username, NEW.nombre, NEW.email);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_delete AFTER DELETE ON usuarios BEGIN
+                INSERT INTO usuarios_fts (usuarios_fts, rowid, username, nombre, email) VALUES ('delete', OLD.id, OLD.username, OLD.nombre, OLD.email);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_update AFTER UPDATE OF username, nombre, email ON usuarios BEGIN
+                INSERT INTO usuarios_fts (usuarios_fts, rowid, username, nombre, email) VALUES ('delete', OLD.id, OLD.username, OLD.nombre, OLD.email);
+                INSERT INTO usuarios_fts (rowid, username, nombre, email) VALUES (NEW.id, NEW.username, NEW.nombre, NEW.email);
+            END
+        """,
+    ):
+        conn.execute(trigger)
+    conn.execute("INSERT INTO usuarios_fts (usuarios_fts) VALUES ('rebuild')")
+
+    # Reservas: código + nombre del huésped + número de habitación (columnas de otras tablas)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS reservas_fts USING fts5(
+            codigo, huesped, habitacion,
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    for trigger in (
+        """
+            CREATE TRIGGER IF NOT EXISTS trg_reservas_fts_insert AFTER INSERT ON reservas BEGIN
+                INSERT INTO reservas_fts (rowid, codigo, huesped, habitacion)
+                SELECT NEW.id, NEW.codigo,
+                       (SELECT nombre FROM usuarios WHERE id = NEW.usuario_id),
+                       (SELECT numero FROM habitaciones WHERE id = NEW.habitacion_id);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS trg_reservas_fts_delete AFTER DELETE ON reservas BEGIN
+                DELETE FROM reservas_fts WHERE rowid = OLD.id;
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS trg_reservas_fts_update AFTER UPDATE OF codigo, usuario_id, habitacion_id ON reservas BEGIN
+                DELETE FROM reservas_fts WHERE rowid = OLD.id;
+                INSERT INTO reservas_fts (rowid, codigo, huesped, habitacion)
+                SELECT NEW.id, NEW.codigo,
+                       (SELECT nombre FROM usuarios WHERE id = NEW.usuario_id),
+                       (SELECT numero FROM habitaciones WHERE id = NEW.habitacion_id);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_reservas AFTER UPDATE OF nombre ON usuarios BEGIN
+                UPDATE reservas_fts SET huesped = NEW.nombre WHERE rowid IN (SELECT id FROM reservas WHERE usuario_id = NEW.id);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS trg_habitaciones_fts_reservas AFTER UPDATE OF numero ON habitaciones BEGIN
+                UPDATE reservas_fts SET habitacion = NEW.numero WHERE rowid IN (SELECT id FROM reservas WHERE habitacion_id = NEW.id);
+            END
+        """,
+    ):
+        conn.execute(trigger)
+    conn.execute("DELETE FROM reservas_fts")
+    conn.execute("""
+        INSERT INTO reservas_fts (rowid, codigo, huesped, habitacion)
+        SELECT r.id, r.codigo, u.nombre, h.numero
+        FROM reservas r
+        LEFT JOIN usuarios u ON r.usuario_id = u.id
+        LEFT JOIN habitaciones h ON r.habitacion_id = h.id
+    """)
+
+
+def migration_004_precios_calendario(conn):
+    # Calendario de precios por habitación y noche (dia = días desde 1970-01-01, precio en centavos)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS precios_calendario (
+            habitacion_id INTEGER NOT NULL,
+            dia INTEGER NOT NULL,
+            precio_centavos INTEGER NOT NULL,
+            PRIMARY KEY (habitacion_id, dia)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_habitaciones_delete_precios
+        AFTER DELETE ON habitaciones
+        BEGIN
+            DELETE FROM precios_calendario WHERE habitacion_id = OLD.id;
+        END
+    """)
+
+
+def migration_005_estadisticas_tablas(conn):
+    # Muestras de tamaño por tabla/índice que toma maintenance.py para reportar crecimiento
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS estadisticas_tablas (
+            fecha TIMESTAMP NOT NULL,
+            objeto TEXT NOT NULL,
+            filas INTEGER,
+            paginas INTEGER NOT NULL,
+            bytes INTEGER NOT NULL,
+            PRIMARY KEY (objeto, fecha)
+        ) WITHOUT ROWID
+    """)
+
+
+def migration_006_reservas_usuario(conn):
+    # Reservas de un huésped ordenadas por fecha: /api/usuarios/<id>/reservas
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reservas_usuario_fecha ON reservas(usuario_id, fecha_inicio)")
+
+
+def migration_007_asignacion_automatica(conn):
+    # Reservas cuya habitación eligió el asignador (assignment.py): la reoptimización puede moverlas
+    columnas = [row[1] for row in conn.execute("PRAGMA table_info(reservas)")]
+    if "asignacion_auto" not in columnas:
+        conn.execute("ALTER TABLE reservas ADD COLUMN asignacion_auto INTEGER NOT NULL DEFAULT 0")
+    # Comprobación de solapes por habitación al asignar
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reservas_habitacion_fecha ON reservas(habitacion_id, fecha_inicio)")
+
+
+def migration_008_cambios_silencio(conn):
+    # Tablas cuyos borrados no generan tombstones mientras tengan fila aquí (archivado de reservas):
+    # la reserva sigue existiendo en el archivo, los clientes de sincronización no deben descartarla
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cambios_silencio (
+            tabla TEXT PRIMARY KEY
+        )
+    """)
+    for tabla in SYNC_TABLES:
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{tabla}_delete_cambios")
+        conn.execute(f"""
+            CREATE TRIGGER trg_{tabla}_delete_cambios
+            AFTER DELETE ON {tabla}
+            WHEN NOT EXISTS (SELECT 1 FROM cambios_silencio WHERE tabla = '{tabla}')
+            BEGIN
+                INSERT INTO cambios (tabla, registro_id, operacion) VALUES ('{tabla}', OLD.id, 'delete');
+            END
+        """)
+
+
+MIGRATIONS = [
+    migration_001_registro_cambios,
+    migration_002_amenidades,
+    migration_003_busqueda_fts,
+    migration_004_precios_calendario,
+    migration_005_estadisticas_tablas,
+    migration_006_reservas_usuario,
+    migration_007_asignacion_automatica,
+    migration_008_cambios_silencio,
+]
+
+
+def apply_migrations(conn):
+    """Aplica las migraciones pendientes y devuelve la versión de esquema resultante."""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS, start=1):
+        if number <= current:
+            continue
+        migration(conn)
+        conn.execute(f"PRAGMA user_version = {number}")
+        conn.commit()
+    return max(current, len(MIGRATIONS))
+
+
+if __name__ == "__main__":
+    import sys
+
+    db_name = sys.argv[1] if len(sys.argv) > 1 else "hotel_management.db"
+    conn = sqlite3.connect(db_name)
+    print(f"Esquema en versión {apply_migrations(conn)}")
+    conn.close()
@@ -0,0 +1,114 @@
+# Events
+# Pacific Reef Hotel Management System - In-process pub/sub for Server-Sent Events
+
+import json
+import queue
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+# Put in a subscriber's queue when it is evicted for falling behind
+EVICTED = object()
+
+
+class Subscription:
+    """One connected client: a bounded queue plus the topics it follows."""
+
+    def __init__(self, topics: Optional[Iterable[str]], maxsize: int):
+        self.topics = set(topics) if topics else None
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.evicted = False
+
+    def wants(self, topic: str) -> bool:
+        return self.topics is None or topic in self.topics
+
+
+class EventBroker:
+    """
+    Fans published events out to every subscriber.
+
+    publish() never blocks: each subscriber has a bounded queue, and a
+    subscriber whose queue is full is evicted (its backlog dropped and an
+    EVICTED marker queued) so one slow client cannot hold up the writers
+    or grow memory without bound.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self.published = 0
+        self.evictions = 0
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None) -> Subscription:
+        sub = Subscription(topics, self.queue_size)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def _evict(self, sub: Subscription):
+        if sub.evicted:
+            return
+        sub.evicted = True
+        self.unsubscribe(sub)
+        self.evictions += 1
+        try:
+            while True:
+                sub.queue.get_nowait()
+        except queue.Empty:
+            pass
+        sub.queue.put_nowait(EVICTED)
+
+    def publish(self, topic: str, data: Dict) -> int:
+        """Queue an event for every interested subscriber; returns deliveries."""
+        with self._lock:
+            self._sequence += 1
+            event = {'id': self._sequence, 'topic': topic, 'data': data, 'published_at': time.time()}
+            subscribers = list(self._subscribers)
+        self.published += 1
+
+        delivered = 0
+        for sub in subscribers:
+            if not sub.wants(topic):
+                continue
+            try:
+                sub.queue.put_nowait(event)
+                delivered += 1
+            except queue.Full:
+                self._evict(sub)
+        return delivered
+
+    def stats(self) -> Dict:
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {'subscribers': subscribers, 'published': self.published, 'evictions': self.evictions}
+
+
+def sse_stream(broker: EventBroker, topics: Optional[Iterable[str]] = None, heartbeat: float = 15.0):
+    """
+    Generator producing the text/event-stream body for one client.
+
+    Sends a comment line every `heartbeat` seconds so proxies keep the
+    connection open, and an 'evicted' event before closing a client that
+    fell behind (it should resync with ?since=<version>).
+    """
+    sub = broker.subscribe(topics)
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = sub.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            if event is EVICTED:
+                yield 'event: evicted\ndata: {}\n\n'
+                return
+            yield f"id: {event['id']}\nevent: {event['topic']}\ndata: {json.dumps(event['data'])}\n\n"
+    finally:
+        broker.unsubscribe(sub)
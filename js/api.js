@@ -11,11 +11,42 @@ export async function getRooms() {
     return await res.json();
 }
 
+// Filtro de habitaciones en el servidor
+// filters: { amenities: ['Jacuzzi', 'Vista al Mar'], type, floor, status, minCapacity }
+export async function searchRooms(filters = {}) {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+        if (value === undefined || value === null || value === '') return;
+        params.set(key, Array.isArray(value) ? value.join(',') : value);
+    });
+    const res = await fetch(`${API_BASE}/habitaciones/buscar?${params}`);
+    return await res.json();
+}
+
+// Búsqueda de huéspedes y reservas: type = 'usuarios' | 'reservas' | 'all'
+export async function searchAll(q, type = 'all', limit = 20, offset = 0) {
+    const params = new URLSearchParams({ q, type, limit, offset });
+    const res = await fetch(`${API_BASE}/search?${params}`);
+    return await res.json();
+}
+
 export async function getReservations() {
     const res = await fetch(`${API_BASE}/reservas`);
     return await res.json();
 }
 
+// Reservas de un huésped (filtradas y paginadas en el servidor) + resumen { total, upcoming, totalSpent }
+// filters: { status: ['pendiente', 'confirmada'], from: 'YYYY-MM-DD', to: 'YYYY-MM-DD', limit, offset }
+export async function getUserReservations(userId, filters = {}) {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+        if (value === undefined || value === null || value === '') return;
+        params.set(key, Array.isArray(value) ? value.join(',') : value);
+    });
+    const res = await fetch(`${API_BASE}/usuarios/${userId}/reservas?${params}`);
+    return await res.json();
+}
+
 export async function createReservation(data) {
     const res = await fetch(`${API_BASE}/reservas`, {
         method: 'POST',
@@ -25,6 +56,29 @@ export async function createReservation(data) {
     return await res.json();
 }
 
+// Actualización parcial: solo envía los campos modificados
+// resource: 'habitaciones' | 'reservas' | 'usuarios'  (ej. patchResource('habitaciones', 3, { status: 'limpieza' }))
+export async function patchResource(resource, id, fields) {
+    const res = await fetch(`${API_BASE}/${resource}/${id}`, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(fields)
+    });
+    return await res.json();
+}
+
+// Ejecuta varias operaciones (create/update/delete) en una sola transacción
+// operations: [{ op: 'update', resource: 'habitaciones', id: 3, data: {...} }, ...]
+// Un valor "$n" en id/data usa el id generado por la operación n del mismo lote
+export async function runBatch(operations) {
+    const res = await fetch(`${API_BASE}/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ operations })
+    });
+    return await res.json();
+}
+
 // Puedes agregar más funciones para crear/editar/eliminar usuarios y habitaciones si agregas los endpoints en Flask.
 
 // Ejemplo de uso:
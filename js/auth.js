@@ -27,7 +27,16 @@ class AuthManager {
         
         if (isLoggedIn === 'true' && userRole) {
             this.isAuthenticated = true;
-            this.currentUser = { role: userRole };
+            // Restaurar el usuario guardado (incluye el id que devuelve /api/login)
+            let stored = null;
+            try {
+                stored = JSON.parse(localStorage.getItem('user') || 'null');
+            } catch (e) {
+                console.warn('No se pudo parsear usuario almacenado');
+            }
+            const userId = localStorage.getItem('userId');
+            this.currentUser = { ...(stored || {}), role: userRole };
+            if (userId) this.currentUser.id = Number(userId);
         }
     }
 
@@ -45,6 +54,7 @@ class AuthManager {
                 this.isAuthenticated = true;
                 localStorage.setItem('isLoggedIn', 'true');
                 localStorage.setItem('userRole', this.currentUser.role);
+                localStorage.setItem('userId', String(this.currentUser.id));
                 localStorage.setItem('user', JSON.stringify(this.currentUser));
                 return { success: true, role: this.currentUser.role };
             } else {
@@ -61,6 +71,7 @@ class AuthManager {
         this.isAuthenticated = false;
         localStorage.removeItem('isLoggedIn');
         localStorage.removeItem('userRole');
+        localStorage.removeItem('userId');
         localStorage.removeItem('user');
         window.location.href = 'index.html';
     }
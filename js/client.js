@@ -9,7 +9,7 @@
  *  - Listado y filtrado de reservas del usuario actual
  *  - Integración de estado de pago dentro de cada reserva
  *  - Perfil extendido (datos personales, notificaciones, seguridad, pagos)
- *  - Generación y alineación de códigos PR-YYYY-XXX con admin
+ *  - Códigos PR-YYYY-XXX tomados de la reserva (mismo código que ve admin)
  *  - Botones de acción (Pagar, Anular, Ver Detalles) según estado
  *
  * Dependencias globales:
@@ -418,30 +418,35 @@ Total: $${totalAmount}
         }
     }
 
+    async loadReservationsByName(currentUser) {
+        const response = await apiService.getReservations();
+        const firstName = currentUser && currentUser.name ? currentUser.name.toLowerCase().split(' ')[0] : null;
+        const mine = (response.data || []).filter(r => firstName && r.userName && r.userName.toLowerCase().includes(firstName));
+        return mine
+            .map(r => ({ ...r, prCode: r.code, status: this.normalizeStatus(r.status) }))
+            .sort((a, b) => new Date(b.checkIn) - new Date(a.checkIn));
+    }
+
     async loadMyReservations() {
         try {
-            // Always use mock data - no backend calls
-            // Obtener todas las reservas (sin filtrar) para replicar numeración global usada en admin
-            const response = await apiService.getReservations();
             const currentUser = authManager.getCurrentUser();
-            const all = response.data || [];
-            // Orden global cronológico por checkIn ascendente (igual que admin antes de generar códigos)
-            const chronSorted = [...all].sort((a,b)=> new Date(a.checkIn) - new Date(b.checkIn));
-            const year = new Date().getFullYear();
-            const codeMap = new Map();
-            chronSorted.forEach((r,idx)=>{
-                codeMap.set(r.id, `PR-${year}-${String(idx+1).padStart(3,'0')}`);
-            });
-            // Filtrar sólo reservas del usuario actual
-            const mine = chronSorted.filter(r => currentUser && ((r.userName && r.userName.toLowerCase().includes(currentUser.name.toLowerCase().split(' ')[0])) || r.userId === currentUser.id));
-            // Mapear agregando código existente del map y normalizando estado
-            const withCodes = mine.map(r => ({
-                ...r,
-                prCode: codeMap.get(r.id),
-                status: this.normalizeStatus(r.status)
-            }));
-            // Mostrar en orden descendente por código (más reciente primero)
-            this.data.reservations = withCodes.sort((a,b)=> b.prCode.localeCompare(a.prCode));
+            if (currentUser && currentUser.id != null) {
+                // Solo las reservas del usuario actual, ya ordenadas por check-in descendente en el servidor
+                const response = await apiService.getUserReservations(currentUser.id, { limit: 100 });
+                if (!Array.isArray(response.data)) {
+                    throw new Error(response.message || 'Respuesta inválida del servidor');
+                }
+                this.data.reservations = response.data.map(r => ({
+                    ...r,
+                    prCode: r.code,
+                    status: this.normalizeStatus(r.status)
+                }));
+                this.data.reservationSummary = response.summary;
+            } else {
+                // Sesión sin id (autologin demo): listado completo filtrado por nombre, como antes
+                this.data.reservations = await this.loadReservationsByName(currentUser);
+                this.data.reservationSummary = null;
+            }
             this.renderMyReservations();
             console.log('Reservas cargadas exitosamente:', this.data.reservations.length);
         } catch (error) {
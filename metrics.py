@@ -0,0 +1,223 @@
+# Metrics
+# Pacific Reef Hotel Management System - Request/SQL timing in Prometheus format
+
+import re
+import time
+import sqlite3
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Tuple
+
+from flask import Response, g, request
+
+# Latency buckets in seconds (request and SQL share the same scale)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_TABLE_PATTERN = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+([A-Za-z_][A-Za-z0-9_]*)', re.IGNORECASE)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter keyed by label values."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, key)} {value:g}')
+        return '\n'.join(lines)
+
+
+class Histogram:
+    """Cumulative histogram keyed by label values."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # [per-bucket counts..., +Inf count, sum]
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float('inf') else f'le="{bound:g}"'
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {series[-1]:.6f}')
+                lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return '\n'.join(lines)
+
+
+class MetricsRegistry:
+    """Holds the metrics for one service and renders them for /metrics."""
+
+    def __init__(self):
+        self.request_latency = Histogram(
+            'http_request_duration_seconds', 'Request latency by route', ('method', 'route'))
+        self.request_count = Counter(
+            'http_requests_total', 'Requests by route and status code', ('method', 'route', 'status'))
+        self.sql_latency = Histogram(
+            'sqlite_query_duration_seconds', 'SQLite statement execution time', ('operation', 'table'))
+        self._caches: Dict[str, Callable[[], Tuple[int, int]]] = {}
+        self._extra = []
+
+    def register(self, metric):
+        """Add another metric (anything with a render() method) to the /metrics output."""
+        self._extra.append(metric)
+        return metric
+
+    def register_cache(self, name: str, stats: Callable[[], Tuple[int, int]]):
+        """
+        Expose a cache's hit ratio.
+
+        Args:
+            name: Cache name used as the metric label
+            stats: Callable returning (hits, misses)
+        """
+        self._caches[name] = stats
+
+    def observe_sql(self, sql: str, elapsed: float):
+        """Record the execution time of one SQL statement."""
+        stripped = sql.lstrip()
+        operation = stripped.split(None, 1)[0].upper() if stripped else 'UNKNOWN'
+        match = _TABLE_PATTERN.search(stripped)
+        self.sql_latency.observe(elapsed, operation, match.group(1) if match else '')
+
+    def render(self) -> str:
+        """Render every metric in Prometheus text exposition format."""
+        blocks = [self.request_latency.render(), self.request_count.render(), self.sql_latency.render()]
+        blocks += [metric.render() for metric in self._extra]
+        if self._caches:
+            hits = ['# HELP cache_hits_total Cache hits', '# TYPE cache_hits_total counter']
+            misses = ['# HELP cache_misses_total Cache misses', '# TYPE cache_misses_total counter']
+            ratio = ['# HELP cache_hit_ratio Cache hits over lookups', '# TYPE cache_hit_ratio gauge']
+            for name, stats in sorted(self._caches.items()):
+                h, m = stats()
+                hits.append(f'cache_hits_total{{cache="{name}"}} {h}')
+                misses.append(f'cache_misses_total{{cache="{name}"}} {m}')
+                ratio.append(f'cache_hit_ratio{{cache="{name}"}} {(h / (h + m)) if h + m else 0:.4f}')
+            blocks += ['\n'.join(hits), '\n'.join(misses), '\n'.join(ratio)]
+        return '\n'.join(blocks) + '\n'
+
+
+# Process-wide registry; each service runs in its own process
+REGISTRY = MetricsRegistry()
+
+
+# Callbacks run after every instrumented statement as fn(conn, sql, parameters, elapsed)
+SQL_LISTENERS = []
+
+
+def _record_sql(conn, sql, parameters, elapsed):
+    REGISTRY.observe_sql(sql, elapsed)
+    for listener in SQL_LISTENERS:
+        listener(conn, sql, parameters, elapsed)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times execute/executemany into the registry."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_sql(self.connection, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_sql(self.connection, sql, None, time.perf_counter() - start)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    sqlite3 connection factory that records per-statement execution time.
+
+    Use as sqlite3.connect(path, factory=InstrumentedConnection). Times
+    cover statement preparation and the first step; rows fetched later
+    are not included.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_sql(self, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_sql(self, sql, None, time.perf_counter() - start)
+
+
+def init_app(app, registry: MetricsRegistry = REGISTRY):
+    """
+    Attach request timing hooks and a /metrics endpoint to a Flask app.
+
+    Args:
+        app: Flask application
+        registry: Registry receiving the observations
+    """
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            registry.request_latency.observe(time.perf_counter() - start, request.method, route)
+            registry.request_count.inc(request.method, route, str(response.status_code))
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
@@ -0,0 +1,331 @@
+# Pricing
+# Pacific Reef Hotel Management System - Occupancy-driven price calendar (rooms x days)
+
+import logging
+import threading
+from datetime import date
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HORIZON_DAYS = 365
+ACTIVE_STATES = ('pendiente', 'confirmada')
+
+# Multipliers on precio_base; each curve is linearly interpolated
+OCCUPANCY_CURVE = ([0.0, 0.5, 0.8, 1.0], [0.85, 1.0, 1.2, 1.4])       # booked share of the room type
+LEAD_TIME_CURVE = ([0, 3, 14, 60, 180], [1.10, 1.05, 1.0, 0.97, 0.95])  # days until the night
+DAY_OF_WEEK_FACTORS = np.array([0.95, 0.95, 0.95, 1.0, 1.15, 1.20, 1.05])  # Monday .. Sunday
+MIN_FACTOR, MAX_FACTOR = 0.7, 2.0
+
+# A span of nights whose price must be recomputed: (room type, first day, day after last)
+Span = Tuple[str, int, int]
+
+
+def day_number(value) -> int:
+    """Days since 1970-01-01 for a 'YYYY-MM-DD' string or a date."""
+    day = np.datetime64(value, 'D')
+    if np.isnat(day):
+        raise ValueError(f'Fecha inválida: {value!r}')
+    return int(day.astype(np.int64))
+
+
+def day_string(day: int) -> str:
+    return str(np.datetime64(int(day), 'D'))
+
+
+def today_number() -> int:
+    return day_number(date.today())
+
+
+def price_grid(base: np.ndarray, occupancy: np.ndarray, days: np.ndarray, today: int) -> np.ndarray:
+    """
+    Nightly prices in cents for every room and day.
+
+    base is (rooms,), occupancy is (rooms, days) with the occupancy of
+    each room's type, days is (days,) as day numbers.
+    """
+    occupancy_factor = np.interp(occupancy, *OCCUPANCY_CURVE)
+    lead_factor = np.interp(days - today, *LEAD_TIME_CURVE)
+    dow_factor = DAY_OF_WEEK_FACTORS[(days + 3) % 7]  # day 0 was a Thursday
+    factor = np.clip(occupancy_factor * (lead_factor * dow_factor)[None, :], MIN_FACTOR, MAX_FACTOR)
+    return np.round(base[:, None] * factor * 100).astype(np.int64)
+
+
+def type_occupancy(conn, types, start: int, end: int) -> Dict[str, np.ndarray]:
+    """Booked share of each room type for the nights start..end-1."""
+    placeholders = ','.join('?' for _ in types)
+    rooms = dict(conn.execute(
+        f'SELECT tipo, COUNT(*) FROM habitaciones WHERE tipo IN ({placeholders}) GROUP BY tipo', list(types)
+    ).fetchall())
+    rows = conn.execute(f'''
+        SELECT h.tipo, r.fecha_inicio, r.fecha_fin
+        FROM reservas r
+        JOIN habitaciones h ON r.habitacion_id = h.id
+        WHERE h.tipo IN ({placeholders}) AND r.estado IN ({','.join('?' for _ in ACTIVE_STATES)})
+          AND r.fecha_fin > ? AND r.fecha_inicio < ?
+    ''', list(types) + list(ACTIVE_STATES) + [day_string(start), day_string(end)]).fetchall()
+
+    width = end - start
+    index = {tipo: i for i, tipo in enumerate(types)}
+    # Difference array: +1 on check-in, -1 on check-out, cumulative sum = rooms booked per night
+    diff = np.zeros((len(types), width + 1), dtype=np.int64)
+    if rows:
+        kind = np.array([index[r[0]] for r in rows])
+        first = np.clip(np.array([r[1] for r in rows], dtype='datetime64[D]').astype(np.int64) - start, 0, width)
+        last = np.clip(np.array([r[2] for r in rows], dtype='datetime64[D]').astype(np.int64) - start, 0, width)
+        np.add.at(diff, (kind, first), 1)
+        np.add.at(diff, (kind, last), -1)
+    booked = np.cumsum(diff[:, :width], axis=1)
+    counts = np.array([rooms.get(tipo, 0) for tipo in types], dtype=np.float64)
+    occupancy = np.divide(booked, counts[:, None], out=np.zeros(booked.shape), where=counts[:, None] > 0)
+    return {tipo: np.clip(occupancy[i], 0.0, 1.0) for tipo, i in index.items()}
+
+
+def _recompute_range(conn, types, start: int, end: int, today: int) -> int:
+    occupancy = type_occupancy(conn, types, start, end)
+    placeholders = ','.join('?' for _ in types)
+    rooms = conn.execute(
+        f'SELECT id, tipo, precio_base FROM habitaciones WHERE tipo IN ({placeholders}) ORDER BY id', list(types)
+    ).fetchall()
+    if not rooms:
+        return 0
+    ids = np.array([r[0] for r in rooms], dtype=np.int64)
+    base = np.array([r[2] or 0 for r in rooms], dtype=np.float64)
+    room_occupancy = np.stack([occupancy[r[1]] for r in rooms])
+    days = np.arange(start, end, dtype=np.int64)
+    cents = price_grid(base, room_occupancy, days, today)
+
+    room_col = np.repeat(ids, days.size)
+    day_col = np.tile(days, ids.size)
+    conn.executemany(
+        'INSERT OR REPLACE INTO precios_calendario (habitacion_id, dia, precio_centavos) VALUES (?, ?, ?)',
+        zip(room_col.tolist(), day_col.tolist(), cents.ravel().tolist())
+    )
+    return int(cents.size)
+
+
+def recompute(conn, spans: Iterable[Optional[Span]], today: Optional[int] = None,
+              cache: Optional['PriceCache'] = None) -> int:
+    """
+    Recompute only the room types and nights touched by `spans`.
+
+    Spans for the same type are merged into one range and clipped to the
+    calendar horizon; None entries (e.g. a reservation that did not
+    exist before an insert) are ignored. Returns the cells written.
+    `cache` is the PriceCache of conn's database (default: CACHE).
+    """
+    today = today_number() if today is None else today
+    horizon_end = today + HORIZON_DAYS
+    ranges: Dict[str, Tuple[int, int]] = {}
+    for span in spans:
+        if span is None:
+            continue
+        tipo, start, end = span
+        start, end = max(start, today), min(end, horizon_end)
+        if start >= end:
+            continue
+        if tipo in ranges:
+            start, end = min(start, ranges[tipo][0]), max(end, ranges[tipo][1])
+        ranges[tipo] = (start, end)
+    written = 0
+    for tipo, (start, end) in ranges.items():
+        cells = _recompute_range(conn, [tipo], start, end, today)
+        if cells:
+            (cache or CACHE).mark_dirty(tipo, start, end)
+        written += cells
+    return written
+
+
+def rebuild(conn, today: Optional[int] = None, cache: Optional['PriceCache'] = None) -> int:
+    """Drop past nights and orphaned rooms, then recompute the whole horizon."""
+    today = today_number() if today is None else today
+    conn.execute('DELETE FROM precios_calendario WHERE dia < ? OR dia >= ?', (today, today + HORIZON_DAYS))
+    conn.execute('DELETE FROM precios_calendario WHERE habitacion_id NOT IN (SELECT id FROM habitaciones)')
+    types = [row[0] for row in conn.execute('SELECT DISTINCT tipo FROM habitaciones')]
+    written = _recompute_range(conn, types, today, today + HORIZON_DAYS, today) if types else 0
+    (cache or CACHE).mark_dirty()
+    return written
+
+
+def ensure_current(conn, cache: Optional['PriceCache'] = None) -> bool:
+    """Rebuild when the calendar is empty or has not rolled forward to today."""
+    first = conn.execute('SELECT MIN(dia) FROM precios_calendario').fetchone()[0]
+    if first == today_number():
+        return False
+    rebuild(conn, cache=cache)
+    return True
+
+
+def start_rollover(execute: Callable[[Callable], object], cache: 'PriceCache', interval: float = 60.0):
+    """
+    Roll the calendar forward when the date changes, in a daemon thread.
+
+    Checks every `interval` seconds; on a new day ensure_current runs
+    through `execute` (the shard writer's run) so the rebuild is an
+    ordinary write.
+    """
+    stop = threading.Event()
+
+    def loop():
+        day = today_number()
+        while not stop.wait(interval):
+            if today_number() == day:
+                continue
+            try:
+                if execute(lambda conn: ensure_current(conn, cache=cache)):
+                    logger.info(f'Price calendar rolled forward to {day_string(today_number())}')
+                day = today_number()
+            except Exception as e:
+                logger.error(f'Price calendar rollover failed: {e}')
+
+    threading.Thread(target=loop, name='precios-rollover', daemon=True).start()
+    return stop
+
+
+def reservation_span(conn, res_id) -> Optional[Span]:
+    """Nights held by a reservation, as stored right now (None if it does not exist)."""
+    row = conn.execute('''
+        SELECT h.tipo, r.fecha_inicio, r.fecha_fin FROM reservas r
+        JOIN habitaciones h ON r.habitacion_id = h.id WHERE r.id = ?
+    ''', (res_id,)).fetchone()
+    if row is None:
+        return None
+    try:
+        return row[0], day_number(row[1]), day_number(row[2])
+    except (TypeError, ValueError):
+        return None  # free-form dates cannot hold nights in the calendar
+
+
+def room_span(conn, room_id) -> Optional[Span]:
+    """The whole horizon for a room's type: its base price and the type's capacity feed every night."""
+    row = conn.execute('SELECT tipo FROM habitaciones WHERE id = ?', (room_id,)).fetchone()
+    if row is None:
+        return None
+    today = today_number()
+    return row[0], today, today + HORIZON_DAYS
+
+
+class PriceCache:
+    """
+    The calendar held in memory as a (rooms, days) NumPy matrix.
+
+    Quotes are array lookups. recompute()/rebuild() only record what
+    they touched because they run inside a transaction; whoever commits
+    calls committed(conn), which re-reads the recomputed spans from
+    precios_calendario into the matrix in place (a span rolled back with
+    its write just reads the old prices again). A rebuild, a new room or
+    a span outside the matrix makes the next quote reload everything.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty: Dict[str, Tuple[int, int]] = {}
+        self._reload = False
+        self._stale = True
+        self._rows: Dict[int, int] = {}
+        self._first_day = 0
+        self._matrix = np.zeros((0, 0), dtype=np.int64)
+
+    def mark_dirty(self, tipo: Optional[str] = None, start: int = 0, end: int = 0):
+        """Record a recomputed span of a room type (no type: the whole calendar)."""
+        with self._lock:
+            if tipo is None:
+                self._reload = True
+            elif tipo in self._dirty:
+                first, last = self._dirty[tipo]
+                self._dirty[tipo] = (min(first, start), max(last, end))
+            else:
+                self._dirty[tipo] = (start, end)
+
+    def committed(self, conn=None):
+        """Apply the spans recorded since the last commit (read through `conn`, after COMMIT)."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            if self._reload or conn is None:
+                self._stale = self._stale or self._reload or bool(dirty)
+                self._reload = False
+                return
+            if self._stale:
+                return
+            for tipo, (start, end) in dirty.items():
+                if not self._apply_span(conn, tipo, start, end):
+                    self._stale = True
+                    return
+
+    def _apply_span(self, conn, tipo: str, start: int, end: int) -> bool:
+        first, last = start - self._first_day, end - self._first_day
+        if first < 0 or last > self._matrix.shape[1]:
+            return False
+        rows = conn.execute('''
+            SELECT p.habitacion_id, p.dia, p.precio_centavos FROM precios_calendario p
+            JOIN habitaciones h ON h.id = p.habitacion_id
+            WHERE h.tipo = ? AND p.dia >= ? AND p.dia < ?
+        ''', (tipo, start, end)).fetchall()
+        if not rows:
+            return True
+        data = np.array([tuple(r) for r in rows], dtype=np.int64)
+        positions = [self._rows.get(int(room_id)) for room_id in data[:, 0]]
+        if any(p is None for p in positions):
+            return False
+        self._matrix[np.array(positions), data[:, 1] - self._first_day] = data[:, 2]
+        return True
+
+    def _load(self, conn):
+        rows = conn.execute('SELECT habitacion_id, dia, precio_centavos FROM precios_calendario').fetchall()
+        if not rows:
+            self._rows, self._first_day, self._matrix = {}, 0, np.zeros((0, 0), dtype=np.int64)
+            return
+        data = np.array(rows, dtype=np.int64)
+        room_ids = np.unique(data[:, 0])
+        first_day = int(data[:, 1].min())
+        matrix = np.full((room_ids.size, int(data[:, 1].max()) - first_day + 1), -1, dtype=np.int64)
+        matrix[np.searchsorted(room_ids, data[:, 0]), data[:, 1] - first_day] = data[:, 2]
+        self._rows = {int(room_id): i for i, room_id in enumerate(room_ids)}
+        self._first_day = first_day
+        self._matrix = matrix
+
+    def nightly(self, conn, room_id: int, start: int, end: int) -> Optional[np.ndarray]:
+        """Prices in cents for nights start..end-1, or None when outside the calendar."""
+        with self._lock:
+            if self._stale:
+                self._load(conn)
+                self._stale = False
+            row = self._rows.get(room_id)
+            first, last = start - self._first_day, end - self._first_day
+            if row is None or first < 0 or last > self._matrix.shape[1] or first >= last:
+                return None
+            prices = self._matrix[row, first:last].copy()
+        return None if (prices < 0).any() else prices
+
+
+CACHE = PriceCache()
+
+
+def quote(conn, room_id: int, check_in: str, check_out: Optional[str] = None,
+          cache: Optional[PriceCache] = None) -> Optional[Dict]:
+    """Price of a stay (or of one night when check_out is omitted)."""
+    start = day_number(check_in)
+    end = day_number(check_out) if check_out else start + 1
+    prices = (cache or CACHE).nightly(conn, room_id, start, end)
+    if prices is None:
+        return None
+    return {
+        'roomId': room_id,
+        'checkIn': day_string(start),
+        'checkOut': day_string(end),
+        'nights': [{'date': day_string(start + i), 'price': int(p) / 100} for i, p in enumerate(prices)],
+        'total': int(prices.sum()) / 100,
+    }
+
+
+if __name__ == '__main__':
+    import sys
+    import sqlite3
+
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else 'hotel_management.db')
+    written = rebuild(conn)
+    conn.commit()
+    conn.close()
+    print(f'Calendario de precios reconstruido: {written} noches')
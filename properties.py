@@ -0,0 +1,178 @@
+# Properties
+# Pacific Reef Hotel Management System - One SQLite shard per resort, selected per request
+
+import os
+import re
+import sqlite3
+import contextvars
+from typing import Dict, Iterator, List, Optional
+
+from flask import jsonify, request
+
+import archive
+
+HEADER = 'X-Property'
+PREFIX = '/p/'
+ENVIRON_KEY = 'pacificreef.property'
+DEFAULT_CODE = 'reef'
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_CODE = re.compile(r'^[a-z0-9][a-z0-9_-]*$')
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar('property', default=None)
+
+# FTS5 creates these next to each virtual table; cloning must not create them twice
+_SHADOW_SUFFIXES = ('_data', '_idx', '_content', '_docsize', '_config')
+
+
+class Property:
+    """A resort and the SQLite file (shard) that holds its rooms, guests and reservations."""
+
+    def __init__(self, code: str, db_path: str, is_default: bool = False):
+        self.code = code
+        self.db_path = db_path
+        self.is_default = is_default
+        # The default property keeps the historical file layout (hotel_archive.db, RESERVAS_ARCHIVE_DB)
+        if is_default:
+            self.archive_db = archive.default_path(db_path)
+        else:
+            self.archive_db = os.path.splitext(db_path)[0] + '_archive.db'
+
+    def scoped_dir(self, base: str) -> str:
+        """Per-property subdirectory of `base` (backups, snapshots); the default property uses `base` itself."""
+        return base if self.is_default else os.path.join(base, self.code)
+
+    def to_dict(self) -> Dict:
+        return {'code': self.code, 'default': self.is_default}
+
+
+class PropertyRegistry:
+    """The configured properties, in order, plus the one requests fall back to."""
+
+    def __init__(self, properties: List[Property]):
+        if not properties:
+            raise ValueError('Se requiere al menos una propiedad')
+        self._by_code = {p.code: p for p in properties}
+        self.default = next((p for p in properties if p.is_default), properties[0])
+
+    def __iter__(self) -> Iterator[Property]:
+        return iter(self._by_code.values())
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._by_code
+
+    def __getitem__(self, code: str) -> Property:
+        return self._by_code[code]
+
+    def current(self) -> Property:
+        """Property of the running request (or writer thread); the default one elsewhere."""
+        return _CURRENT.get() or self.default
+
+
+def activate(prop: Property):
+    """Make `prop` the current property for this thread/context."""
+    _CURRENT.set(prop)
+
+
+def parse(spec: str, default_code: Optional[str] = None) -> List[Property]:
+    """
+    Parse 'reef=hotel_management.db,coral=shards/coral.db'.
+
+    Relative paths are taken from the project root so both services (the
+    analytics API runs from analytics/) open the same files.
+    """
+    entries = []
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        code, sep, path = part.partition('=')
+        code, path = code.strip().lower(), path.strip()
+        if not sep or not path or not _CODE.match(code):
+            raise ValueError(f'Propiedad mal configurada: {part.strip()!r} (formato codigo=ruta.db)')
+        entries.append((code, path if os.path.isabs(path) else os.path.join(ROOT, path)))
+    default_code = default_code or (entries[0][0] if entries else None)
+    if entries and default_code not in {code for code, _ in entries}:
+        raise ValueError(f'HOTEL_DEFAULT_PROPERTY desconocida: {default_code}')
+    return [Property(code, path, code == default_code) for code, path in entries]
+
+
+def load(default_db: str) -> PropertyRegistry:
+    """
+    Properties from HOTEL_PROPERTIES (see parse); HOTEL_DEFAULT_PROPERTY
+    picks the fallback. Unset means a single property on `default_db`,
+    i.e. the single-hotel setup.
+    """
+    spec = os.getenv('HOTEL_PROPERTIES')
+    if not spec:
+        return PropertyRegistry([Property(os.getenv('HOTEL_DEFAULT_PROPERTY', DEFAULT_CODE), default_db, True)])
+    return PropertyRegistry(parse(spec, os.getenv('HOTEL_DEFAULT_PROPERTY')))
+
+
+def clone_schema(template: str, target: str):
+    """Create an empty shard with the template's tables, indexes, triggers and schema version."""
+    source = sqlite3.connect(f'file:{template}?mode=ro', uri=True)
+    try:
+        virtual = [row[0] for row in source.execute(
+            "SELECT name FROM sqlite_master WHERE sql LIKE 'CREATE VIRTUAL TABLE%'")]
+        shadows = {name + suffix for name in virtual for suffix in _SHADOW_SUFFIXES}
+        statements = [sql for name, sql in source.execute(
+            "SELECT name, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+        ) if name not in shadows]
+        version = source.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        source.close()
+    conn = sqlite3.connect(target)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        for sql in statements:
+            conn.execute(sql)
+        conn.execute(f'PRAGMA user_version = {int(version)}')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class PrefixMiddleware:
+    """WSGI middleware: /p/<code>/api/... is routed as /api/... for property <code>."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path.startswith(PREFIX):
+            code, _, rest = path[len(PREFIX):].partition('/')
+            environ[ENVIRON_KEY] = code
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + PREFIX + code
+            environ['PATH_INFO'] = '/' + rest
+        return self.wsgi_app(environ, start_response)
+
+
+def init_app(app, registry: PropertyRegistry):
+    """
+    Select the property of every request from the /p/<code> path prefix
+    or the X-Property header (prefix wins); neither means the default
+    property. Unknown codes get a 404 before any view runs.
+    """
+    app.wsgi_app = PrefixMiddleware(app.wsgi_app)
+
+    @app.before_request
+    def _select_property():
+        code = request.environ.get(ENVIRON_KEY) or request.headers.get(HEADER)
+        if code and code.lower() not in registry:
+            return jsonify({'message': f'Propiedad desconocida: {code}'}), 404
+        activate(registry[code.lower()] if code else registry.default)
+
+    @app.after_request
+    def _tag_property(response):
+        response.headers[HEADER] = registry.current().code
+        return response
+
+    @app.teardown_request
+    def _clear_property(error=None):
+        # Pooled server threads must not carry the property into the next request
+        _CURRENT.set(None)
+
+    return app
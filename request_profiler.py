@@ -0,0 +1,170 @@
+# Request Profiler
+# Pacific Reef Hotel Management System - Opt-in per-request profiling
+
+import os
+import re
+import sys
+import time
+import random
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+
+_UNSAFE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval.
+
+    Produces collapsed stacks ('outer;inner;leaf count'), the input
+    format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class RequestProfiler:
+    """
+    Profiles selected requests and writes one file per request.
+
+    A request is profiled when it carries the trigger header or is picked
+    by the sample rate. Mode 'cprofile' writes pstats files (.prof) and
+    mode 'sample' writes collapsed stacks (.folded) for flamegraphs.
+    """
+
+    def __init__(self, output_dir: str = 'profiles', sample_rate: float = 0.0,
+                 header: str = 'X-Profile', mode: str = 'cprofile', interval: float = 0.005):
+        """
+        Initialize the profiler.
+
+        Args:
+            output_dir: Directory for profile files
+            sample_rate: Fraction of requests profiled without the header
+            header: Request header that forces profiling ('1' or 'true')
+            mode: 'cprofile' (deterministic) or 'sample' (stack sampling)
+            interval: Sampling interval in seconds for 'sample' mode
+        """
+        if mode not in ('cprofile', 'sample'):
+            raise ValueError("mode must be 'cprofile' or 'sample'")
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.header = header
+        self.mode = mode
+        self.interval = interval
+        os.makedirs(output_dir, exist_ok=True)
+
+    def wanted(self) -> bool:
+        """Decide whether the current request is profiled."""
+        if request.headers.get(self.header, '').lower() in ('1', 'true'):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        """Start profiling the current request."""
+        if self.mode == 'sample':
+            profiler = StackSampler(threading.get_ident(), self.interval)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is active in this interpreter
+                return
+        g._request_profile = (profiler, time.perf_counter())
+
+    def finish(self):
+        """Stop profiling and write the file; returns its path."""
+        state = g.pop('_request_profile', None)
+        if state is None:
+            return None
+        profiler, start = state
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+        else:
+            profiler.stop()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        route = request.url_rule.rule if request.url_rule else request.path
+        name = _UNSAFE.sub('_', f'{request.method}_{route}').strip('_')
+        extension = 'prof' if self.mode == 'cprofile' else 'folded'
+        filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{name}_{elapsed_ms:.0f}ms.{extension}"
+        path = os.path.join(self.output_dir, filename)
+        if isinstance(profiler, cProfile.Profile):
+            profiler.dump_stats(path)
+        else:
+            profiler.dump(path)
+        return path
+
+
+def init_app(app):
+    """
+    Attach the request profiler to a Flask app when REQUEST_PROFILE=true.
+
+    No hooks are registered otherwise, so disabled profiling costs nothing.
+
+    Environment:
+        REQUEST_PROFILE: 'true' to enable
+        REQUEST_PROFILE_DIR: Output directory (default profiles)
+        REQUEST_PROFILE_SAMPLE_RATE: Fraction of requests to profile (default 0)
+        REQUEST_PROFILE_MODE: 'cprofile' or 'sample' (default cprofile)
+    """
+    if os.getenv('REQUEST_PROFILE', 'false').lower() != 'true':
+        return None
+
+    profiler = RequestProfiler(
+        output_dir=os.getenv('REQUEST_PROFILE_DIR', 'profiles'),
+        sample_rate=float(os.getenv('REQUEST_PROFILE_SAMPLE_RATE', 0)),
+        mode=os.getenv('REQUEST_PROFILE_MODE', 'cprofile')
+    )
+
+    @app.before_request
+    def _start_profile():
+        if profiler.wanted():
+            profiler.start()
+
+    @app.after_request
+    def _finish_profile(response):
+        path = profiler.finish()
+        if path:
+            response.headers['X-Profile-File'] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def _abort_profile(exc):
+        # Requests that raised never reach after_request
+        profiler.finish()
+
+    return profiler
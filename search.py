@@ -0,0 +1,82 @@
+# Search
+# Pacific Reef Hotel Management System - FTS5 full-text search over guests and reservations
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+MAX_LIMIT = 100
+
+# Letters, digits and the separators FTS5's unicode61 tokenizer splits on anyway
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term ("ana"* "gom"*) joined with
+    AND, so partial input like "ana gom" finds "Ana Gómez" and user
+    punctuation can never be parsed as FTS5 syntax. Returns None when the
+    query has no searchable characters.
+    """
+    tokens = _TOKEN.findall(query or '')
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_usuarios(conn, match: str, limit: int, offset: int) -> Dict:
+    """Users ranked by bm25 (username weighs most, then name, then email)."""
+    total = conn.execute('SELECT COUNT(*) FROM usuarios_fts WHERE usuarios_fts MATCH ?', (match,)).fetchone()[0]
+    rows = conn.execute('''
+        SELECT u.id, u.username, u.nombre, u.email, u.rol, u.estado, bm25(usuarios_fts, 10.0, 5.0, 1.0) AS score
+        FROM usuarios_fts
+        JOIN usuarios u ON u.id = usuarios_fts.rowid
+        WHERE usuarios_fts MATCH ?
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    ''', (match, limit, offset)).fetchall()
+    data = [{
+        'id': r[0], 'username': r[1], 'name': r[2], 'email': r[3], 'role': r[4], 'status': r[5], 'score': round(r[6], 4)
+    } for r in rows]
+    return {'data': data, 'total': total}
+
+
+def search_reservas(conn, match: str, limit: int, offset: int) -> Dict:
+    """Reservations ranked by bm25 over code, guest name and room number."""
+    total = conn.execute('SELECT COUNT(*) FROM reservas_fts WHERE reservas_fts MATCH ?', (match,)).fetchone()[0]
+    rows = conn.execute('''
+        SELECT r.id, r.codigo, reservas_fts.huesped, reservas_fts.habitacion, r.fecha_inicio, r.fecha_fin, r.estado,
+               bm25(reservas_fts, 10.0, 5.0, 2.0) AS score
+        FROM reservas_fts
+        JOIN reservas r ON r.id = reservas_fts.rowid
+        WHERE reservas_fts MATCH ?
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    ''', (match, limit, offset)).fetchall()
+    data = [{
+        'id': r[0], 'code': r[1], 'userName': r[2], 'roomNumber': r[3], 'checkIn': r[4], 'checkOut': r[5],
+        'status': r[6], 'score': round(r[7], 4)
+    } for r in rows]
+    return {'data': data, 'total': total}
+
+
+SEARCHES = {
+    'usuarios': search_usuarios,
+    'reservas': search_reservas,
+}
+
+
+def page(limit: int, offset: int) -> Tuple[int, int]:
+    """Clamp pagination to 1..MAX_LIMIT rows from a non-negative offset."""
+    return max(1, min(limit, MAX_LIMIT)), max(0, offset)
+
+
+def search(conn, query: str, kind: str = 'all', limit: int = 20, offset: int = 0) -> Dict[str, Dict]:
+    """Run the search for one kind or for every kind; each result is paginated on its own."""
+    match = build_match(query)
+    limit, offset = page(limit, offset)
+    kinds: List[str] = list(SEARCHES) if kind == 'all' else [kind]
+    if match is None:
+        return {name: {'data': [], 'total': 0} for name in kinds}
+    return {name: SEARCHES[name](conn, match, limit, offset) for name in kinds}
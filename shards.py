@@ -0,0 +1,72 @@
+# Shards
+# Pacific Reef Hotel Management System - Per-property writer, caches and jobs for the booking API
+
+import os
+import sqlite3
+from typing import Dict
+
+import metrics
+import archive
+import backup
+import events
+import writer
+import pricing
+import availability
+import properties
+from database.migrations import apply_migrations
+
+
+class Shard:
+    """
+    Everything the booking API keeps per property: its single writer,
+    price cache, availability grid, event broker and backup job. State
+    never crosses shards, so properties scale and fail independently.
+    """
+
+    def __init__(self, prop: properties.Property, max_pending: int, max_batch: int, backup_dir: str,
+                 backup_keep: int, **backup_options):
+        self.property = prop
+        self.prices = pricing.PriceCache()
+        self.grid = availability.AvailabilityGrid()
+        self.events = events.EventBroker()
+        self.writer = writer.WriteQueue(self.writer_connection, max_pending=max_pending, max_batch=max_batch)
+        self.writer.commit_listeners.append(self.prices.committed)
+        self.writer.commit_listeners.append(self.grid.committed)
+        self.backups = backup.BackupJob(prop.db_path, prop.scoped_dir(backup_dir), keep=backup_keep,
+                                        archive_path=prop.archive_db, **backup_options)
+
+    def connect(self):
+        conn = sqlite3.connect(self.property.db_path, factory=metrics.InstrumentedConnection)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def writer_connection(self):
+        # Called on the writer thread, which serves this property for its whole life;
+        # the writer sees the archive too, so archiving batches run as ordinary writes
+        properties.activate(self.property)
+        conn = self.connect()
+        archive.attach(conn, self.property.archive_db)
+        return conn
+
+    def init_db(self, template: str = None):
+        """Create the shard from `template`'s schema if missing, migrate it and roll prices forward."""
+        if not os.path.exists(self.property.db_path) and template:
+            os.makedirs(os.path.dirname(self.property.db_path) or '.', exist_ok=True)
+            properties.clone_schema(template, self.property.db_path)
+        # WAL lets the analytics read-only pool read while bookings are written
+        conn = sqlite3.connect(self.property.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        apply_migrations(conn)
+        # Roll the price calendar forward to today (full rebuild at most once a day)
+        pricing.ensure_current(conn, cache=self.prices)
+        conn.commit()
+        self.prices.committed()
+        conn.close()
+
+    def stats(self) -> Dict:
+        return {
+            'property': self.property.code,
+            'writer': self.writer.stats(),
+            'grid': self.grid.stats(),
+            'events': self.events.stats(),
+        }
@@ -0,0 +1,237 @@
+# SQL Profiler
+# Pacific Reef Hotel Management System - Slow-query log with EXPLAIN QUERY PLAN
+
+import os
+import re
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import jsonify, request
+
+import metrics
+
+_WHITESPACE = re.compile(r'\s+')
+_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)\b(?! USING)')
+# Statements EXPLAIN QUERY PLAN can describe
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+_TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_NOT_ALIAS = {'where', 'on', 'left', 'right', 'inner', 'outer', 'cross', 'join', 'group', 'order',
+              'limit', 'set', 'values', 'using', 'natural', 'union', 'select', 'as', 'indexed', 'not'}
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace so the same statement aggregates under one key."""
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def explain(conn: sqlite3.Connection, sql: str, parameters=()) -> List[str]:
+    """
+    Return the EXPLAIN QUERY PLAN detail lines for a statement.
+
+    Runs through the base sqlite3.Connection.execute so the EXPLAIN itself
+    is not instrumented.
+    """
+    if parameters is None:
+        return []
+    rows = sqlite3.Connection.execute(conn, f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def table_aliases(sql: str) -> Dict[str, str]:
+    """Map every table name and alias in the statement to its table."""
+    aliases = {}
+    for table, alias in _TABLE_ALIAS.findall(sql):
+        aliases[table] = table
+        if alias and alias.lower() not in _NOT_ALIAS:
+            aliases[alias] = table
+    return aliases
+
+
+def full_scans(plan: List[str], sql: str = '') -> List[str]:
+    """Tables read with a full table scan according to the plan."""
+    aliases = table_aliases(sql)
+    return [aliases.get(m.group(1), m.group(1)) for m in (_FULL_SCAN.match(line) for line in plan) if m]
+
+
+class SlowQueryLog:
+    """
+    Records statements slower than a threshold with their query plan.
+
+    Entries are aggregated per normalized statement in memory (for the
+    admin endpoint) and appended to a JSON-lines file (for the CLI report).
+    """
+
+    def __init__(self, threshold_ms: float = 100.0, log_path: Optional[str] = 'slow_queries.jsonl',
+                 watched_tables=('reservas',)):
+        """
+        Initialize the slow-query log.
+
+        Args:
+            threshold_ms: Statements at or above this duration are recorded
+            log_path: JSON-lines file to append entries to (None to disable)
+            watched_tables: Tables whose full scans are flagged
+        """
+        self.threshold = threshold_ms / 1000.0
+        self.log_path = log_path
+        self.watched_tables = set(watched_tables)
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        # Separate lock so slow disk writes never block the stats
+        self._file_lock = threading.Lock()
+
+    def __call__(self, conn, sql, parameters, elapsed):
+        """SQL listener entry point (see metrics.SQL_LISTENERS)."""
+        if elapsed < self.threshold:
+            return
+        self.record(conn, sql, parameters, elapsed)
+
+    def record(self, conn, sql, parameters, elapsed):
+        """Record one slow statement, capturing its plan once per statement."""
+        statement = normalize_sql(sql)
+        with self._lock:
+            entry = self._stats.get(statement)
+            need_plan = entry is None or not entry['plan']
+
+        plan = []
+        if need_plan and statement.split(' ', 1)[0].upper() in _EXPLAINABLE:
+            try:
+                plan = explain(conn, sql, parameters)
+            except sqlite3.Error:
+                plan = []
+        scanned = full_scans(plan, sql)
+
+        with self._lock:
+            entry = self._stats.setdefault(statement, {
+                'statement': statement,
+                'count': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'plan': [],
+                'full_scans': [],
+                'flagged': False
+            })
+            entry['count'] += 1
+            entry['total_ms'] += elapsed * 1000
+            entry['max_ms'] = max(entry['max_ms'], elapsed * 1000)
+            entry['last_seen'] = datetime.now().isoformat()
+            if plan:
+                entry['plan'] = plan
+                entry['full_scans'] = scanned
+                entry['flagged'] = bool(self.watched_tables.intersection(scanned))
+            line = json.dumps({
+                'timestamp': entry['last_seen'],
+                'statement': statement,
+                'duration_ms': round(elapsed * 1000, 3),
+                'plan': entry['plan'],
+                'full_scans': entry['full_scans'],
+                'flagged': entry['flagged']
+            }) + '\n'
+
+        if self.log_path:
+            with self._file_lock:
+                with open(self.log_path, 'a') as f:
+                    f.write(line)
+
+    def worst(self, limit: int = 20, sort: str = 'total_ms') -> List[Dict]:
+        """Return the worst statements ordered by total_ms, max_ms or count."""
+        with self._lock:
+            entries = [dict(e) for e in self._stats.values()]
+        for e in entries:
+            e['avg_ms'] = round(e['total_ms'] / e['count'], 3)
+        return sorted(entries, key=lambda e: e[sort], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# Active profiler for this process (None unless enabled)
+PROFILER: Optional[SlowQueryLog] = None
+
+
+def enable(threshold_ms: float = 100.0, log_path: Optional[str] = 'slow_queries.jsonl',
+           watched_tables=('reservas',)) -> SlowQueryLog:
+    """Install the slow-query log as an SQL listener."""
+    global PROFILER
+    if PROFILER is None:
+        PROFILER = SlowQueryLog(threshold_ms, log_path, watched_tables)
+        metrics.SQL_LISTENERS.append(PROFILER)
+    return PROFILER
+
+
+def init_app(app):
+    """
+    Enable the profiler from environment variables and add the admin endpoint.
+
+    Environment:
+        SQL_PROFILE: 'true' to enable (off by default)
+        SQL_SLOW_MS: Threshold in milliseconds (default 100)
+        SQL_SLOW_LOG: JSON-lines log path (default slow_queries.jsonl)
+        SQL_SCAN_WATCH: Comma-separated tables whose full scans are flagged
+    """
+    if os.getenv('SQL_PROFILE', 'false').lower() == 'true':
+        enable(
+            float(os.getenv('SQL_SLOW_MS', 100)),
+            os.getenv('SQL_SLOW_LOG', 'slow_queries.jsonl'),
+            [t for t in os.getenv('SQL_SCAN_WATCH', 'reservas').split(',') if t]
+        )
+
+    @app.route('/api/admin/slow-queries')
+    def slow_queries():
+        if PROFILER is None:
+            return jsonify({ 'enabled': False, 'data': [] })
+        limit = request.args.get('limit', 20, type=int)
+        sort = request.args.get('sort', 'total_ms')
+        if sort not in ('total_ms', 'max_ms', 'count'):
+            return jsonify({ 'message': 'sort debe ser total_ms, max_ms o count' }), 400
+        return jsonify({
+            'enabled': True,
+            'threshold_ms': PROFILER.threshold * 1000,
+            'data': PROFILER.worst(limit, sort)
+        })
+
+
+def report(log_path: str, limit: int = 20, sort: str = 'total_ms') -> List[Dict]:
+    """Aggregate a JSON-lines slow-query log into the worst statements."""
+    stats: Dict[str, Dict] = {}
+    with open(log_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            entry = stats.setdefault(item['statement'], {
+                'statement': item['statement'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'plan': [], 'full_scans': [], 'flagged': False
+            })
+            entry['count'] += 1
+            entry['total_ms'] += item['duration_ms']
+            entry['max_ms'] = max(entry['max_ms'], item['duration_ms'])
+            if item.get('plan'):
+                entry['plan'] = item['plan']
+                entry['full_scans'] = item.get('full_scans', [])
+                entry['flagged'] = item.get('flagged', False)
+    entries = list(stats.values())
+    for e in entries:
+        e['avg_ms'] = round(e['total_ms'] / e['count'], 3)
+    return sorted(entries, key=lambda e: e[sort], reverse=True)[:limit]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Slow-query report')
+    parser.add_argument('log', nargs='?', default=os.getenv('SQL_SLOW_LOG', 'slow_queries.jsonl'))
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--sort', choices=['total_ms', 'max_ms', 'count'], default='total_ms')
+    args = parser.parse_args()
+
+    print(f"{'total ms':>10} {'max ms':>9} {'avg ms':>9} {'count':>6}  statement")
+    print('=' * 80)
+    for e in report(args.log, args.top, args.sort):
+        flag = '  [FULL SCAN: ' + ', '.join(e['full_scans']) + ']' if e['flagged'] else ''
+        print(f"{e['total_ms']:>10.1f} {e['max_ms']:>9.1f} {e['avg_ms']:>9.2f} {e['count']:>6}  {e['statement'][:120]}{flag}")
+        for step in e['plan']:
+            print(f"{'':>38}  -> {step}")
@@ -0,0 +1,52 @@
+# Test fixtures
+# Pacific Reef Hotel Management System - API and database fixtures on temporary copies
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SOURCE_DB = os.path.join(ROOT, 'hotel_management.db')
+
+
+@pytest.fixture
+def db_copy(tmp_path):
+    """Path of a fresh copy of the bundled database (schema version 0)."""
+    path = tmp_path / 'hotel_management.db'
+    shutil.copy(SOURCE_DB, path)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def api(tmp_path_factory):
+    """
+    The booking API module, imported inside a temporary directory.
+
+    app.py opens its databases by relative path at import time, so the
+    working directory stays on the copy for the whole session and nothing
+    (databases, archive, backups) is written into the repository.
+    """
+    workdir = tmp_path_factory.mktemp('api')
+    shutil.copy(SOURCE_DB, workdir / 'hotel_management.db')
+    previous = os.getcwd()
+    os.chdir(workdir)
+    os.environ['ADMISSION_CONTROL'] = 'false'
+    import app
+    yield app
+    os.chdir(previous)
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
+
+
+@pytest.fixture
+def write(api):
+    """Run fn(conn) through the default shard's writer and return its result."""
+    return lambda fn: api.shard().writer.run(fn)
+
@@ -0,0 +1,27 @@
+import sqlite3
+
+import archive
+import changelog
+
+
+def test_archive_round_trip_through_history_view(client, api, write):
+    version = write(changelog.current_version)
+    before = write(lambda conn: [tuple(r) for r in conn.execute(f'SELECT {archive.COLUMNS} FROM main.reservas ORDER BY id')])
+    finished = {row[0] for row in before if row[8] in archive.ARCHIVED_STATES}
+
+    result = archive.run(write, older_than_days=0, batch_size=4, pause=0)
+    assert result['moved'] == len(finished)
+
+    conn = sqlite3.connect(api.shard().property.db_path)
+    archive.attach(conn, api.shard().property.archive_db, read_only=True)
+    history = conn.execute(f'SELECT {archive.COLUMNS}, origen FROM reservas_historicas ORDER BY id').fetchall()
+    hot = {row[0] for row in conn.execute('SELECT id FROM main.reservas')}
+    conn.close()
+
+    assert [row[:-1] for row in history] == before
+    assert {row[0] for row in history if row[-1] == 'archivo'} == finished
+    assert not hot & finished
+
+    # Archived rows still exist: delta sync must not report them as deleted
+    body = client.get(f'/api/reservas?since={version}').get_json()
+    assert body['deleted'] == []
@@ -0,0 +1,42 @@
+def nuevo_usuario(username):
+    return {'resource': 'usuarios', 'op': 'create',
+            'data': {'username': username, 'name': 'Lote Prueba', 'email': f'{username}@example.com',
+                     'password': 'secreta', 'role': 'client', 'status': 'activo'}}
+
+
+def nueva_reserva(codigo, usuario):
+    return {'resource': 'reservas', 'op': 'create',
+            'data': {'code': codigo, 'usuario_id': usuario, 'habitacion_id': 1, 'checkIn': '2031-03-01',
+                     'checkOut': '2031-03-03', 'totalAmount': 300, 'payment': 'Pagado', 'status': 'confirmada'}}
+
+
+def count(write, sql, params=()):
+    return write(lambda conn: conn.execute(sql, params).fetchone()[0])
+
+
+def test_references_resolve_to_earlier_ids(client, write):
+    r = client.post('/api/batch', json={'operations': [nuevo_usuario('lote_ref'), nueva_reserva('LOTE-REF-1', '$0')]})
+    assert r.status_code == 200
+    usuario, reserva = r.get_json()['data']
+    assert count(write, 'SELECT usuario_id FROM reservas WHERE id=?', (reserva['id'],)) == usuario['id']
+
+
+def test_forward_reference_is_rejected(client, write):
+    r = client.post('/api/batch', json={'operations': [nueva_reserva('LOTE-FWD-1', '$1'), nuevo_usuario('lote_fwd')]})
+    assert r.status_code == 400
+    assert r.get_json()['failedIndex'] == 0
+    assert count(write, "SELECT COUNT(*) FROM usuarios WHERE username='lote_fwd'") == 0
+
+
+def test_failure_rolls_back_whole_batch(client, write):
+    r = client.post('/api/batch', json={'operations': [
+        nuevo_usuario('lote_rollback'),
+        nueva_reserva('LOTE-RB-1', '$0'),
+        {'resource': 'reservas', 'op': 'delete', 'id': 999999},
+    ]})
+    assert r.status_code == 404
+    body = r.get_json()
+    assert body['failedIndex'] == 2
+    assert body['message'].startswith('Lote revertido')
+    assert count(write, "SELECT COUNT(*) FROM usuarios WHERE username='lote_rollback'") == 0
+    assert count(write, "SELECT COUNT(*) FROM reservas WHERE codigo='LOTE-RB-1'") == 0
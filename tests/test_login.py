@@ -0,0 +1,25 @@
+import credentials
+
+
+def stored_password(write, username):
+    return write(lambda conn: conn.execute('SELECT password FROM usuarios WHERE username=?', (username,)).fetchone()[0])
+
+
+def test_plaintext_password_is_upgraded_on_login(client, write):
+    assert not credentials.is_hashed(stored_password(write, 'csilva'))
+    r = client.post('/api/login', json={'username': 'csilva', 'password': 'demo123', 'role': 'client'})
+    assert r.status_code == 200
+    assert 'password' not in r.get_json()['user']
+
+    stored = stored_password(write, 'csilva')
+    assert stored.startswith('scrypt$')
+    # The new hash keeps working and the old plaintext is gone
+    assert client.post('/api/login', json={'username': 'csilva', 'password': 'demo123', 'role': 'client'}).status_code == 200
+    assert stored_password(write, 'csilva') == stored
+
+
+def test_wrong_password_is_rejected(client, write):
+    before = stored_password(write, 'acorrea')
+    r = client.post('/api/login', json={'username': 'acorrea', 'password': 'otra', 'role': 'client'})
+    assert r.status_code == 401
+    assert stored_password(write, 'acorrea') == before
@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+from database.migrations import MAX_AMENITIES, MIGRATIONS, apply_migrations, migration_002_amenidades
+
+
+def user_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def test_migrations_step_user_version_to_latest(db_copy):
+    conn = sqlite3.connect(db_copy)
+    assert user_version(conn) == 0
+    assert apply_migrations(conn) == len(MIGRATIONS)
+    assert user_version(conn) == len(MIGRATIONS)
+    # A second run finds nothing pending
+    assert apply_migrations(conn) == len(MIGRATIONS)
+    conn.close()
+
+
+def test_only_pending_migrations_run(db_copy, monkeypatch):
+    conn = sqlite3.connect(db_copy)
+    apply_migrations(conn)
+    conn.execute(f'PRAGMA user_version = {len(MIGRATIONS) - 1}')
+    applied = []
+    monkeypatch.setattr('database.migrations.MIGRATIONS',
+                        [lambda c, n=n: applied.append(n) for n in range(1, len(MIGRATIONS) + 1)])
+    assert apply_migrations(conn) == len(MIGRATIONS)
+    assert applied == [len(MIGRATIONS)]
+    assert user_version(conn) == len(MIGRATIONS)
+    conn.close()
+
+
+def test_amenity_migration_respects_bit_limit():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''CREATE TABLE habitaciones (id INTEGER PRIMARY KEY, tipo TEXT, estado TEXT, piso INTEGER,
+                    capacidad INTEGER, amenidades TEXT)''')
+    names = ','.join(f'amenidad {i}' for i in range(MAX_AMENITIES))
+    conn.execute('INSERT INTO habitaciones (amenidades) VALUES (?)', (names,))
+    migration_002_amenidades(conn)
+    assert conn.execute('SELECT MAX(bit) FROM amenidades').fetchone()[0] == MAX_AMENITIES - 1
+
+    conn.execute("INSERT INTO habitaciones (amenidades) VALUES ('una más')")
+    with pytest.raises(ValueError):
+        migration_002_amenidades(conn)
@@ -0,0 +1,23 @@
+import changelog
+
+
+def test_unchanged_patch_writes_nothing(client, write):
+    estado = write(lambda conn: conn.execute('SELECT estado FROM habitaciones WHERE id=2').fetchone()[0])
+    version = write(changelog.current_version)
+    r = client.patch('/api/habitaciones/2', json={'status': estado})
+    assert r.status_code == 200
+    assert r.get_json()['changed'] is False
+    assert write(changelog.current_version) == version
+
+
+def test_changed_patch_is_logged(client, write):
+    version = write(changelog.current_version)
+    r = client.patch('/api/habitaciones/2', json={'floor': 7})
+    assert r.get_json()['changed'] is True
+    assert write(changelog.current_version) == version + 1
+    # Repeating it is a no-op again
+    assert client.patch('/api/habitaciones/2', json={'floor': 7}).get_json()['changed'] is False
+
+
+def test_patch_missing_row(client):
+    assert client.patch('/api/habitaciones/999999', json={'floor': 1}).status_code == 404
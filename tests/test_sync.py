@@ -0,0 +1,39 @@
+import changelog
+
+
+def test_since_returns_changed_rows_and_tombstones(client, write):
+    version = client.get('/api/reservas').get_json()['version']
+    client.patch('/api/reservas/3', json={'payment': 'Pagado'})
+    assert client.delete('/api/reservas/4').status_code == 200
+
+    body = client.get(f'/api/reservas?since={version}').get_json()
+    assert [row['id'] for row in body['data']] == [3]
+    assert body['deleted'] == [4]
+    assert body['version'] > version
+
+    # Nothing new after the returned version
+    body = client.get(f'/api/reservas?since={body["version"]}').get_json()
+    assert body['data'] == [] and body['deleted'] == []
+
+
+def test_compaction_keeps_latest_entry_per_row(client, write):
+    version = write(changelog.current_version)
+    for piso in (3, 4, 5):
+        client.patch('/api/habitaciones/5', json={'floor': piso})
+    result = write(lambda conn: changelog.compact(conn, retention_days=30))
+    assert result['duplicates_removed'] >= 2
+    body = client.get(f'/api/habitaciones?since={version}').get_json()
+    assert [row['id'] for row in body['data']] == [5]
+
+
+def test_versions_below_purge_floor_require_resync(client, write):
+    version = write(changelog.current_version)
+    client.patch('/api/habitaciones/6', json={'floor': 2})
+    write(lambda conn: conn.execute("UPDATE cambios SET fecha = datetime('now', '-60 days')"))
+    write(lambda conn: changelog.compact(conn, retention_days=30))
+
+    r = client.get(f'/api/habitaciones?since={version}')
+    assert r.status_code == 410
+    assert r.get_json()['resync'] is True
+    # The version handed back with the resync answer is a valid starting point
+    assert client.get(f'/api/habitaciones?since={r.get_json()["version"]}').status_code == 200
@@ -0,0 +1,57 @@
+import sqlite3
+import threading
+
+import pytest
+
+from writer import WriteQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    path = str(tmp_path / 'writer.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, valor TEXT NOT NULL)')
+    conn.commit()
+    conn.close()
+    q = WriteQueue(lambda: sqlite3.connect(path, check_same_thread=False))
+    yield q, path
+    q.stop(timeout=5)
+
+
+def insert(valor):
+    return lambda conn: conn.execute('INSERT INTO t (valor) VALUES (?)', (valor,)).lastrowid
+
+
+def failing(conn):
+    conn.execute("INSERT INTO t (valor) VALUES ('parcial')")
+    conn.execute('INSERT INTO t (valor) VALUES (NULL)')
+
+
+def test_failed_write_rolls_back_only_its_savepoint(queue):
+    q, path = queue
+    release = threading.Event()
+    # Hold the writer so the next three writes land in the same group
+    blocker = q.submit(lambda conn: release.wait(5))
+    first = q.submit(insert('a'))
+    bad = q.submit(failing)
+    last = q.submit(insert('b'))
+    release.set()
+
+    assert blocker.result(5) is True
+    assert first.result(5) and last.result(5)
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(5)
+
+    conn = sqlite3.connect(path)
+    assert [row[0] for row in conn.execute('SELECT valor FROM t ORDER BY id')] == ['a', 'b']
+    conn.close()
+    stats = q.stats()
+    assert stats['failed'] == 1
+    assert stats['commits'] == 1  # the group that held the failure still committed once
+
+
+def test_writer_survives_a_failed_group(queue):
+    q, path = queue
+    with pytest.raises(sqlite3.OperationalError):
+        q.run(lambda conn: conn.execute('SELECT * FROM no_existe'))
+    assert q.run(insert('c'))
@@ -0,0 +1,180 @@
+# Writer
+# Pacific Reef Hotel Management System - Single-writer queue with group commit
+
+import queue
+import sqlite3
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriterBusy(Exception):
+    """The write queue stayed full for longer than the submit timeout."""
+
+
+class _Write:
+    __slots__ = ('fn', 'after_commit', 'future')
+
+    def __init__(self, fn, after_commit):
+        self.fn = fn
+        self.after_commit = after_commit
+        self.future = Future()
+
+
+class WriteQueue:
+    """
+    Funnels every mutation through one writer thread.
+
+    SQLite allows a single writer at a time, so concurrent request threads
+    committing on their own connections only queue up on the file lock
+    and eventually fail with "database is locked". Here callers submit a
+    function `fn(conn)`; the writer drains up to `max_batch` pending
+    writes, runs each inside its own SAVEPOINT of one shared transaction
+    and commits once (group commit). A failing write is rolled back to
+    its savepoint without affecting the others, and each caller gets its
+    own result or exception through a Future.
+
+    `after_commit(conn, result)` runs on the writer connection once the
+    group is durable, e.g. to publish change events; `commit_listeners`
+    are called with the connection after every successful commit.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], max_pending: int = 1024,
+                 max_batch: int = 64, submit_timeout: float = 5.0, result_timeout: float = 60.0):
+        self.connect = connect
+        self.max_batch = max_batch
+        self.submit_timeout = submit_timeout
+        self.result_timeout = result_timeout
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.commits = 0
+        self.writes = 0
+        self.failed = 0
+        self.largest_group = 0
+        self.commit_listeners = []
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Finish the writes already queued, then stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, fn: Callable, after_commit: Optional[Callable] = None) -> Future:
+        self.start()
+        write = _Write(fn, after_commit)
+        try:
+            self._queue.put(write, timeout=self.submit_timeout)
+        except queue.Full:
+            raise WriterBusy('La cola de escritura está llena')
+        return write.future
+
+    def run(self, fn: Callable, after_commit: Optional[Callable] = None, timeout: Optional[float] = None):
+        """Submit a write and wait for its result (re-raises its exception; `result_timeout` by default)."""
+        return self.submit(fn, after_commit).result(timeout if timeout is not None else self.result_timeout)
+
+    def stats(self) -> dict:
+        return {
+            'pending': self._queue.qsize(),
+            'commits': self.commits,
+            'writes': self.writes,
+            'failed': self.failed,
+            'largest_group': self.largest_group,
+            'writes_per_commit': round(self.writes / self.commits, 2) if self.commits else 0.0,
+        }
+
+    def _next_group(self):
+        group = [self._queue.get()]
+        while len(group) < self.max_batch and group[-1] is not None:
+            try:
+                group.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        stop = group[-1] is None
+        return [w for w in group if w is not None], stop
+
+    def _run(self):
+        conn = self.connect()
+        conn.isolation_level = None
+        try:
+            while True:
+                group, stop = self._next_group()
+                if group:
+                    try:
+                        self._commit_group(conn, group)
+                    except Exception as e:
+                        # Never let the writer thread die with callers still waiting
+                        logger.error(f'write group failed: {e}')
+                        self._reset(conn)
+                        self._fail([w for w in group if not w.future.done()], e)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _commit_group(self, conn, group):
+        done = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.Error as e:
+            self._fail(group, e)
+            return
+        try:
+            for write in group:
+                conn.execute('SAVEPOINT escritura')
+                try:
+                    result = write.fn(conn)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO escritura')
+                    conn.execute('RELEASE escritura')
+                    self._fail([write], e)
+                    continue
+                conn.execute('RELEASE escritura')
+                done.append((write, result))
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            # The transaction is gone or unusable: a write ended it, or SQLite rolled
+            # back on its own (SQLITE_FULL, IOERR); nothing of the group was committed
+            self._reset(conn)
+            self._fail([w for w in group if not w.future.done()], e)
+            return
+
+        for listener in self.commit_listeners:
+            try:
+                listener(conn)
+            except Exception as e:
+                logger.error(f'commit listener failed: {e}')
+        if done:
+            self.commits += 1
+        self.writes += len(done)
+        self.largest_group = max(self.largest_group, len(group))
+        for write, result in done:
+            if write.after_commit is not None:
+                try:
+                    write.after_commit(conn, result)
+                except Exception as e:
+                    logger.error(f'after_commit failed: {e}')
+            write.future.set_result(result)
+
+    @staticmethod
+    def _reset(conn):
+        if conn.in_transaction:
+            try:
+                conn.execute('ROLLBACK')
+            except sqlite3.Error as e:
+                logger.error(f'rollback failed: {e}')
+
+    def _fail(self, writes, error):
+        self.failed += len(writes)
+        for write in writes:
+            write.future.set_exception(error)